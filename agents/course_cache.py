@@ -0,0 +1,144 @@
+import os
+import sys
+import copy
+import time
+import threading
+from collections import OrderedDict
+
+COURSE_CACHE_MAX_ENTRIES = int(os.getenv("COURSE_CACHE_MAX_ENTRIES", "64"))
+COURSE_CACHE_MAX_MB = float(os.getenv("COURSE_CACHE_MAX_MB", "64"))
+# How long a course version read from Neo4j is trusted before it is checked again.
+COURSE_VERSION_TTL = float(os.getenv("COURSE_VERSION_TTL", "2"))
+LESSON_CACHE_MAX_MB = float(os.getenv("LESSON_CACHE_MAX_MB", "128"))
+
+
+def _approx_size(value) -> int:
+    """Rough byte size of a nested dict/list of strings, good enough for a cache budget."""
+    if isinstance(value, dict):
+        return sum(_approx_size(k) + _approx_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(_approx_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+class CourseCache:
+    """
+    Process-wide LRU cache of course data shared by all Streamlit sessions.
+    Entries are keyed by (course_id, version) and bounded both by count and by
+    approximate size. Cached values are shared: callers must treat them as read-only.
+    """
+    def __init__(self, max_entries=COURSE_CACHE_MAX_ENTRIES, max_bytes=int(COURSE_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # (course_id, version) -> (value, size)
+        self._versions = {}             # course_id -> (version, checked_at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, course_id, version):
+        with self._lock:
+            entry = self._entries.get((course_id, version))
+            if entry is None:
+                return None
+            self._entries.move_to_end((course_id, version))
+            return entry[0]
+
+    def put(self, course_id, version, value):
+        size = _approx_size(value)
+        with self._lock:
+            self._drop(course_id)  # older versions of this course are dead weight now
+            self._entries[(course_id, version)] = (value, size)
+            self._bytes += size
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def cached_version(self, course_id):
+        """Returns the last known version if it was checked within COURSE_VERSION_TTL, else None."""
+        with self._lock:
+            known = self._versions.get(course_id)
+            if known and time.monotonic() - known[1] < COURSE_VERSION_TTL:
+                return known[0]
+            return None
+
+    def remember_version(self, course_id, version):
+        with self._lock:
+            self._versions[course_id] = (version, time.monotonic())
+
+    def patch(self, course_id, new_version, update):
+        """
+        Stores a patched copy of the cached course under `new_version` instead of
+        reloading it. `update(course)` edits the copy in place. Only the version just
+        before `new_version` may be patched: if that isn't cached (the course is not
+        cached, or another write happened since), the course is invalidated so the
+        next read loads it fresh.
+        """
+        with self._lock:
+            entry = self._entries.get((course_id, new_version - 1))
+            current = entry[0] if entry else None
+        if current is None:
+            self.invalidate(course_id)
+            return
+        patched = copy.deepcopy(current)
+        update(patched)
+        self.put(course_id, new_version, patched)
+        self.remember_version(course_id, new_version)
+
+    def invalidate(self, course_id):
+        """Forgets every cached version of a course (called by the write paths)."""
+        with self._lock:
+            self._drop(course_id)
+            self._versions.pop(course_id, None)
+
+    def _drop(self, course_id):
+        for key in [k for k in self._entries if k[0] == course_id]:
+            self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+class LessonContentCache:
+    """
+    Process-wide LRU cache of finished lesson bodies (text, script, quiz), bounded
+    by approximate size. Only complete lessons are cached, so entries never go
+    stale unless the course is regenerated, which calls invalidate_course().
+    """
+    def __init__(self, max_bytes=int(LESSON_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()   # lesson_id -> (content, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, lesson_id):
+        with self._lock:
+            entry = self._entries.get(lesson_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(lesson_id)
+            return entry[0]
+
+    def put(self, lesson_id, content):
+        size = _approx_size(content)
+        with self._lock:
+            if lesson_id in self._entries:
+                self._bytes -= self._entries.pop(lesson_id)[1]
+            self._entries[lesson_id] = (content, size)
+            self._bytes += size
+            while self._entries and self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+
+    def invalidate_course(self, course_id):
+        with self._lock:
+            for key in [k for k in self._entries if k.split(":", 1)[0] == course_id]:
+                self._bytes -= self._entries.pop(key)[1]
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes}
+
+
+COURSE_CACHE = CourseCache()
+LESSON_CACHE = LessonContentCache()
@@ -1,32 +1,141 @@
 import os
 import sys
+import json
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from database import connect_to_neo4j
+import database
+import telemetry
+from database import bootstrap_schema, make_course_id, course_id_of, ASSIGN_IDS_QUERY
+from agents.course_cache import COURSE_CACHE, LESSON_CACHE
 
-from agents.llm import LlmFactory  
+from agents.llm import get_cached_llm
 
 
 
 load_dotenv()
 
-#temp 0 for strict execution of prompts 
-llm = LlmFactory(mode="local",temperature=0).get_llm()
+def _llm():
+    #temp 0 for strict execution of prompts (created on first use)
+    return get_cached_llm(temperature=0)
 
-driver = connect_to_neo4j()
+# "skeleton": LLM returns a JSON outline inserted by one fixed query (default).
+# "cypher":   LLM writes the raw Cypher script (legacy).
+COURSE_BUILD_MODE = os.getenv("COURSE_BUILD_MODE", "skeleton")
 
-def run_cypher(query: str, parameters=None): 
-    """Executes the raw Cypher query against the NEO4J database."""
-    with driver.session() as session:
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+
+def ensure_schema():
+    """Runs the schema bootstrap once per process, on first use of the database."""
+    global _schema_ready
+    with _schema_lock:
+        if not _schema_ready:
+            bootstrap_schema()
+            _schema_ready = True
+
+# Batched lesson updates: one UNWIND statement per flush instead of one round trip per lesson.
+RESEARCH_BATCH_QUERY = """
+UNWIND $rows AS row
+MATCH (l:Lesson {id: row.id})
+SET l.research_notes = row.notes, l.source = row.source
+"""
+
+CONTENT_BATCH_QUERY = """
+UNWIND $rows AS row
+MATCH (l:Lesson {id: row.id})
+SET l.content_text = row.text,
+    l.video_script = row.script,
+    l.quiz_json = row.quiz,
+    l.status = 'complete'
+WITH DISTINCT l.course_id AS course_id
+MATCH (c:Course {id: course_id})
+SET c.version = coalesce(c.version, 0) + 1
+"""
+
+NEO4J_BATCH_SIZE = int(os.getenv("NEO4J_BATCH_SIZE", "16"))
+NEO4J_BATCH_MAX_DELAY = float(os.getenv("NEO4J_BATCH_MAX_DELAY", "2.0"))
+
+
+class LessonWriteBatcher:
+    """
+    Buffers lesson updates and writes them with a single parameterized UNWIND
+    statement in one transaction. A flush happens when `max_rows` rows are
+    buffered, `max_delay` seconds after the first buffered row, or on close.
+    If the batch transaction fails, rows are retried one by one so a bad row
+    is reported without losing the rest of the batch: rows that still fail are
+    kept in `failed` as (row, error) and their IDs returned by failed_ids().
+
+        with LessonWriteBatcher(RESEARCH_BATCH_QUERY) as batch:
+            batch.add({"id": ..., "title": ..., "notes": ..., "source": ...})
+    """
+    def __init__(self, query: str, max_rows: int = NEO4J_BATCH_SIZE, max_delay: float = NEO4J_BATCH_MAX_DELAY):
+        self.query = query
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.failed = []
+        self._rows = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def add(self, row: dict):
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.max_rows
+            if not full and self._timer is None:
+                self._timer = threading.Timer(self.max_delay, telemetry.bind_context(self.flush))
+                self._timer.daemon = True
+                self._timer.start()
+        if full:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            rows, self._rows = self._rows, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if not rows:
+            return
         try:
-            # Pass the parameters to the session.run() method
-            result = session.run(query, parameters or {}) 
-            return [record.data() for record in result]
+            write_lesson_rows(self.query, rows)
         except Exception as e:
-            print(f"❌ Cypher Execution Error: {e}")
-            return None
+            print(f"⚠️ Batch write of {len(rows)} lessons failed ({e}). Retrying row by row...")
+            for row in rows:
+                try:
+                    write_lesson_rows(self.query, [row])
+                except Exception as row_error:
+                    print(f"❌ Cypher Execution Error for '{row.get('title')}': {row_error}")
+                    self.failed.append((row, row_error))
+
+    def failed_ids(self) -> set:
+        return {row["id"] for row, _ in self.failed}
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
 
+    def __exit__(self, *exc):
+        self.close()
 
-def generate_course_cypher(topic: str) -> str:
+
+def write_lesson_rows(query: str, rows: list):
+    """Runs an UNWIND query for `rows` in one managed write transaction (raises on error)."""
+    database.execute_write(query, {"rows": rows})
+    invalidate_lessons(row["id"] for row in rows)
+
+
+def invalidate_lessons(lesson_ids):
+    """Drops the cached courses these lessons belong to."""
+    for course_id in {course_id_of(lesson_id) for lesson_id in lesson_ids}:
+        COURSE_CACHE.invalidate(course_id)
+
+
+def generate_course_cypher(topic: str, course_id: str) -> str:
     """
     Asks the LLM to design a course on `topic` and write the 
     Cypher query to insert it into Neo4j.
@@ -42,9 +151,9 @@ def generate_course_cypher(topic: str) -> str:
 
     ### GRAPH SCHEMA REQUIREMENTS
     - **Nodes**:
-      - `(:Course {{title: "..."}})`
-      - `(:Module {{title: "...", order_index: int}})`
-      - `(:Lesson {{title: "...", order_index: int, status: "pending", completed: false}})`
+      - `(:Course {{id: "{course_id}", title: "..."}})`
+      - `(:Module {{course_id: "{course_id}", title: "...", order_index: int}})`
+      - `(:Lesson {{course_id: "{course_id}", title: "...", order_index: int, status: "pending", completed: false}})`
     
     - **Relationships**:
       - `(:Course)-[:HAS_MODULE]->(:Module)`
@@ -58,6 +167,7 @@ def generate_course_cypher(topic: str) -> str:
     2. Use **MERGE** for all Modules and Lessons.
     3. Every node MUST have an `order_index` starting from 1 within its parent scope.
     4. Ensure the `NEXT_MODULE` and `NEXT_LESSON` chains are perfectly linear.
+    5. Every Module and Lesson MUST include `course_id: "{course_id}"` inside its MERGE pattern.
 
     ### OUTPUT INSTRUCTIONS
     - Return **ONLY** the raw Cypher query. 
@@ -65,19 +175,19 @@ def generate_course_cypher(topic: str) -> str:
     - **DO NOT** include any conversational text or explanations.
     
     ### EXAMPLE SYNTAX
-    MERGE (c:Course {{title: "{topic}"}})
-    MERGE (m1:Module {{title: "Basics", order_index: 1}})
-    MERGE (m2:Module {{title: "Advanced", order_index: 2}})
+    MERGE (c:Course {{id: "{course_id}"}}) SET c.title = "{topic}"
+    MERGE (m1:Module {{course_id: "{course_id}", title: "Basics", order_index: 1}})
+    MERGE (m2:Module {{course_id: "{course_id}", title: "Advanced", order_index: 2}})
     MERGE (c)-[:HAS_MODULE]->(m1)
     MERGE (c)-[:HAS_MODULE]->(m2)
     MERGE (m1)-[:NEXT_MODULE]->(m2)
-    MERGE (l1:Lesson {{title: "L1", order_index: 1, status: "pending", completed: false}})
+    MERGE (l1:Lesson {{course_id: "{course_id}", title: "L1", order_index: 1, status: "pending", completed: false}})
     MERGE (m1)-[:HAS_LESSON]->(l1)
     """
 
     # Invoke LLM
     print(f"🤔 AI is designing the course for: {topic}...")
-    response = llm.invoke(prompt)
+    response = _llm().invoke(prompt)
     
     # Clean Output (Strip Markdown if the LLM disobeyed)
     cleaned_cypher = response.content.replace("```cypher", "").replace("```", "").strip()
@@ -85,40 +195,202 @@ def generate_course_cypher(topic: str) -> str:
     return cleaned_cypher
 
 
-def create_course_in_db(topic: str):
+# Fixed, parameterized insert for a validated skeleton, so Neo4j can reuse the cached plan.
+INSERT_SKELETON_QUERY = """
+MERGE (c:Course {id: $course_id})
+SET c.title = $title, c.version = coalesce(c.version, 0) + 1
+WITH c
+CALL {
+  WITH c
+  UNWIND $modules AS mod
+  MERGE (m:Module {id: mod.id})
+  SET m.title = mod.title, m.order_index = mod.order_index, m.course_id = c.id
+  MERGE (c)-[:HAS_MODULE]->(m)
+  WITH c, m, mod
+  UNWIND mod.lessons AS les
+  MERGE (l:Lesson {id: les.id})
+  ON CREATE SET l.status = 'pending', l.completed = false
+  SET l.title = les.title, l.order_index = les.order_index, l.course_id = c.id
+  MERGE (m)-[:HAS_LESSON]->(l)
+  RETURN count(l) AS lessons
+}
+CALL {
+  UNWIND $module_links AS link
+  MATCH (a:Module {id: link.from}), (b:Module {id: link.to})
+  MERGE (a)-[:NEXT_MODULE]->(b)
+  RETURN count(*) AS module_links
+}
+CALL {
+  UNWIND $lesson_links AS link
+  MATCH (a:Lesson {id: link.from}), (b:Lesson {id: link.to})
+  MERGE (a)-[:NEXT_LESSON]->(b)
+  RETURN count(*) AS lesson_links
+}
+RETURN lessons, module_links, lesson_links
+"""
+
+
+def generate_course_skeleton(topic: str) -> dict:
+    """
+    Asks the LLM for a compact JSON outline of the course (modules and lessons
+    with their order) instead of a full Cypher script.
+    """
+    prompt = f"""
+    You are an expert curriculum designer.
+    Design a professional, logical curriculum for the topic: "{topic}".
+    Order the modules from basic to advanced. The course should have 4 Modules, and each Module should contain 4 Lessons.
+
+    ### OUTPUT FORMAT ###
+    Return ONLY a JSON object, no markdown and no explanations:
+    {{"modules": [{{"order_index": 1, "title": "...", "lessons": [{{"order_index": 1, "title": "..."}}, ...]}}, ...]}}
+    """
+    print(f"🤔 AI is designing the course outline for: {topic}...")
+    response = _llm().invoke(prompt)
+    clean_json = response.content.replace("```json", "").replace("```", "").strip()
+    return json.loads(clean_json)
+
+
+def _order_key(item) -> int:
+    """Sort key for outline entries; missing or malformed order_index sorts first."""
+    try:
+        return int(item.get("order_index", 0))
+    except (AttributeError, TypeError, ValueError):
+        return 0
+
+
+def validate_course_skeleton(skeleton: dict, course_id: str) -> dict:
+    """
+    Validates the LLM outline and turns it into the parameters of INSERT_SKELETON_QUERY.
+    Modules and lessons are sorted by order_index and renumbered 1..n, and
+    each gets its course-scoped ID. Raises ValueError if the outline is unusable.
+    """
+    modules = skeleton.get("modules") if isinstance(skeleton, dict) else None
+    if not isinstance(modules, list) or not modules:
+        raise ValueError("Skeleton has no modules.")
+
+    params = {"course_id": course_id, "modules": [], "module_links": [], "lesson_links": []}
+    ordered_modules = sorted(modules, key=_order_key)
+    for m_idx, module in enumerate(ordered_modules, start=1):
+        if not isinstance(module, dict) or not str(module.get("title", "")).strip():
+            raise ValueError(f"Module {m_idx} has no title.")
+        lessons = module.get("lessons")
+        if not isinstance(lessons, list) or not lessons:
+            raise ValueError(f"Module '{module['title']}' has no lessons.")
+
+        module_id = f"{course_id}:m{m_idx}"
+        module_row = {"id": module_id, "title": str(module["title"]).strip(), "order_index": m_idx, "lessons": []}
+        ordered_lessons = sorted(lessons, key=_order_key)
+        for l_idx, lesson in enumerate(ordered_lessons, start=1):
+            title = lesson.get("title") if isinstance(lesson, dict) else lesson
+            if not isinstance(title, str) or not title.strip():
+                raise ValueError(f"Lesson {l_idx} of module '{module_row['title']}' has no title.")
+            lesson_id = f"{module_id}:l{l_idx}"
+            module_row["lessons"].append({"id": lesson_id, "title": title.strip(), "order_index": l_idx})
+            if l_idx > 1:
+                params["lesson_links"].append({"from": f"{module_id}:l{l_idx - 1}", "to": lesson_id})
+
+        params["modules"].append(module_row)
+        if m_idx > 1:
+            params["module_links"].append({"from": f"{course_id}:m{m_idx - 1}", "to": module_id})
+    return params
+
+
+# Used to make course creation idempotent: an existing skeleton is never designed twice.
+COURSE_SKELETON_QUERY = """
+MATCH (c:Course {id: $course_id})-[:HAS_MODULE]->(:Module)-[:HAS_LESSON]->(l:Lesson)
+RETURN c.title as title, count(l) as lessons,
+       count(CASE WHEN l.content_text IS NOT NULL AND l.content_text <> "" THEN 1 END) as written
+"""
+
+
+def course_skeleton_exists(course_id: str) -> bool:
+    rows = database.execute_read(COURSE_SKELETON_QUERY, {"course_id": course_id})
+    return bool(rows and rows[0]["lessons"])
+
+
+def course_is_complete(course_id: str) -> bool:
+    """True if the course exists and every lesson has been written."""
+    rows = database.execute_read(COURSE_SKELETON_QUERY, {"course_id": course_id})
+    return bool(rows and rows[0]["lessons"] and rows[0]["written"] == rows[0]["lessons"])
+
+
+def create_course_in_db(topic: str, mode: str = None, reuse_existing: bool = False) -> str:
+    """
+    Designs the course skeleton for `topic`, stores it and returns the course ID.
+    With `reuse_existing`, a course whose skeleton is already stored is returned
+    as is, without another LLM call (used when a generation job is resumed).
+    """
+    ensure_schema()
+    course_id = make_course_id(topic)
+
+    if reuse_existing and course_skeleton_exists(course_id):
+        print(f"♻️ Course '{topic}' already has a skeleton, reusing it.")
+        return course_id
+
+    if (mode or COURSE_BUILD_MODE) == "skeleton":
+        try:
+            params = validate_course_skeleton(generate_course_skeleton(topic), course_id)
+        except ValueError as e:  # json.JSONDecodeError is a ValueError too
+            print(f"⚠️ Invalid course outline ({e}). Falling back to LLM-written Cypher...")
+        else:
+            print("🚀 Inserting course skeleton in Neo4j...")
+            database.execute_write(INSERT_SKELETON_QUERY, {**params, "title": topic})
+            COURSE_CACHE.invalidate(course_id)
+            LESSON_CACHE.invalidate_course(course_id)
+            invalidate_course_list()
+            print(f"✅ Course '{topic}' created successfully!")
+            return course_id
+
     # Step 1: Generate the Query
-    cypher_query = generate_course_cypher(topic)
+    cypher_query = generate_course_cypher(topic, course_id)
     print(f"\n📝 Generated Cypher:\n{'-'*20}\n{cypher_query}\n{'-'*20}")
     
-    # Step 2: Execute it
+    # Step 2: Execute it (failures propagate, so the job reports them instead of an empty course)
     print("🚀 Executing in Neo4j...")
-    run_cypher(cypher_query)
+    database.execute_write(cypher_query)
+
+    # Step 3: Give modules and lessons their stable, course-scoped IDs
+    database.execute_write(ASSIGN_IDS_QUERY, {"title": topic, "course_id": course_id})
+    COURSE_CACHE.invalidate(course_id)
+    LESSON_CACHE.invalidate_course(course_id)
+    invalidate_course_list()
     print(f"✅ Course '{topic}' created successfully!")
+    return course_id
 
 
 def get_full_course_data(course_title):
     """
     Queries Neo4j to build the full nested JSON for the UI.
     """
-    query = """
-    MATCH (c:Course)-[:HAS_MODULE]->(m:Module)-[:HAS_LESSON]->(l:Lesson)
-    WHERE c.title CONTAINS $title
-    RETURN m.title as module_title, 
-           l.title as lesson_title, 
-           l.content_text as text, 
-           l.video_script as script,
-           l.quiz_json as quiz_data,
-           l.completed as completed
-    ORDER BY m.title, l.title
-    """
-    results = run_cypher(query, {"title": course_title})
+    return load_course_data(make_course_id(course_title))
+
+
+FULL_COURSE_QUERY = """
+MATCH (c:Course {id: $course_id})-[:HAS_MODULE]->(m:Module)-[:HAS_LESSON]->(l:Lesson)
+RETURN c.title as course_title,
+       m.title as module_title,
+       l.id as lesson_id,
+       l.title as lesson_title,
+       l.content_text as text,
+       l.video_script as script,
+       l.quiz_json as quiz_data,
+       l.completed as completed,
+       l.status as status
+ORDER BY m.order_index, l.order_index
+"""
+
+
+def load_course_data(course_id):
+    """Builds the full nested course JSON for a course ID."""
+    results = database.execute_read(FULL_COURSE_QUERY, {"course_id": course_id})
     
     if not results:
         return None
 
     # Reconstruct nested JSON
     course_data = {
-        "course_title": course_title,
+        "course_id": course_id,
+        "course_title": results[0]['course_title'],
         "description": "AI-Generated Professional Curriculum",
         "modules": []
     }
@@ -131,30 +403,235 @@ def get_full_course_data(course_title):
             course_data["modules"].append(modules_dict[m_title])
         
         modules_dict[m_title]["lessons"].append({
+            "id": row['lesson_id'],
             "title": row['lesson_title'],
             "content": {
                 "text": row['text'] or "Content is being generated...",
                 "video_script": row['script'] or "Script is being generated...",
                 "quiz_json": row['quiz_data']
             },
-            "completed": row['completed'] # This field is used to track lesson completion in the UI
+            "completed": row['completed'], # This field is used to track lesson completion in the UI
+            "ready": row['status'] == 'complete'
         })
     
     return course_data
 
 
+COURSE_OUTLINE_QUERY = """
+MATCH (c:Course {id: $course_id})-[:HAS_MODULE]->(m:Module)-[:HAS_LESSON]->(l:Lesson)
+RETURN c.title as course_title,
+       m.title as module_title,
+       l.id as lesson_id,
+       l.title as lesson_title,
+       l.order_index as order_index,
+       l.completed as completed,
+       l.status as status
+ORDER BY m.order_index, l.order_index
+"""
+
+
+def load_course_outline(course_id):
+    """
+    Builds the lightweight course outline for the UI: titles, order and
+    completion state only. Lesson bodies are fetched on demand with get_lesson_content().
+    """
+    results = database.execute_read(COURSE_OUTLINE_QUERY, {"course_id": course_id})
+    if not results:
+        return None
+
+    outline = {
+        "course_id": course_id,
+        "course_title": results[0]['course_title'],
+        "description": "AI-Generated Professional Curriculum",
+        "modules": []
+    }
+    modules_dict = {}
+    for row in results:
+        m_title = row['module_title']
+        if m_title not in modules_dict:
+            modules_dict[m_title] = {"title": m_title, "lessons": []}
+            outline["modules"].append(modules_dict[m_title])
+        modules_dict[m_title]["lessons"].append({
+            "id": row['lesson_id'],
+            "title": row['lesson_title'],
+            "order_index": row['order_index'],
+            "completed": row['completed'],
+            "ready": row['status'] == 'complete'
+        })
+    return outline
+
+
+# Fetches one lesson's body plus the ID of the lesson after it (next in the module, or the
+# first lesson of the next module), so the next lesson can be prefetched without another lookup.
+LESSON_CONTENT_QUERY = """
+MATCH (l:Lesson {id: $id})
+OPTIONAL MATCH (l)-[:NEXT_LESSON]->(n:Lesson)
+OPTIONAL MATCH (l)<-[:HAS_LESSON]-(:Module)-[:NEXT_MODULE]->(:Module)-[:HAS_LESSON]->(f:Lesson {order_index: 1})
+RETURN l.content_text as text,
+       l.video_script as script,
+       l.quiz_json as quiz_data,
+       l.status as status,
+       coalesce(n.id, f.id) as next_id
+LIMIT 1
+"""
+
+_prefetch_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="lesson-prefetch")
+
+
+def _fetch_lesson_content(lesson_id):
+    """Reads one lesson body from Neo4j, caching it once the lesson is complete."""
+    rows = database.execute_read(LESSON_CONTENT_QUERY, {"id": lesson_id})
+    row = rows[0] if rows else {"text": None, "script": None, "quiz_data": None, "status": None, "next_id": None}
+    content = {
+        "text": row['text'] or "Content is being generated...",
+        "video_script": row['script'] or "Script is being generated...",
+        "quiz_json": row['quiz_data']
+    }
+    if row['status'] == 'complete':
+        LESSON_CACHE.put(lesson_id, content)
+    return content, row['next_id']
+
+
+def _prefetch_lesson(lesson_id):
+    if LESSON_CACHE.get(lesson_id) is None:
+        _fetch_lesson_content(lesson_id)
+
+
+def get_lesson_content(lesson_id, prefetch_next=True):
+    """
+    Returns the body of one lesson from the shared cache or Neo4j, and warms the
+    cache with the next lesson in NEXT_LESSON order in the background.
+    """
+    content = LESSON_CACHE.get(lesson_id)
+    if content is not None:
+        return content
+    content, next_id = _fetch_lesson_content(lesson_id)
+    if prefetch_next and next_id:
+        _prefetch_pool.submit(_prefetch_lesson, next_id)
+    return content
+
+
+COURSE_VERSION_QUERY = "MATCH (c:Course {id: $course_id}) RETURN c.version as version"
+
+
+def get_course(course_id):
+    """
+    Returns the course outline from the process-wide cache, keyed by (course_id, version).
+    Only a cheap version lookup hits Neo4j, and not even that within COURSE_VERSION_TTL.
+    """
+    version = COURSE_CACHE.cached_version(course_id)
+    if version is None:
+        rows = database.execute_read(COURSE_VERSION_QUERY, {"course_id": course_id})
+        if not rows:
+            return None
+        version = rows[0]['version'] or 0
+        COURSE_CACHE.remember_version(course_id, version)
+
+    course = COURSE_CACHE.get(course_id, version)
+    if course is None:
+        course = load_course_outline(course_id)
+        if course:
+            COURSE_CACHE.put(course_id, version, course)
+    return course
+
+
+PENDING_LESSONS_QUERY = """
+MATCH (c:Course {id: $course_id})-[:HAS_MODULE]->(m:Module)-[:HAS_LESSON]->(l:Lesson)
+WHERE l.content_text IS NULL OR l.content_text = ""
+RETURN l.id as id, l.title as title, c.title as course_name, l.research_notes as notes,
+       m.order_index as module_order, l.order_index as lesson_order
+ORDER BY m.order_index, l.order_index
+"""
+
+
+def get_pending_lessons(course_id):
+    """
+    Returns the lessons of a course that still need content, in curriculum order,
+    with any research notes gathered so far.
+    """
+    return database.execute_read(PENDING_LESSONS_QUERY, {"course_id": course_id})
+
+
+LESSON_STATE_QUERY = """
+MATCH (l:Lesson {id: $id})
+RETURN l.research_notes as notes, l.source as source,
+       (l.content_text IS NOT NULL AND l.content_text <> "") as written
+"""
+
+
+def get_lesson_state(lesson_id):
+    """What has already been saved for a lesson (notes, whether it is written), or None."""
+    rows = database.execute_read(LESSON_STATE_QUERY, {"id": lesson_id})
+    return rows[0] if rows else None
+
+
+# The library list changes only when a course is created, so it is shared and cached briefly.
+ALL_COURSES_QUERY = "MATCH (c:Course) RETURN c.title as title"
+COURSE_LIST_TTL = float(os.getenv("COURSE_LIST_TTL", "30"))
+_course_list = None  # (titles, time.monotonic() when read), or None when it must be read again
+
+
+def invalidate_course_list():
+    global _course_list
+    _course_list = None
+
+
 # Ability to fetch all courses from the dropdown in the UI
 def get_all_courses():
-    """Returns a list of all course titles saved in Neo4j."""
-    query = "MATCH (c:Course) RETURN c.title as title"
-    results = run_cypher(query)
-    return [row['title'] for row in results] if results else []
+    """Returns a list of all course titles saved in Neo4j. Raises if it can't be read (nothing is cached then)."""
+    global _course_list
+    cached = _course_list
+    if cached is not None and time.monotonic() - cached[1] < COURSE_LIST_TTL:
+        return cached[0]
+    ensure_schema()
+    results = database.execute_read(ALL_COURSES_QUERY)
+    titles = [row['title'] for row in results]
+    _course_list = (titles, time.monotonic())
+    return titles
 
 
-# Utility to mark a lesson as completed in the UI
-def mark_lesson_completed(lesson_title):
-    query = """
-    MATCH (l:Lesson {title: $title})
-    SET l.completed = true
+# Marks one lesson as completed and returns the new progress summary in the same round trip.
+COMPLETE_LESSON_QUERY = """
+MATCH (l:Lesson {id: $id})
+SET l.completed = true
+WITH l
+MATCH (c:Course {id: l.course_id})
+SET c.version = coalesce(c.version, 0) + 1
+WITH c
+MATCH (c)-[:HAS_MODULE]->(m:Module)-[:HAS_LESSON]->(x:Lesson)
+WITH c, m, x ORDER BY m.order_index, x.order_index
+WITH c, collect({id: x.id, title: x.title, completed: coalesce(x.completed, false)}) AS lessons
+WITH c, lessons, [x IN lessons WHERE NOT x.completed] AS remaining
+RETURN c.version AS version,
+       size(lessons) - size(remaining) AS completed,
+       size(lessons) AS total,
+       head(remaining).id AS next_lesson_id,
+       head(remaining).title AS next_lesson_title
+"""
+
+
+def complete_lesson(lesson_id):
     """
-    run_cypher(query, {"title": lesson_title})
\ No newline at end of file
+    Marks a lesson as completed and returns the progress summary
+    {"version", "completed", "total", "next_lesson_id", "next_lesson_title"}.
+    Raises if the write fails.
+    The cached course outline is patched in place of a reload.
+    """
+    rows = database.execute_write(COMPLETE_LESSON_QUERY, {"id": lesson_id})
+    if not rows:
+        return None
+    progress = rows[0]
+
+    def _mark(outline):
+        for module in outline["modules"]:
+            for lesson in module["lessons"]:
+                if lesson["id"] == lesson_id:
+                    lesson["completed"] = True
+
+    COURSE_CACHE.patch(course_id_of(lesson_id), progress["version"], _mark)
+    return progress
+
+
+# Utility to mark a lesson as completed in the UI
+def mark_lesson_completed(lesson_id):
+    complete_lesson(lesson_id)
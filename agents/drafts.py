@@ -0,0 +1,91 @@
+import os
+import re
+import time
+import threading
+
+# Kept separate from agents/professor.py so the UI can read drafts without importing LangChain.
+
+# lesson_id -> partial Markdown text of lessons currently being written
+LIVE_DRAFTS = {}
+_drafts_lock = threading.Lock()
+
+# When lessons are written in worker processes, drafts are mirrored into a store shared with
+# the UI process (a multiprocessing.Manager dict), at most once per DRAFT_SYNC_INTERVAL seconds.
+DRAFT_SYNC_INTERVAL = float(os.getenv("DRAFT_SYNC_INTERVAL", "0.5"))
+_shared_drafts = None
+_last_sync = {}
+
+
+def use_shared_store(store):
+    """Routes drafts through `store` (a dict-like shared between processes)."""
+    global _shared_drafts
+    _shared_drafts = store
+
+_TEXT_KEY = re.compile(r'"text"\s*:\s*"')
+_ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+
+
+def extract_partial_text(buffer: str):
+    """
+    Decodes the value of the "text" key from an incomplete JSON response,
+    up to wherever the stream currently is. Returns None until the key shows up.
+    """
+    match = _TEXT_KEY.search(buffer)
+    if not match:
+        return None
+    out = []
+    i = match.end()
+    while i < len(buffer):
+        ch = buffer[i]
+        if ch == '"':
+            break
+        if ch != '\\':
+            out.append(ch)
+            i += 1
+            continue
+        if i + 1 >= len(buffer):
+            break  # escape sequence not complete yet
+        esc = buffer[i + 1]
+        if esc == 'u':
+            if i + 6 > len(buffer):
+                break
+            try:
+                out.append(chr(int(buffer[i + 2:i + 6], 16)))
+            except ValueError:
+                pass
+            i += 6
+        else:
+            out.append(_ESCAPES.get(esc, esc))
+            i += 2
+    return "".join(out)
+
+
+def get_live_draft(lesson_id):
+    """Returns the partial text of a lesson that is still being written, if any."""
+    with _drafts_lock:
+        draft = LIVE_DRAFTS.get(lesson_id)
+    if draft is None and _shared_drafts is not None:
+        draft = _shared_drafts.get(lesson_id)
+    return draft
+
+
+def clear_draft(lesson_id):
+    """Drops the live draft once the finished lesson has been saved."""
+    with _drafts_lock:
+        LIVE_DRAFTS.pop(lesson_id, None)
+        _last_sync.pop(lesson_id, None)
+    if _shared_drafts is not None:
+        _shared_drafts.pop(lesson_id, None)
+
+
+def publish_draft(lesson_id, text):
+    """Stores the latest partial text of a lesson that is being written."""
+    with _drafts_lock:
+        LIVE_DRAFTS[lesson_id] = text
+        if _shared_drafts is None:
+            return
+        now = time.monotonic()
+        if now - _last_sync.get(lesson_id, 0) < DRAFT_SYNC_INTERVAL:
+            return
+        _last_sync[lesson_id] = now
+    _shared_drafts[lesson_id] = text
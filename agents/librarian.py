@@ -1,24 +1,58 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from tools.search import SEARCH_TOOLS  # Import the list of tools with @tool docstrings
-from agents.deconstructor import run_cypher
+from tools.search import SEARCH_TOOLS, search_tool, fan_out_search, merge_results  # Import the list of tools with @tool docstrings
+from agents.deconstructor import LessonWriteBatcher, RESEARCH_BATCH_QUERY
 from agents.llm import LlmFactory
+from agents.router import get_router, ROUTER_MODE
+import database
+from database import make_course_id
+import telemetry
 
-def execute_agent_research(llm, course_topic, lesson_title):
+# How many lessons are researched at the same time (1 = sequential).
+LIBRARIAN_MAX_WORKERS = int(os.getenv("LIBRARIAN_MAX_WORKERS", "4"))
+# "single": one routed source per lesson (default). "fanout": all sources at once, merged.
+LIBRARIAN_RESEARCH_MODE = os.getenv("LIBRARIAN_RESEARCH_MODE", "single")
+
+def choose_tool_with_llm(llm, course_topic, lesson_title):
     """
-    Uses tool binding to let the LLM choose and execute the best tool.
+    Uses tool binding to let the LLM choose the best tool. Returns (tool_name, tool_args),
+    or (None, None) if it didn't call one.
     """
     # Bind the tools to the LLM
     llm_with_tools = llm.bind_tools(SEARCH_TOOLS)
     query = f"Research the following lesson: '{lesson_title}' for a course titled '{course_topic}'."
-    # 1. LLM decides which tool to use
     response = llm_with_tools.invoke(query)
-    # 2. Check if the LLM actually called a tool
     if response.tool_calls:
         tool_call = response.tool_calls[0]
-        tool_name = tool_call["name"]
-        tool_args = tool_call["args"]
-        print(f"   🔎 Librarian chose [{tool_name}] for: '{lesson_title}'")
+        return tool_call["name"], tool_call["args"]
+    return None, None
+
+
+def execute_agent_research(llm, course_topic, lesson_title):
+    """
+    Picks the best tool with the local router, asking the LLM only when the router
+    is unsure (or ROUTER_MODE=llm), then executes it.
+    """
+    router = get_router()
+    decision = router.route(lesson_title, course_topic) if ROUTER_MODE != "llm" else None
+    if decision and decision.confident:
+        # 1. The local router decides, no LLM round trip
+        tool_name, tool_args = decision.tool, {"query": decision.query}
+        print(f"   🧭 Router chose [{tool_name}] ({decision.confidence:.0%}) for: '{lesson_title}'")
+        # Occasionally ask the LLM as well, only to measure how often they agree
+        llm_tool = choose_tool_with_llm(llm, course_topic, lesson_title)[0] if router.should_audit() else None
+        router.record(lesson_title, course_topic, decision, llm_tool=llm_tool, used="local")
+    else:
+        # 1. LLM decides which tool to use
+        tool_name, tool_args = choose_tool_with_llm(llm, course_topic, lesson_title)
+        router.record(lesson_title, course_topic, decision, llm_tool=tool_name, used="llm")
+        if tool_name:
+            print(f"   🔎 Librarian chose [{tool_name}] for: '{lesson_title}'")
+    # 2. Check if a tool was actually chosen
+    if tool_name:
         # Mapping names to the actual functions
         tool_map = {tool.name: tool for tool in SEARCH_TOOLS}
         selected_tool = tool_map.get(tool_name)
@@ -28,49 +62,241 @@ def execute_agent_research(llm, course_topic, lesson_title):
             return raw_result, tool_name
     # Fallback if no tool was called or something went wrong
     print(f"   ⚠️ No tool selected. Falling back to general search...")
-    return SEARCH_TOOLS.invoke({"query": f"{lesson_title} {course_topic}"}), "search_tool"
- 
+    return search_tool.invoke({"query": f"{lesson_title} {course_topic}"}), "search_tool"
+
+
+def research_all_sources(course_topic, lesson_title):
+    """
+    Asks Wikipedia, ArXiv and the web at the same time and merges whatever answers
+    before each source's deadline, the router's favourite source first.
+    Returns (raw_data, sources_used).
+    """
+    queries = {
+        "wiki_tool": lesson_title,
+        "arxiv_tool": f"{lesson_title} {course_topic}",
+        "search_tool": f"{lesson_title} {course_topic}",
+    }
+    decision = get_router().route(lesson_title, course_topic)
+    order = sorted(queries, key=lambda tool: -decision.probabilities.get(tool, 0))
+    results = fan_out_search(queries)
+    answered = [tool for tool in order if results[tool]["status"] == "ok"]
+    missed = [f"{tool} ({results[tool]['status']})" for tool in order if tool not in answered]
+    print(f"   🌐 Fan-out for '{lesson_title}': {', '.join(answered) or 'no sources'}"
+          + (f"; skipped {', '.join(missed)}" if missed else ""))
+    if not answered:
+        return f"No external research arrived in time for '{lesson_title}'.", "none"
+    return merge_results(results, order), "+".join(answered)
+
+
+# Raw research is trimmed to this many tokens (estimated) before it is summarized.
+RESEARCH_TOKEN_BUDGET = int(os.getenv("RESEARCH_TOKEN_BUDGET", "1200"))
+# "lesson": one summary call per lesson. "module": up to LIBRARIAN_SUMMARY_BATCH_SIZE lessons
+# of the same module are summarized in one structured call (staged mode).
+LIBRARIAN_SUMMARY_MODE = os.getenv("LIBRARIAN_SUMMARY_MODE", "lesson")
+LIBRARIAN_SUMMARY_BATCH_SIZE = int(os.getenv("LIBRARIAN_SUMMARY_BATCH_SIZE", "4"))
+
+SUMMARY_PROMPT = ChatPromptTemplate.from_template("""
+    Summarize the following raw research data into a concise set of notes for a professor.
+    Focus on facts, dates, and definitions. Keep it under 200 words.
+    RAW DATA: {data}
+    """)
+
+BATCH_SUMMARY_PROMPT = ChatPromptTemplate.from_template("""
+    You prepare notes for a professor writing the lessons of one module of the course "{course_title}".
+    For EACH lesson below, summarize its raw research data into a concise set of notes.
+    Focus on facts, dates, and definitions. Keep each lesson's notes under 200 words.
+
+    Return ONLY valid JSON in this format, with one entry per lesson ID:
+    {{"lessons": [{{"id": "<LESSON ID>", "notes": "<notes>"}}]}}
+
+    RESEARCH BATCH:
+    {lessons}
+    """)
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 characters per token for English text)."""
+    return len(text) // 4 + 1
+
+
+def trim_research(raw_data: str, max_tokens: int = None) -> str:
+    """
+    Drops repeated paragraphs and lines from raw tool output and cuts it to the
+    token budget, ending on a sentence boundary where possible.
+    """
+    max_tokens = max_tokens or RESEARCH_TOKEN_BUDGET
+    kept, seen, used = [], set(), 0
+    for paragraph in raw_data.split("\n\n"):
+        lines = []
+        for line in paragraph.splitlines():
+            key = " ".join(line.lower().split())
+            if key and key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+        paragraph = "\n".join(lines).strip()
+        if not paragraph:
+            continue
+        cost = estimate_tokens(paragraph)
+        if used + cost > max_tokens:
+            remaining = (max_tokens - used) * 4
+            cut = paragraph[:remaining]
+            cut = cut[:cut.rfind(". ") + 1] if ". " in cut else cut
+            if cut.strip():
+                kept.append(cut.strip())
+            break
+        kept.append(paragraph)
+        used += cost
+    return "\n\n".join(kept)
 
-def librarian_node(state, llm):
+
+def gather_research(llm, course_title, lesson_title):
+    """Fetches the raw research for one lesson, trimmed to the token budget. Returns (raw_data, source_used)."""
+    if LIBRARIAN_RESEARCH_MODE == "fanout":
+        raw_data, source_used = research_all_sources(course_title, lesson_title)
+    else:
+        raw_data, source_used = execute_agent_research(llm, course_title, lesson_title)
+    return trim_research(raw_data), source_used
+
+
+def summarize_notes(llm, raw_data):
+    chain = SUMMARY_PROMPT | llm | StrOutputParser()
+    return chain.invoke({"data": raw_data})
+
+
+def summarize_batch(llm, course_title, items):
+    """
+    Summarizes several lessons in one call. `items` are dicts with id, title and raw.
+    Returns {lesson_id: notes}; lessons the model left out are summarized one by one.
+    """
+    lessons = "\n\n".join(
+        f"LESSON ID: {item['id']}\nLESSON TITLE: {item['title']}\nRAW DATA: {item['raw']}" for item in items
+    )
+    chain = BATCH_SUMMARY_PROMPT | llm | StrOutputParser()
+    notes = {}
+    try:
+        raw_response = chain.invoke({"course_title": course_title, "lessons": lessons})
+        clean_json = raw_response.replace("```json", "").replace("```", "").strip()
+        for entry in json.loads(clean_json).get("lessons", []):
+            if entry.get("id") and entry.get("notes"):
+                notes[entry["id"]] = entry["notes"]
+    except Exception as e:
+        print(f"   ⚠️ Batched summary failed ({e}), summarizing lessons one by one...")
+    for item in items:
+        if item["id"] not in notes:
+            notes[item["id"]] = summarize_notes(llm, item["raw"])
+    return notes
+
+
+def research_lesson(llm, course_title, lesson_title):
+    """
+    Researches and summarizes a single lesson. Returns (notes, source_used).
+    """
+    # A. Intelligent Research (Binding Logic), trimmed to the token budget
+    raw_data, source_used = gather_research(llm, course_title, lesson_title)
+    # B. Summarize for the Professor
+    return summarize_notes(llm, raw_data), source_used
+
+
+def research_module_batches(llm, lessons, batch, results_log, max_workers):
+    """
+    Batched summary mode: gathers raw research for every lesson in parallel, then
+    summarizes each module's lessons in chunks of LIBRARIAN_SUMMARY_BATCH_SIZE per call.
+    """
+    gather = telemetry.bind_context(gather_research)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(gather, llm, item['course_name'], item['title']): item for item in lessons}
+        gathered = {}
+        for future in as_completed(futures):
+            item = futures[future]
+            try:
+                raw_data, source_used = future.result()
+                gathered[item['id']] = {**item, "raw": raw_data, "source": source_used}
+            except Exception as e:
+                print(f"   ❌ Research failed for '{item['title']}': {e}")
+                results_log.append(f"Failed to research '{item['title']}'")
+
+        # Chunks never mix modules, in curriculum order
+        chunks, current = [], []
+        for item in lessons:
+            if item['id'] not in gathered:
+                continue
+            if current and (len(current) >= LIBRARIAN_SUMMARY_BATCH_SIZE or current[-1]['module_id'] != item['module_id']):
+                chunks.append(current)
+                current = []
+            current.append(gathered[item['id']])
+        if current:
+            chunks.append(current)
+
+        print(f"📝 Librarian: Summarizing {len(gathered)} lessons in {len(chunks)} batched calls...")
+        summarize = telemetry.bind_context(summarize_batch)
+        futures = {pool.submit(summarize, llm, chunk[0]['course_name'], chunk): chunk for chunk in chunks}
+        for future in as_completed(futures):
+            try:
+                notes = future.result()
+            except Exception as e:
+                print(f"   ❌ Summary failed for {len(futures[future])} lessons: {e}")
+                continue
+            for item in futures[future]:
+                batch.add({"id": item['id'], "title": item['title'], "notes": notes[item['id']], "source": item['source']})
+                results_log.append(f"Researched '{item['title']}' using {item['source']}")
+
+
+UNRESEARCHED_LESSONS_QUERY = """
+MATCH (c:Course {id: $course_id})-[:HAS_MODULE]->(m)-[:HAS_LESSON]->(l:Lesson)
+WHERE l.research_notes IS NULL OR l.research_notes = ""
+RETURN l.id as id, l.title as title, c.title as course_name, m.id as module_id
+ORDER BY m.order_index, l.order_index
+"""
+
+
+def librarian_node(state, llm, max_workers=None):
     topic_from_state = state.get("topic", "General Course")
-    pending_query = """
-    MATCH (c:Course)-[:HAS_MODULE]->(m)-[:HAS_LESSON]->(l:Lesson)
-    WHERE c.title CONTAINS $course_title 
-      AND (l.research_notes IS NULL OR l.research_notes = "")
-    RETURN l.title as title, c.title as course_name
-    """ 
-    lessons_to_research = run_cypher(pending_query, {"course_title": topic_from_state})
+    course_id = state.get("course_id") or make_course_id(topic_from_state)
+    max_workers = max_workers or LIBRARIAN_MAX_WORKERS
+    lessons_to_research = database.execute_read(UNRESEARCHED_LESSONS_QUERY, {"course_id": course_id})
     if not lessons_to_research:
         print("🎉 Librarian: No pending lessons found.")
         return state
  
     results_log = []
- 
-    for item in lessons_to_research:
-        lesson_title = item['title']
-        actual_course_title = item['course_name'] 
-        # A. Intelligent Research (Binding Logic)
-        raw_data, source_used = execute_agent_research(llm, actual_course_title, lesson_title)
-        # B. Summarize for the Professor
-        summary_prompt = ChatPromptTemplate.from_template("""
-        Summarize the following raw research data into a concise set of notes for a professor.
-        Focus on facts, dates, and definitions. Keep it under 200 words.
-        RAW DATA: {data}
-        """)
-        chain = summary_prompt | llm | StrOutputParser()
-        clean_notes = chain.invoke({"data": raw_data})
-        # C. Save to Neo4j
-        update_query = """
-        MATCH (l:Lesson {title: $title})
-        SET l.research_notes = $notes, l.source = $source
-        """
-        run_cypher(update_query, {
-            "title": lesson_title, 
-            "notes": clean_notes,
-            "source": source_used
-        })
-        results_log.append(f"Researched '{lesson_title}' using {source_used}")
+    # C. Notes are saved to Neo4j through a batched UNWIND writer
+    batch = LessonWriteBatcher(RESEARCH_BATCH_QUERY)
+
+    if LIBRARIAN_SUMMARY_MODE == "module":
+        research_module_batches(llm, lessons_to_research, batch, results_log, max_workers)
+    elif max_workers <= 1:
+        for item in lessons_to_research:
+            clean_notes, source_used = research_lesson(llm, item['course_name'], item['title'])
+            batch.add({"id": item['id'], "title": item['title'], "notes": clean_notes, "source": source_used})
+            results_log.append(f"Researched '{item['title']}' using {source_used}")
+    else:
+        # Concurrent mode: the per-source limits in tools/search.py keep each API in check,
+        # and every lesson is saved as soon as its research finishes.
+        print(f"📚 Librarian: Researching {len(lessons_to_research)} lessons with {max_workers} workers...")
+        research = telemetry.bind_context(research_lesson)  # keep the course trace in worker threads
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            futures = {
+                pool.submit(research, llm, item['course_name'], item['title']): item
+                for item in lessons_to_research
+            }
+            for future in as_completed(futures):
+                lesson_id, lesson_title = futures[future]['id'], futures[future]['title']
+                try:
+                    clean_notes, source_used = future.result()
+                except Exception as e:
+                    print(f"   ❌ Research failed for '{lesson_title}': {e}")
+                    results_log.append(f"Failed to research '{lesson_title}'")
+                    continue
+                batch.add({"id": lesson_id, "title": lesson_title, "notes": clean_notes, "source": source_used})
+                results_log.append(f"Researched '{lesson_title}' using {source_used}")
+    batch.close()
+    # Notes that could not be saved are lost: report those lessons as failed
+    failed = {row["id"]: {"title": row["title"], "status": "failed"} for row, _ in batch.failed}
+    for lesson in failed.values():
+        results_log.append(f"Failed to save research for '{lesson['title']}'")
+    if failed:
+        state["lesson_progress"] = failed
  
     state["research_log"] = results_log
     return state
-
@@ -1,6 +1,10 @@
 import os
 import dotenv
-from langchain_openai import ChatOpenAI, AzureChatOpenAI
+from functools import lru_cache
+
+# Which backend the agents use; "router" spreads calls over LLM_ROUTER_BACKENDS.
+LLM_MODE = os.getenv("LLM_MODE", "local")
+
 
 class LlmFactory:
     """
@@ -8,41 +12,107 @@ class LlmFactory:
       "local"  — your local LiteLLM proxy / Ollama / any OpenAI-compatible endpoint
       "groq"   — Groq cloud via OpenAI-compatible endpoint
       "azure"  — Azure OpenAI 
+      "router" — load-balanced over LLM_ROUTER_BACKENDS with failover (agents/llm_router.py)
+
+    Rate limits: every backend gets a shared RateLimiter (agents/llm_limits.py).
+
+    Cache:
+      None   — cache deterministic (temperature 0) calls only
+      True   — always serve identical prompts from the on-disk cache
+      False  — bypass the cache
     """
-    def __init__(self, mode: str = "local", temperature: float = 0.5):
+    def __init__(self, mode: str = "local", temperature: float = 0.5, cache: bool | None = None):
         dotenv.load_dotenv()
         self.temperature = temperature
         self.mode = mode
+        self.cache = cache
         self._create_llm()
 
     def get_llm(self):
         return self.llm
 
+    def _get_cache(self):
+        from agents.llm_cache import get_llm_cache, cache_disabled
+        use_cache = self.temperature == 0 if self.cache is None else self.cache
+        if not use_cache or cache_disabled():
+            # Explicitly False so a global LangChain cache can't sneak in either
+            return False
+        return get_llm_cache(self.mode)
+
+    def _get_callbacks(self):
+        from agents.llm_callbacks import LlmTelemetryHandler
+        return [LlmTelemetryHandler(self.mode)]
+
     def _create_llm(self):
+        # Imported here so that importing this module stays cheap
+        from langchain_openai import ChatOpenAI, AzureChatOpenAI
+
         if self.mode == "local":
-            self.llm = ChatOpenAI(
+            llm = ChatOpenAI(
                 api_key=os.getenv("OPENAI_API_KEY"),
                 base_url=os.getenv("OPENAI_ENDPOINT", "http://localhost:4000"),
                 model=os.getenv("OPENAI_DEPLOYMENT_NAME", "gpt-4-turbo"),
                 temperature=self.temperature,
+                max_retries=0,  # the backend's RateLimiter retries, honouring Retry-After
             )
 
         elif self.mode == "groq":
-            self.llm = ChatOpenAI(
+            llm = ChatOpenAI(
                 api_key=os.getenv("GROQ_API_KEY"),
                 base_url=os.getenv("GROQ_ENDPOINT", "https://api.groq.com/openai/v1"),
                 model=os.getenv("GROQ_MODEL", "llama-3.3-70b-versatile"),
                 temperature=self.temperature,
+                max_retries=0,  # the backend's RateLimiter retries, honouring Retry-After
             )
 
         elif self.mode == "azure":
-            self.llm = AzureChatOpenAI(
+            llm = AzureChatOpenAI(
                 azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
                 azure_deployment=os.getenv("AZURE_OPENAI_DEPLOYMENT"),
                 api_key=os.getenv("AZURE_OPENAI_API_KEY"),
                 api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-02-15-preview"),
                 temperature=self.temperature,
+                max_retries=0,  # the backend's RateLimiter retries, honouring Retry-After
+            )
+
+        elif self.mode == "router":
+            from agents.llm_router import RouterChatModel, LLM_ROUTER_BACKENDS
+            if not LLM_ROUTER_BACKENDS or "router" in LLM_ROUTER_BACKENDS:
+                raise ValueError("LLM_ROUTER_BACKENDS must list the modes to route over, e.g. 'local,groq'.")
+            # Caching happens once, in front of the router
+            backends = [LlmFactory(mode=b, temperature=self.temperature, cache=False).get_llm()
+                        for b in LLM_ROUTER_BACKENDS]
+            self.llm = RouterChatModel(
+                backends=backends,
+                backend_names=LLM_ROUTER_BACKENDS,
+                cache=self._get_cache(),
+                callbacks=self._get_callbacks(),
             )
+            return
 
         else:
-            raise ValueError(f"Unknown LLM mode: '{self.mode}'. Choose 'local', 'groq', or 'azure'.")
\ No newline at end of file
+            raise ValueError(f"Unknown LLM mode: '{self.mode}'. Choose 'local', 'groq', 'azure' or 'router'.")
+
+        # Every client of a backend shares its rate and concurrency limits; cache hits skip them
+        from agents.llm_limits import RateLimitedChatModel, get_llm_limiter
+        self.llm = RateLimitedChatModel(
+            inner=llm,
+            limiter=get_llm_limiter(self.mode),
+            cache=self._get_cache(),
+            callbacks=self._get_callbacks(),
+        )
+
+
+def get_cached_llm(mode: str = None, temperature: float = 0.5):
+    """Builds an LLM client on first use and reuses it for the rest of the process (mode defaults to LLM_MODE)."""
+    return _cached_llm(mode or LLM_MODE, temperature)
+
+
+@lru_cache(maxsize=None)
+def _cached_llm(mode: str, temperature: float):
+    return LlmFactory(mode=mode, temperature=temperature).get_llm()
+
+
+def clear_llm_cache():
+    """Drops the cached clients so the next get_cached_llm() call builds fresh ones."""
+    _cached_llm.cache_clear()
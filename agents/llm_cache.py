@@ -0,0 +1,112 @@
+import os
+import time
+import json
+import hashlib
+import threading
+from langchain_core.caches import BaseCache
+from langchain_core.load import dumps, loads
+import telemetry
+from sqlite_store import connect
+
+# Where and how much we cache. Set LLM_CACHE_DISABLED=1 to bypass the cache entirely.
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".cache/llm_cache.sqlite")
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "5000"))
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+
+class LlmResponseCache(BaseCache):
+    """
+    Persistent, content-addressed cache for LLM responses stored in SQLite.
+    Keys hash the namespace (LLM mode), the model settings LangChain reports
+    (model, temperature, tools, ...) and the rendered prompt.
+    Entries expire after `ttl_seconds` and the least recently used ones are
+    evicted once the cache holds more than `max_entries`.
+    """
+    def __init__(self, path=LLM_CACHE_PATH, namespace="default",
+                 max_entries=LLM_CACHE_MAX_ENTRIES, ttl_seconds=LLM_CACHE_TTL_SECONDS):
+        self.path = path
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with connect(self.path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS llm_cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_used REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_llm_cache_last_used ON llm_cache (last_used)")
+
+    def _key(self, prompt, llm_string):
+        raw = json.dumps([self.namespace, llm_string, prompt])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def lookup(self, prompt, llm_string):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with connect(self.path) as conn:
+            row = conn.execute("SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)).fetchone()
+            if row and now - row[1] > self.ttl_seconds:
+                conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+                row = None
+            if row:
+                conn.execute("UPDATE llm_cache SET last_used = ? WHERE key = ?", (now, key))
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        telemetry.note_cache_lookup(bool(row))
+        return loads(row[0]) if row else None
+
+    def update(self, prompt, llm_string, return_val):
+        key = self._key(prompt, llm_string)
+        now = time.time()
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO llm_cache (key, value, created_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, dumps(return_val), now, now),
+            )
+            # LRU eviction: keep only the most recently used `max_entries` rows
+            conn.execute("""
+                DELETE FROM llm_cache WHERE key IN (
+                    SELECT key FROM llm_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def clear(self, **kwargs):
+        with connect(self.path) as conn:
+            conn.execute("DELETE FROM llm_cache")
+
+    def stats(self):
+        """Returns hit/miss counters for this process."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
+
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_llm_cache(namespace):
+    """Returns the process-wide cache for a namespace (one per LLM mode)."""
+    with _caches_lock:
+        if namespace not in _caches:
+            _caches[namespace] = LlmResponseCache(namespace=namespace)
+        return _caches[namespace]
+
+
+def cache_disabled():
+    return os.getenv("LLM_CACHE_DISABLED", "").lower() in ("1", "true", "yes")
@@ -0,0 +1,61 @@
+import threading
+from langchain_core.callbacks import BaseCallbackHandler
+import telemetry
+
+
+def _token_usage(response):
+    """Prompt/completion tokens from the provider's usage report, if it sent one."""
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    if usage:
+        return usage.get("prompt_tokens"), usage.get("completion_tokens")
+    # Streaming responses carry usage on the message instead
+    for generations in response.generations:
+        for generation in generations:
+            metadata = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if metadata:
+                return metadata.get("input_tokens"), metadata.get("output_tokens")
+    return None, None
+
+
+class LlmTelemetryHandler(BaseCallbackHandler):
+    """
+    Records every chat model call as an 'llm' span: latency, time to first token
+    when streaming, model, prompt/completion tokens and whether the cache answered.
+    """
+    def __init__(self, mode: str):
+        self.mode = mode
+        self._spans = {}
+        self._lock = threading.Lock()
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        params = kwargs.get("invocation_params") or {}
+        model = params.get("model") or params.get("model_name") or params.get("azure_deployment") or ""
+        # Clear any stale cache flag left by a call that never reached on_llm_end
+        telemetry.pop_cache_lookup()
+        span = telemetry.start_span("llm.chat", kind="llm", model=model, mode=self.mode)
+        with self._lock:
+            self._spans[run_id] = span
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self._spans.get(run_id)
+        if isinstance(span, telemetry.Span) and "first_token_s" not in span.attributes:
+            span.set(first_token_s=round(span.elapsed(), 4))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is None:
+            return
+        prompt_tokens, completion_tokens = _token_usage(response)
+        span.set(
+            prompt_tokens=prompt_tokens or 0,
+            completion_tokens=completion_tokens or 0,
+            cache_hit=bool(telemetry.pop_cache_lookup()),
+        )
+        span.end()
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            span = self._spans.pop(run_id, None)
+        if span is not None:
+            span.end(error=error)
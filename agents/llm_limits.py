@@ -0,0 +1,89 @@
+import os
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+from ratelimit import RateLimiter, get_limiter, RATE_LIMIT_MAX_RETRIES
+
+# Default limits per backend as (requests/min, tokens/min, max parallel calls); 0 = unlimited.
+# Override with LLM_<MODE>_RPM, LLM_<MODE>_TPM and LLM_<MODE>_MAX_CONCURRENCY.
+LLM_LIMIT_DEFAULTS = {
+    "local": (0, 0, 16),
+    "groq": (30, 12000, 4),
+    "azure": (0, 0, 8),
+}
+# Completion tokens reserved per call until the real usage is known.
+LLM_EXPECTED_COMPLETION_TOKENS = int(os.getenv("LLM_EXPECTED_COMPLETION_TOKENS", "500"))
+
+
+def get_llm_limiter(mode: str) -> RateLimiter:
+    """The limiter shared by every client of one backend in this process."""
+    rpm, tpm, concurrency = LLM_LIMIT_DEFAULTS.get(mode, (0, 0, 8))
+    prefix = f"LLM_{mode.upper()}_"
+    return get_limiter(
+        f"llm.{mode}",
+        requests_per_minute=float(os.getenv(prefix + "RPM", rpm)),
+        tokens_per_minute=float(os.getenv(prefix + "TPM", tpm)),
+        max_concurrency=int(os.getenv(prefix + "MAX_CONCURRENCY", concurrency)),
+    )
+
+
+def estimate_tokens(messages: List[BaseMessage]) -> int:
+    """Rough size of a call: ~4 characters per prompt token plus the expected completion."""
+    return sum(len(str(m.content)) for m in messages) // 4 + LLM_EXPECTED_COMPLETION_TOKENS
+
+
+class RateLimitedChatModel(BaseChatModel):
+    """
+    Chat model that sends every call to `inner` through its backend's RateLimiter,
+    which also retries throttled calls after Retry-After. Cache hits never reach it.
+    """
+    inner: BaseChatModel
+    limiter: RateLimiter
+
+    @property
+    def _llm_type(self) -> str:
+        # Same as the wrapped model, so cached responses keep matching
+        return self.inner._llm_type
+
+    @property
+    def _identifying_params(self) -> dict:
+        return self.inner._identifying_params
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        estimate = estimate_tokens(messages)
+        result = self.limiter.call(self.inner._generate, messages, stop=stop, tokens=estimate, **kwargs)
+        usage = (result.llm_output or {}).get("token_usage") or {}
+        self.limiter.settle_tokens(estimate, usage.get("total_tokens"))
+        return result
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any):
+        """Retries a throttled stream only if it failed before the first chunk."""
+        estimate = estimate_tokens(messages)
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            streamed = False
+            usage = None
+            try:
+                with self.limiter.slot(estimate):
+                    for chunk in self.inner._stream(messages, stop=stop, **kwargs):
+                        streamed = True
+                        usage = getattr(chunk.message, "usage_metadata", None) or usage
+                        if run_manager:
+                            run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                        yield chunk
+            except Exception as e:
+                if streamed or attempt == RATE_LIMIT_MAX_RETRIES or not self.limiter.should_retry(e):
+                    raise
+                self.limiter.note_retry(e, attempt)
+                continue
+            if usage:
+                self.limiter.settle_tokens(estimate, usage.get("total_tokens"))
+            return
@@ -0,0 +1,247 @@
+import os
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+# Backends (LlmFactory modes) the "router" mode spreads calls over.
+LLM_ROUTER_BACKENDS = [b.strip() for b in os.getenv("LLM_ROUTER_BACKENDS", "local,groq").split(",") if b.strip()]
+# A backend that hasn't answered within this many seconds counts as failed and the next one is tried.
+LLM_ROUTER_TIMEOUT = float(os.getenv("LLM_ROUTER_TIMEOUT", "90"))
+# Send a duplicate request to the next backend after this many seconds (0 = no hedging).
+LLM_ROUTER_HEDGE_AFTER = float(os.getenv("LLM_ROUTER_HEDGE_AFTER", "0"))
+# A failing backend is skipped for this long (times its consecutive failures, up to 5x).
+LLM_ROUTER_COOLDOWN = float(os.getenv("LLM_ROUTER_COOLDOWN", "15"))
+LLM_ROUTER_MAX_WORKERS = int(os.getenv("LLM_ROUTER_MAX_WORKERS", "32"))
+
+# Weight of the newest observation in the moving averages.
+_EWMA_ALPHA = 0.2
+
+
+class BackendHealth:
+    """Moving averages of latency and error rate for one backend, shared by all routers."""
+    def __init__(self, name: str):
+        self.name = name
+        self.latency = None       # seconds, EWMA of successful calls
+        self.error_rate = 0.0     # EWMA of 0/1 failures
+        self.calls = 0
+        self.errors = 0
+        self.consecutive_errors = 0
+        self.cooldown_until = 0.0
+        self.inflight = 0
+        self._lock = threading.Lock()
+
+    def started(self):
+        with self._lock:
+            self.inflight += 1
+
+    def succeeded(self, latency: float):
+        with self._lock:
+            self.inflight -= 1
+            self.calls += 1
+            self.consecutive_errors = 0
+            self.latency = latency if self.latency is None else (1 - _EWMA_ALPHA) * self.latency + _EWMA_ALPHA * latency
+            self.error_rate = (1 - _EWMA_ALPHA) * self.error_rate
+
+    def failed(self):
+        with self._lock:
+            self.inflight -= 1
+            self.calls += 1
+            self.errors += 1
+            self.consecutive_errors += 1
+            self.error_rate = (1 - _EWMA_ALPHA) * self.error_rate + _EWMA_ALPHA
+            self.cooldown_until = time.monotonic() + LLM_ROUTER_COOLDOWN * min(self.consecutive_errors, 5)
+
+    def timed_out(self):
+        """Counts a call given up on as a failure; the call itself is still in flight."""
+        with self._lock:
+            self.errors += 1
+            self.consecutive_errors += 1
+            self.error_rate = (1 - _EWMA_ALPHA) * self.error_rate + _EWMA_ALPHA
+            self.cooldown_until = time.monotonic() + LLM_ROUTER_COOLDOWN * min(self.consecutive_errors, 5)
+
+    def weight(self) -> float:
+        """Higher for fast, reliable, idle backends; backends cooling down get almost nothing."""
+        with self._lock:
+            if time.monotonic() < self.cooldown_until:
+                return 1e-6
+            latency = self.latency if self.latency is not None else 1.0  # unknown backends get tried
+            return 1.0 / (latency * (1 + self.inflight) * (1 + 10 * self.error_rate))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "latency_s": round(self.latency, 3) if self.latency is not None else None,
+                "error_rate": round(self.error_rate, 3),
+                "calls": self.calls,
+                "errors": self.errors,
+                "inflight": self.inflight,
+                "cooling_down": time.monotonic() < self.cooldown_until,
+            }
+
+
+_health = {}
+_health_lock = threading.Lock()
+
+
+def backend_health(name: str) -> BackendHealth:
+    with _health_lock:
+        if name not in _health:
+            _health[name] = BackendHealth(name)
+        return _health[name]
+
+
+def router_stats() -> dict:
+    """Observed latency, error rate and load of every backend, for monitoring."""
+    with _health_lock:
+        names = list(_health)
+    return {name: backend_health(name).snapshot() for name in names}
+
+
+@lru_cache(maxsize=None)
+def _call_pool() -> ThreadPoolExecutor:
+    # Calls run here so timeouts and hedges don't block on a slow backend
+    return ThreadPoolExecutor(max_workers=LLM_ROUTER_MAX_WORKERS, thread_name_prefix="llm-router")
+
+
+class RouterChatModel(BaseChatModel):
+    """
+    Chat model that spreads calls over several backends, weighted by their observed
+    latency and error rate. Fails over to the next backend on errors or timeouts,
+    and can hedge a slow call with a duplicate on another backend.
+    A regular chat model otherwise: bind_tools, LCEL chains and streaming work as usual.
+    """
+    backends: List[BaseChatModel]
+    backend_names: List[str]
+    timeout: float = LLM_ROUTER_TIMEOUT
+    hedge_after: float = LLM_ROUTER_HEDGE_AFTER
+
+    @property
+    def _llm_type(self) -> str:
+        return "router"
+
+    @property
+    def _identifying_params(self) -> dict:
+        return {"model": f"router({','.join(self.backend_names)})", "backends": self.backend_names}
+
+    def bind_tools(self, tools, **kwargs):
+        # Every backend speaks the OpenAI tool format
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _ordered_backends(self) -> list:
+        """Backend indexes in the order to try them: weighted random, so load spreads out."""
+        from agents.llm_limits import get_llm_limiter
+        remaining = list(range(len(self.backends)))
+        # A backend paused by its rate limiter (Retry-After) goes last instead of making us wait
+        weights = [backend_health(self.backend_names[i]).weight() *
+                   (1e-3 if get_llm_limiter(self.backend_names[i]).paused() else 1.0) for i in remaining]
+        order = []
+        while remaining:
+            index = random.choices(range(len(remaining)), weights=weights)[0]
+            order.append(remaining.pop(index))
+            weights.pop(index)
+        return order
+
+    def _call_backend(self, index: int, messages, stop, kwargs) -> ChatResult:
+        health = backend_health(self.backend_names[index])
+        health.started()
+        start = time.perf_counter()
+        try:
+            result = self.backends[index]._generate(messages, stop=stop, **kwargs)
+        except BaseException:
+            health.failed()
+            raise
+        health.succeeded(time.perf_counter() - start)
+        return ChatResult(generations=result.generations,
+                          llm_output={**(result.llm_output or {}), "backend": self.backend_names[index]})
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        order = self._ordered_backends()
+        pool = _call_pool()
+        pending = {}   # future -> backend index
+        errors = []
+        next_try = 0
+        started_at = {}
+
+        def launch():
+            nonlocal next_try
+            index = order[next_try]
+            next_try += 1
+            future = pool.submit(self._call_backend, index, messages, stop, kwargs)
+            pending[future] = index
+            started_at[future] = time.monotonic()
+
+        launch()
+        while pending:
+            now = time.monotonic()
+            # Time out calls that took too long; their backend counts as failed
+            for future in [f for f in pending if now - started_at[f] >= self.timeout]:
+                name = self.backend_names[pending.pop(future)]
+                backend_health(name).timed_out()
+                errors.append(f"{name}: timed out after {self.timeout:.0f}s")
+                print(f"⚠️ LLM backend {name} timed out, failing over...")
+            if not pending:
+                if next_try < len(order):
+                    launch()
+                    continue
+                break
+            hedge_due = self.hedge_after and len(pending) == 1 and next_try < len(order)
+            deadlines = [started_at[f] + self.timeout for f in pending]
+            if hedge_due:
+                deadlines.append(min(started_at[f] for f in pending) + self.hedge_after)
+            done, _ = wait(list(pending), timeout=max(0.0, min(deadlines) - time.monotonic()),
+                           return_when=FIRST_COMPLETED)
+            if not done:
+                if hedge_due and time.monotonic() - min(started_at[f] for f in pending) >= self.hedge_after:
+                    launch()  # hedge: the same request on the next backend, first answer wins
+                continue
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    return future.result()
+                except Exception as e:
+                    errors.append(f"{self.backend_names[index]}: {type(e).__name__}: {e}")
+            # Fail over: replace each failed call with the next backend
+            if not pending and next_try < len(order):
+                print(f"⚠️ LLM backend failed ({errors[-1]}), failing over...")
+                launch()
+        raise RuntimeError("All LLM backends failed: " + "; ".join(errors))
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any):
+        """Streams from the best backend; fails over only if it breaks before the first chunk."""
+        errors = []
+        for index in self._ordered_backends():
+            name = self.backend_names[index]
+            health = backend_health(name)
+            health.started()
+            start = time.perf_counter()
+            streamed = False
+            try:
+                for chunk in self.backends[index]._stream(messages, stop=stop, **kwargs):
+                    streamed = True
+                    if run_manager:
+                        run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+                    yield chunk
+            except GeneratorExit:
+                # The caller stopped reading; not the backend's fault
+                health.succeeded(time.perf_counter() - start)
+                raise
+            except Exception as e:
+                health.failed()
+                if streamed:
+                    raise
+                errors.append(f"{name}: {type(e).__name__}: {e}")
+                print(f"⚠️ LLM backend {name} failed to stream ({e}), failing over...")
+                continue
+            health.succeeded(time.perf_counter() - start)
+            return
+        raise RuntimeError("All LLM backends failed: " + "; ".join(errors))
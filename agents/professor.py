@@ -1,76 +1,125 @@
+import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from agents.deconstructor import run_cypher
- 
+from agents.deconstructor import LessonWriteBatcher, CONTENT_BATCH_QUERY
+import database
+from database import make_course_id
+import telemetry
+from agents.drafts import extract_partial_text, publish_draft, clear_draft
 
-def professor_node(state, llm):
+# Size this to what the LLM backend can serve in parallel (1 = sequential).
+PROFESSOR_MAX_WORKERS = int(os.getenv("PROFESSOR_MAX_WORKERS", "4"))
+
+# Stream tokens and expose the partial lesson text while it is being written.
+PROFESSOR_STREAMING = os.getenv("PROFESSOR_STREAMING", "true").lower() in ("1", "true", "yes")
+
+# Create the Full Content Chain
+# We use one prompt to encourage context consistency
+LESSON_PROMPT = ChatPromptTemplate.from_template("""
+    You are an EXPERT EDUCATOR. Based on the research notes provided, generate:
+    1. A clear, engaging Markdown lesson (under 1500 words).
+    2. A 1-minute video script with visual cues.
+    3. A 3-question multiple-choice quiz, based on Markdown lesson you created.
+
+    Research Notes: {notes}
+    Lesson Title: {title}
+
+    ### OUTPUT FORMAT ###
+    Your response must be a valid JSON object with keys: "text", "script", and "quiz".
+    The "quiz" key should be a list of objects: 
+    [ {{"question": "..", "options": ["A", "B", "C", "D"], "answer": "correct option text"}}, ... ]
+    Return ONLY the JSON.
+    """)
+
+
+def write_lesson(llm, title, notes, lesson_id=None):
+    """
+    Generates the lesson text, video script and quiz for one lesson and
+    returns the parsed JSON payload. When `lesson_id` is given (and streaming
+    is enabled), the partial lesson text is published as a live draft as tokens arrive.
+    """
+    print(f"   ✍️ Writing lesson: '{title}'...")
+
+    # Chain the prompt with the LLM and output parser
+    chain = LESSON_PROMPT | llm | StrOutputParser()
+    inputs = {"title": title, "notes": notes}
+    if lesson_id and PROFESSOR_STREAMING:
+        raw_response = ""
+        for chunk in chain.stream(inputs):
+            raw_response += chunk
+            partial = extract_partial_text(raw_response)
+            if partial:
+                publish_draft(lesson_id, partial)
+    else:
+        raw_response = chain.invoke(inputs)
+    # Clean and Parse
+    clean_json = raw_response.replace("```json", "").replace("```", "").strip()
+    return json.loads(clean_json)
+
+
+def lesson_row(lesson_id, title, data):
+    """Shapes one generated lesson into a row for CONTENT_BATCH_QUERY."""
+    return {
+        "id": lesson_id,
+        "title": title,
+        "text": data.get('text', ''),
+        "script": data.get('script', ''),
+        "quiz": json.dumps(data.get('quiz', []))
+    }
+
+
+UNWRITTEN_LESSONS_QUERY = """
+MATCH (c:Course {id: $course_id})-[:HAS_MODULE]->(m)-[:HAS_LESSON]->(l:Lesson)
+WHERE l.research_notes IS NOT NULL
+  AND (l.content_text IS NULL OR l.content_text = "")
+RETURN l.id as id, l.title as title, l.research_notes as notes
+ORDER BY m.order_index, l.order_index
+"""
+
+
+def professor_node(state, llm, max_workers=None):
     """
     Reads 'research_notes' from Neo4j and generates the final lesson content,
     video scripts.
     """
     course_title = state.get("course_title", state.get("topic"))
+    course_id = state.get("course_id") or make_course_id(course_title)
+    max_workers = max_workers or PROFESSOR_MAX_WORKERS
     print(f"🎓 Professor: Drafting content for course '{course_title}'...")
     
     # 1. Find lessons that have Research but NO Content
-    query = """
-    MATCH (c:Course)-[:HAS_MODULE]->(m)-[:HAS_LESSON]->(l:Lesson)
-    WHERE c.title CONTAINS $course_title 
-      AND l.research_notes IS NOT NULL 
-      AND (l.content_text IS NULL OR l.content_text = "")
-    RETURN l.title as title, l.research_notes as notes
-    """
-    
-    lessons_to_write = run_cypher(query, {"course_title": course_title})
+    lessons_to_write = database.execute_read(UNWRITTEN_LESSONS_QUERY, {"course_id": course_id})
     if not lessons_to_write:
         print("🎉 Professor: All researched lessons are already written!")
         return state
- 
+
+    # 2. Write lessons in parallel; each one is queued for saving as soon as it is done,
+    # and a failing lesson never blocks the others.
+    write = telemetry.bind_context(write_lesson)  # keep the course trace in worker threads
+    progress = {}  # lesson_id -> {"title", "status"}, as in the pipeline's lesson_progress
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool, \
+            LessonWriteBatcher(CONTENT_BATCH_QUERY) as batch:
+        futures = {
+            pool.submit(write, llm, lesson['title'], lesson['notes'], lesson['id']): lesson
+            for lesson in lessons_to_write
+        }
+        for future in as_completed(futures):
+            lesson_id, title = futures[future]['id'], futures[future]['title']
+            try:
+                batch.add(lesson_row(lesson_id, title, future.result()))
+                progress[lesson_id] = {"title": title, "status": "complete"}
+            except Exception as e:
+                print(f"   ❌ Error processing JSON for {title}: {e}")
+                progress[lesson_id] = {"title": title, "status": "failed"}
+
+    # Lessons written but not saved, even row by row, are failures too
+    for lesson_id in batch.failed_ids():
+        progress[lesson_id]["status"] = "failed"
+    state["lesson_progress"] = progress
+
+    # Everything is persisted now, so the live drafts are no longer needed
     for lesson in lessons_to_write:
-        title = lesson['title']
-        notes = lesson['notes']
-        print(f"   ✍️ Writing lesson: '{title}'...")
- 
-        # Create the Full Content Chain
-        # We use one prompt to encourage context consistency
-        prompt = ChatPromptTemplate.from_template("""
-        You are an EXPERT EDUCATOR. Based on the research notes provided, generate:
-        1. A clear, engaging Markdown lesson (under 1500 words).
-        2. A 1-minute video script with visual cues.
-        3. A 3-question multiple-choice quiz, based on Markdown lesson you created.
- 
-        Research Notes: {notes}
-        Lesson Title: {title}
- 
-        ### OUTPUT FORMAT ###
-        Your response must be a valid JSON object with keys: "text", "script", and "quiz".
-        The "quiz" key should be a list of objects: 
-        [ {{"question": "..", "options": ["A", "B", "C", "D"], "answer": "correct option text"}}, ... ]
-        Return ONLY the JSON.
-        """)
-        
-        # Chain the prompt with the LLM and output parser
-        chain = prompt | llm | StrOutputParser()
-        raw_response = chain.invoke({"title": title, "notes": notes})
-        try:
-            # Clean and Parse
-            clean_json = raw_response.replace("```json", "").replace("```", "").strip()
-            data = json.loads(clean_json)
-            # Save to Neo4j
-            update_query = """
-            MATCH (l:Lesson {title: $title})
-            SET l.content_text = $text, 
-                l.video_script = $script, 
-                l.quiz_json = $quiz,
-                l.status = 'complete'
-            """
-            run_cypher(update_query, {
-                "title": title,
-                "text": data.get('text', ''),
-                "script": data.get('script', ''),
-                "quiz": json.dumps(data.get('quiz', []))
-            })
-        except Exception as e:
-            print(f"   ❌ Error processing JSON for {title}: {e}")
- 
-    print(state)
\ No newline at end of file
+        clear_draft(lesson['id'])
+    return state
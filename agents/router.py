@@ -0,0 +1,293 @@
+import os
+import re
+import json
+import math
+import time
+import random
+import threading
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+# "local": route with rules + classifier, ask the LLM only when unsure (default).
+# "llm":   always let the LLM pick the tool (the original behaviour).
+ROUTER_MODE = os.getenv("ROUTER_MODE", "local")
+# Below this confidence the LLM makes the choice instead.
+ROUTER_MIN_CONFIDENCE = float(os.getenv("ROUTER_MIN_CONFIDENCE", "0.6"))
+# Without a keyword rule, the chosen tool also needs this many training examples sharing
+# a word with the lesson title, so a few labels can't make the classifier sure of itself.
+ROUTER_MIN_EVIDENCE = int(os.getenv("ROUTER_MIN_EVIDENCE", "3"))
+# Weight of the course title in the classifier, relative to the lesson title (0 = ignore it).
+# Kept low so the labels of one course nudge, but never decide, the tool for its other lessons.
+ROUTER_COURSE_WEIGHT = float(os.getenv("ROUTER_COURSE_WEIGHT", "0.3"))
+# Share of confident local decisions that are also sent to the LLM, only to measure agreement.
+ROUTER_AUDIT_RATE = float(os.getenv("ROUTER_AUDIT_RATE", "0"))
+# Every routing decision is appended here (JSON lines); LLM choices in it also train the classifier.
+ROUTER_LOG_PATH = os.getenv("ROUTER_LOG_PATH", ".cache/router_decisions.jsonl")
+
+TOOLS = ("wiki_tool", "arxiv_tool", "search_tool")
+
+# Keyword rules mirror the tool docstrings in tools/search.py. Weights are added to the
+# classifier's log-score, so one strong keyword is usually enough to decide.
+KEYWORD_RULES = {
+    "wiki_tool": {
+        "history": 2.0, "historical": 2.0, "biography": 2.5, "origins": 1.5, "origin": 1.5, "definition": 1.5,
+        "definitions": 1.5, "what is": 1.0, "introduction to": 0.8, "overview": 0.8, "century": 1.5, "war": 1.5,
+        "empire": 2.0, "revolution": 1.5, "philosophy": 1.0, "geography": 1.5, "culture": 1.0, "famous": 1.5,
+        "ancient": 2.0, "medieval": 2.0, "concept": 0.8, "concepts": 0.8, "fundamentals": 0.8, "basics": 0.8,
+    },
+    "arxiv_tool": {
+        "transformer": 2.5, "transformers": 2.5, "attention mechanism": 2.5, "neural network": 2.0,
+        "deep learning": 2.5, "diffusion model": 2.5, "reinforcement learning": 2.0, "quantum": 2.5,
+        "theorem": 2.5, "proof": 1.5, "lemma": 2.5, "conjecture": 2.5, "state of the art": 2.0,
+        "research": 1.0, "architecture": 1.0, "architectures": 1.0, "convolutional": 2.5, "gradient": 1.5,
+        "optimization": 1.0, "topology": 2.0, "algebraic": 1.5, "stochastic": 1.5, "bayesian": 1.5,
+        "embedding": 1.5, "embeddings": 1.5, "llm": 2.0, "large language model": 2.5, "gan": 2.0,
+    },
+    "search_tool": {
+        "how to": 2.5, "install": 2.5, "installation": 2.5, "setup": 2.0, "setting up": 2.0, "configure": 2.0,
+        "best practices": 2.5, "tutorial": 2.0, "hands-on": 2.0, "example": 1.0, "examples": 1.0,
+        "code": 1.0, "deploy": 2.0, "deployment": 2.0, "tools": 1.0, "framework": 1.0, "library": 1.0,
+        "current": 1.5, "latest": 2.0, "trends": 2.0, "market": 1.5,
+        "business": 1.5, "marketing": 2.0, "startup": 2.0, "pricing": 2.0, "career": 2.0, "tips": 2.0,
+        "workflow": 1.0, "troubleshooting": 2.5, "debugging": 2.0, "api": 1.5, "docker": 2.5,
+    },
+}
+
+# A year no older than RECENT_YEARS (e.g. "AI Trends in 2026") asks for current information.
+_YEAR_RE = re.compile(r"\b(?:19|20)\d{2}\b")
+RECENT_YEARS = 2
+RECENT_YEAR_WEIGHT = 2.0
+
+# Small built-in training set so the classifier works before anything is logged.
+SEED_EXAMPLES = [
+    ("The Fall of the Roman Empire", "wiki_tool"),
+    ("Origins of the Renaissance", "wiki_tool"),
+    ("Who Was Alan Turing", "wiki_tool"),
+    ("Key Definitions in Microeconomics", "wiki_tool"),
+    ("The French Revolution and Its Causes", "wiki_tool"),
+    ("Introduction to Photosynthesis", "wiki_tool"),
+    ("Major Schools of Greek Philosophy", "wiki_tool"),
+    ("The Structure of the Cell", "wiki_tool"),
+    ("History of the Internet", "wiki_tool"),
+    ("Plate Tectonics Basics", "wiki_tool"),
+    ("Self-Attention and the Transformer Architecture", "arxiv_tool"),
+    ("Quantum Entanglement and Bell Inequalities", "arxiv_tool"),
+    ("Convergence Proofs for Stochastic Gradient Descent", "arxiv_tool"),
+    ("Diffusion Models for Image Generation", "arxiv_tool"),
+    ("Policy Gradient Methods in Reinforcement Learning", "arxiv_tool"),
+    ("Variational Autoencoders", "arxiv_tool"),
+    ("Graph Neural Networks", "arxiv_tool"),
+    ("Scaling Laws for Large Language Models", "arxiv_tool"),
+    ("Quantum Error Correction Codes", "arxiv_tool"),
+    ("The Riemann Hypothesis and Prime Distribution", "arxiv_tool"),
+    ("How to Install Python and Set Up a Virtual Environment", "search_tool"),
+    ("Best Practices for REST API Design", "search_tool"),
+    ("Deploying a Web App with Docker", "search_tool"),
+    ("Social Media Marketing Strategies", "search_tool"),
+    ("Writing Your First React Component", "search_tool"),
+    ("Pricing Your Freelance Services", "search_tool"),
+    ("Current Trends in Remote Work", "search_tool"),
+    ("Building a Budget Spreadsheet", "search_tool"),
+    ("Troubleshooting Common Git Errors", "search_tool"),
+    ("Choosing a Beginner Camera", "search_tool"),
+]
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+STOPWORDS = {"a", "an", "and", "the", "of", "in", "on", "for", "to", "with", "your", "its", "is", "by", "from", "vs"}
+
+
+def tokenize(text: str) -> list:
+    """Lowercase word tokens without stopwords; multi-word phrases are left to KEYWORD_RULES."""
+    return [w for w in _TOKEN_RE.findall(text.lower()) if w not in STOPWORDS]
+
+
+def course_tokens(course_title: str) -> list:
+    """Course title words, kept apart from lesson words so they can be weighted separately."""
+    return ["course:" + w for w in tokenize(course_title or "")]
+
+
+class NaiveBayesClassifier:
+    """
+    Multinomial naive Bayes with Laplace smoothing; tiny, offline and incremental.
+    Scores average the per-word log-likelihoods instead of summing them, which keeps
+    the probabilities from saturating on correlated words. Course title words are a
+    separate feature set, averaged on their own and scaled by ROUTER_COURSE_WEIGHT.
+    """
+    def __init__(self, labels=TOOLS):
+        self.labels = list(labels)
+        self.doc_counts = Counter()
+        self.word_counts = defaultdict(Counter)
+        self.doc_freq = defaultdict(Counter)  # label -> word -> examples containing it
+        self.total_words = Counter()
+        self.vocabulary = set()
+        self._lock = threading.Lock()
+
+    def learn(self, text: str, label: str, course_title: str = ""):
+        if label not in self.labels:
+            return
+        tokens = tokenize(text) + course_tokens(course_title)
+        with self._lock:
+            self.doc_counts[label] += 1
+            self.word_counts[label].update(tokens)
+            self.doc_freq[label].update(set(tokens))
+            self.total_words[label] += len(tokens)
+            self.vocabulary.update(tokens)
+
+    def log_scores(self, text: str, course_title: str = "") -> dict:
+        feature_sets = [(tokenize(text), 1.0), (course_tokens(course_title), ROUTER_COURSE_WEIGHT)]
+        with self._lock:
+            total_docs = sum(self.doc_counts.values())
+            vocab_size = len(self.vocabulary) or 1
+            scores = {}
+            for label in self.labels:
+                score = math.log((self.doc_counts[label] + 1) / (total_docs + len(self.labels)))
+                denominator = self.total_words[label] + vocab_size
+                for tokens, weight in feature_sets:
+                    known = [t for t in tokens if t in self.vocabulary]  # unseen words carry no evidence either way
+                    if known and weight:
+                        mean = sum(math.log((self.word_counts[label][t] + 1) / denominator) for t in known) / len(known)
+                        score += weight * mean
+                scores[label] = score
+        return scores
+
+    def evidence(self, text: str, label: str) -> int:
+        """Training examples of `label` that share a word with `text` (counted once per word)."""
+        with self._lock:
+            return sum(self.doc_freq[label][t] for t in set(tokenize(text)))
+
+
+def _softmax(scores: dict) -> dict:
+    top = max(scores.values())
+    exps = {k: math.exp(v - top) for k, v in scores.items()}
+    total = sum(exps.values())
+    return {k: v / total for k, v in exps.items()}
+
+
+class RouteDecision:
+    def __init__(self, tool: str, query: str, confidence: float, probabilities: dict, rules_matched: list,
+                 evidence: int = 0):
+        self.tool = tool
+        self.query = query
+        self.confidence = confidence
+        self.probabilities = probabilities
+        self.rules_matched = rules_matched
+        self.evidence = evidence
+
+    @property
+    def confident(self) -> bool:
+        if self.confidence < ROUTER_MIN_CONFIDENCE:
+            return False
+        return bool(self.rules_matched) or self.evidence >= ROUTER_MIN_EVIDENCE
+
+
+class ToolRouter:
+    """
+    Picks a search tool for a lesson without an LLM round trip: keyword rules on the
+    lesson title plus a naive Bayes classifier over the lesson and course titles. Trained
+    on SEED_EXAMPLES and on every LLM choice found in the decision log. The course title
+    is down-weighted (ROUTER_COURSE_WEIGHT) and never counts as evidence, so the labels
+    of one course don't decide the tool for every other lesson in it.
+    """
+    def __init__(self, log_path: str = ROUTER_LOG_PATH):
+        self.log_path = log_path
+        self.classifier = NaiveBayesClassifier()
+        self._log_lock = threading.Lock()
+        for text, tool in SEED_EXAMPLES:
+            self.classifier.learn(text, tool)
+        for entry in read_decisions(log_path):
+            if entry.get("llm_tool"):
+                self.classifier.learn(entry["lesson"], entry["llm_tool"], entry.get("course", ""))
+
+    def route(self, lesson_title: str, course_title: str) -> RouteDecision:
+        scores = self.classifier.log_scores(lesson_title, course_title)
+        lowered = f" {lesson_title.lower()} "
+        matched = []
+        # Rules look at the lesson title only; the course title is a weak classifier feature
+        for tool, keywords in KEYWORD_RULES.items():
+            for keyword, weight in keywords.items():
+                if re.search(rf"\b{re.escape(keyword)}\b", lowered):
+                    scores[tool] += weight
+                    matched.append(keyword)
+        recent = time.localtime().tm_year - RECENT_YEARS
+        years = [year for year in _YEAR_RE.findall(lowered) if int(year) >= recent]
+        if years:
+            scores["search_tool"] += RECENT_YEAR_WEIGHT
+            matched.append(years[0])
+        probabilities = _softmax(scores)
+        tool = max(probabilities, key=probabilities.get)
+        query = lesson_title if tool == "wiki_tool" else f"{lesson_title} {course_title}"
+        return RouteDecision(tool, query, round(probabilities[tool], 4), probabilities, matched,
+                             evidence=self.classifier.evidence(lesson_title, tool))
+
+    def record(self, lesson_title: str, course_title: str, decision: RouteDecision = None,
+               llm_tool: str = None, used: str = None):
+        """Appends one decision to the log; an LLM choice also trains the classifier."""
+        entry = {
+            "ts": time.time(),
+            "course": course_title,
+            "lesson": lesson_title,
+            "local_tool": decision.tool if decision else None,
+            "confidence": decision.confidence if decision else None,
+            "rules": decision.rules_matched if decision else [],
+            "evidence": decision.evidence if decision else None,
+            "llm_tool": llm_tool,
+            "used": used,
+        }
+        if llm_tool:
+            self.classifier.learn(lesson_title, llm_tool, course_title)
+        if not self.log_path:
+            return
+        try:
+            with self._log_lock:
+                os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+        except OSError as e:
+            print(f"⚠️ Could not log routing decision: {e}")
+
+    def should_audit(self) -> bool:
+        return ROUTER_AUDIT_RATE > 0 and random.random() < ROUTER_AUDIT_RATE
+
+
+def read_decisions(path: str = ROUTER_LOG_PATH) -> list:
+    if not path or not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entries.append(json.loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+def router_accuracy(path: str = ROUTER_LOG_PATH) -> dict:
+    """
+    Agreement of the local router with the LLM on every logged decision where both
+    chose a tool (low-confidence fallbacks and audits), with a confusion table.
+    """
+    decisions = read_decisions(path)
+    compared = [e for e in decisions if e.get("local_tool") and e.get("llm_tool")]
+    confusion = defaultdict(Counter)
+    for e in compared:
+        confusion[e["llm_tool"]][e["local_tool"]] += 1
+    agreed = sum(confusion[t][t] for t in confusion)
+    return {
+        "decisions": len(decisions),
+        "local_only": sum(1 for e in decisions if e.get("used") == "local" and not e.get("llm_tool")),
+        "compared": len(compared),
+        "accuracy": round(agreed / len(compared), 4) if compared else None,
+        "confusion": {llm: dict(local) for llm, local in confusion.items()},  # llm choice -> local choice counts
+    }
+
+
+@lru_cache(maxsize=None)
+def get_router() -> ToolRouter:
+    """One router per process, trained on first use."""
+    return ToolRouter()
+
+
+if __name__ == "__main__":
+    # Usage: python -m agents.router   (prints how often the local router agreed with the LLM)
+    print(json.dumps(router_accuracy(), indent=2))
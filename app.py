@@ -1,8 +1,11 @@
 import streamlit as st
 import time
 import json
-from workflow.workflow import langgraph_app
-from agents.deconstructor import get_full_course_data, get_all_courses, mark_lesson_completed
+from workflow.jobs import start_generation, unfinished_jobs
+from workflow.worker_pool import QueueFullError
+from agents.deconstructor import get_course, get_lesson_content, get_all_courses, complete_lesson
+from database import make_course_id
+from agents.drafts import get_live_draft
 
 
 st.set_page_config(page_title="AI-demy", layout="wide", page_icon="🎓", initial_sidebar_state="expanded")
@@ -16,12 +19,163 @@ def load_css(file_name):
 load_css("assets/style.css")
 
 
-if 'course_data' not in st.session_state:
-    st.session_state['course_data'] = None
+# Sessions only keep the course ID and their position; the course itself lives in the shared cache
+if 'course_id' not in st.session_state:
+    st.session_state['course_id'] = None
 if 'selected_module_idx' not in st.session_state:
     st.session_state['selected_module_idx'] = 0
 if 'selected_lesson_idx' not in st.session_state:
     st.session_state['selected_lesson_idx'] = 0
+if 'generation_job' not in st.session_state:
+    st.session_state['generation_job'] = None
+if 'last_timing' not in st.session_state:
+    st.session_state['last_timing'] = None
+
+# Feedback queued before a rerun is shown on the next run instead of sleeping first
+if st.session_state.pop('celebrate', False):
+    st.balloons()
+if 'pending_toast' in st.session_state:
+    message, icon = st.session_state.pop('pending_toast')
+    st.toast(message, icon=icon)
+
+# How often the open course is refreshed while lessons are still being generated
+GENERATION_POLL_SECONDS = 2
+
+
+@st.fragment(run_every=1)
+def render_live_draft(lesson_id, fallback_text):
+    """Shows the lesson text as the Professor streams it, refreshed every second."""
+    draft = get_live_draft(lesson_id)
+    if draft:
+        st.caption("✍️ The Professor is writing this lesson right now...")
+        st.markdown(draft + " ▌")
+    else:
+        st.markdown(fallback_text)
+
+
+def render_job_event(status_box, node_name, metadata):
+    """Shows one LangGraph node update in the status panel."""
+    if node_name == "deconstructor":
+        st.write("🏗️ **Course Creator:**Creating Curriculum Content.")
+        status_box.update(label="📚 Researching Knowledge...", state="running")
+        
+    elif node_name == "librarian":
+        st.write("🔍 **Librarian:** Scouring Wikipedia & ArXiv & the Web for facts.")
+        status_box.update(label="✍️ Drafting Content...", state="running")
+        
+    elif node_name == "professor":
+        st.write("🎓 **Professor:** Generating lessons, scripts, and quizzes.")
+        for lesson in (metadata.get("lesson_progress") or {}).values():
+            if lesson["status"] == "failed":
+                st.write(f"❌ **Lesson:** {lesson['title']}")
+        status_box.update(label="✨ Finalizing Course...", state="running")
+
+    elif node_name == "lesson_pipeline":
+        for lesson in metadata["lesson_progress"].values():
+            icon = "✅" if lesson["status"] == "complete" else "❌"
+            st.write(f"{icon} **Lesson:** {lesson['title']}")
+        status_box.update(label="✍️ Researching & Drafting Lessons...", state="running")
+
+
+def render_timing_summary(summary):
+    """Per-course timing from the telemetry spans: where generation time went."""
+    if not summary:
+        return
+    st.write(f"⏱️ **Timing:** {summary['wall_s']:.1f}s wall time")
+    llm, search, db = summary["llm"], summary["search"], summary["db"]
+    rows = [
+        {"stage": f"node: {name}", "calls": node["runs"], "total_s": node["total_s"], "max_s": node["max_s"]}
+        for name, node in summary["nodes"].items()
+    ] + [
+        {"stage": "LLM", "calls": llm["calls"], "total_s": llm["total_s"]},
+        {"stage": "search", "calls": search["calls"], "total_s": search["total_s"]},
+        {"stage": "Neo4j", "calls": db["calls"], "total_s": db["total_s"]},
+    ]
+    st.dataframe(rows, hide_index=True)
+    st.caption(
+        f"LLM: {llm['prompt_tokens']} prompt + {llm['completion_tokens']} completion tokens, "
+        f"{llm['cache_hits']} cache hits · Search: {search['bytes'] // 1024} KB, {search['cache_hits']} cache hits · "
+        "call times are summed across parallel calls"
+    )
+
+
+def cancel_queued_job(job):
+    if job.cancel():
+        st.session_state['pending_toast'] = (f"Cancelled the generation of '{job.topic}'.", "⏹️")
+    st.session_state['generation_job'] = None
+
+
+def generate_course(topic):
+    """
+    Starts generating the course in the background and opens it as soon as
+    the first lesson is ready. Later lessons fill in while the user reads.
+    """
+    try:
+        job = start_generation(topic)
+    except QueueFullError as e:
+        # Backpressure from the worker pool: don't queue more than it can take
+        st.warning(f"⏳ {e}")
+        return
+    except Exception as e:
+        st.error(f"⚠️ Could not start generating '{topic}': {e}")
+        return
+    st.session_state['generation_job'] = job
+    if job.state == "queued":
+        # A callback, so the click is handled even though this run is busy waiting below
+        st.button("⏹️ Cancel", on_click=cancel_queued_job, args=(job,))
+    with st.status("🛸 Deploying AI Agents...", expanded=True) as status_box:
+        shown = 0
+        while True:
+            ready = job.wait_first_lesson(0.5)
+            if job.state == "queued":
+                status_box.update(label="⏳ Waiting for a free generation worker...", state="running")
+            new_events = job.events[shown:]
+            shown += len(new_events)
+            for node_name, metadata in new_events:
+                render_job_event(status_box, node_name, metadata)
+            if ready:
+                break
+
+        if job.state == "cancelled":
+            status_box.update(label="⏹️ Generation cancelled.", state="error", expanded=False)
+            st.session_state['generation_job'] = None
+            return
+        if job.state == "failed":
+            status_box.update(label="❌ Course generation failed.", state="error", expanded=True)
+            st.error(f"Generation failed: {job.error}")
+            st.session_state['generation_job'] = None
+            return
+        render_timing_summary(job.timing_summary())
+        if job.existing:
+            status_box.update(label="📚 This course is already in your library!", state="complete", expanded=False)
+        elif not job.ready_lessons:
+            status_box.update(label="❌ No lesson could be generated.", state="error", expanded=True)
+            st.error(f"{len(job.failed_lessons)} lessons failed and none was saved. Check the console logs and try again.")
+            st.session_state['generation_job'] = None
+            return
+        elif job.done:
+            status_box.update(label="✅ Course Architected Successfully!", state="complete", expanded=False)
+        else:
+            status_box.update(label="✅ First lesson ready! The rest is generated in the background.", state="complete", expanded=False)
+        if job.failed_lessons:
+            st.warning(f"⚠️ {len(job.failed_lessons)} lessons could not be generated. Generate the topic again to retry them.")
+
+    # Pull the newly created course data from Neo4j to display in the UI
+    with st.spinner("Loading your personalized classroom..."):
+        try:
+            course_data = get_course(make_course_id(topic))
+        except Exception as e:
+            st.error(f"⚠️ Could not load the course: {e}")
+            return
+
+        if course_data:
+            st.session_state['course_id'] = course_data['course_id']
+            st.session_state['selected_module_idx'] = 0
+            st.session_state['selected_lesson_idx'] = 0
+            # Re-render the page with the new course data
+            st.rerun()
+        else:
+            st.error("Agents failed to save data to Neo4j. Check console logs.")
 
 
 # SIDEBAR
@@ -38,7 +192,11 @@ with st.sidebar:
     )
     
     # Load saved courses from the Database
-    existing_courses = get_all_courses()
+    try:
+        existing_courses = get_all_courses()
+    except Exception as e:
+        st.error(f"⚠️ Could not load your library: {e}")
+        existing_courses = []
     if existing_courses:
         st.subheader("📂 Your Library")
         selected_old_course = st.selectbox(
@@ -49,13 +207,21 @@ with st.sidebar:
         if selected_old_course != "-- Select --":
             if st.button("Load Course"):
                 with st.spinner("Retrieving from Database..."):
-                    st.session_state['course_data'] = get_full_course_data(selected_old_course)
+                    st.session_state['course_id'] = make_course_id(selected_old_course)
                     st.session_state['selected_module_idx'] = 0
                     st.session_state['selected_lesson_idx'] = 0
                     st.rerun()
     
     
     
+    # Generations cut off by a crash or restart continue from their last checkpoint
+    unfinished = [job for job in unfinished_jobs() if job['topic']]
+    if unfinished:
+        st.subheader("⏯️ Unfinished Courses")
+        resume_topic = st.selectbox("Resume generating:", options=[job['topic'] for job in unfinished])
+        if st.button("Resume Generation"):
+            generate_course(resume_topic)
+    
     with st.sidebar:
         # A modern, slim section header
         st.markdown("""
@@ -79,45 +245,17 @@ with st.sidebar:
         
     if st.button("🚀 Generate Course", type="primary"):
         if topic_input:
-            with st.status("🛸 Deploying AI Agents...", expanded=True) as status_box:            
-            # Prepare inputs for LangGraph
-                inputs = {"topic": topic_input}
-                
-                # Run the graph and stream the node updates
-                # 'langgraph_app' is the compiled workflow from workflow.py
-                for output in langgraph_app.stream(inputs):
-                    for node_name, metadata in output.items():
-                        if node_name == "deconstructor":
-                            st.write("🏗️ **Course Creator:**Creating Curriculum Content.")
-                            status_box.update(label="📚 Researching Knowledge...", state="running")
-                            
-                        elif node_name == "librarian":
-                            st.write("🔍 **Librarian:** Scouring Wikipedia & ArXiv & the Web for facts.")
-                            status_box.update(label="✍️ Drafting Content...", state="running")
-                            
-                        elif node_name == "professor":
-                            st.write("🎓 **Professor:** Generating lessons, scripts, and quizzes.")
-                            status_box.update(label="✨ Finalizing Course...", state="running")
-
-                # Final update when loop ends
-                status_box.update(label="✅ Course Architected Successfully!", state="complete", expanded=False)
-               
-        # Pull the newly created course data from Neo4j to display in the UI
-        with st.spinner("Loading your personalized classroom..."):
-            course_data = get_full_course_data(topic_input)
-            
-            if course_data:
-                st.session_state['course_data'] = course_data
-                st.session_state['selected_module_idx'] = 0
-                st.session_state['selected_lesson_idx'] = 0
-                # Re-render the page with the new course data
-                st.rerun()
-            else:
-                st.error("Agents failed to save data to Neo4j. Check console logs.")
+            generate_course(topic_input)
 
 
 # MAIN DISPLAY LOGIC
-if st.session_state['course_data'] is None:
+try:
+    course = get_course(st.session_state['course_id']) if st.session_state['course_id'] else None
+except Exception as e:
+    st.error(f"⚠️ Could not load the course: {e}")
+    course = None
+
+if course is None:
     # 1. Centered Header with refined spacing
     st.markdown("""
         <div style="text-align: center; margin-top: -30px; padding-bottom: 30px;">
@@ -134,7 +272,7 @@ if st.session_state['course_data'] is None:
         </div>
     """, unsafe_allow_html=True)
     # --- MAIN INPUT SECTION ---
-if st.session_state['course_data'] is None:
+if course is None:
     # First Row: Input + Step 1
     row1_col1, row1_col2 = st.columns([2, 1])
     with row1_col1:
@@ -149,40 +287,7 @@ if st.session_state['course_data'] is None:
         is_gen = st.session_state.get('is_generating', False)
         if st.button("🚀 Generate Course", type="primary",use_container_width=True, disabled=is_gen):
                 if topic_input:
-                    with st.status("🛸 Deploying AI Agents...", expanded=True) as status_box:            
-                    # Prepare inputs for LangGraph
-                        inputs = {"topic": topic_input}
-                        
-                        # Run the graph and stream the node updates
-                        # 'langgraph_app' is the compiled workflow from workflow.py
-                        for output in langgraph_app.stream(inputs):
-                            for node_name, metadata in output.items():
-                                if node_name == "deconstructor":
-                                    st.write("🏗️ **Course Creator:**Creating Curriculum Content.")
-                                    status_box.update(label="📚 Researching Knowledge...", state="running")
-                                    
-                                elif node_name == "librarian":
-                                    st.write("🔍 **Librarian:** Scouring Wikipedia & ArXiv & the Web for facts.")
-                                    status_box.update(label="✍️ Drafting Content...", state="running")
-                                    
-                                elif node_name == "professor":
-                                    st.write("🎓 **Professor:** Generating lessons, scripts, and quizzes.")
-                                    status_box.update(label="✨ Finalizing Course...", state="running")
-
-                        # Final update when loop ends
-                        status_box.update(label="✅ Course Architected Successfully!", state="complete", expanded=False)
-                                # Pull the newly created course data from Neo4j to display in the UI
-                    with st.spinner("Loading your personalized classroom..."):
-                        course_data = get_full_course_data(topic_input)
-                        
-                        if course_data:
-                            st.session_state['course_data'] = course_data
-                            st.session_state['selected_module_idx'] = 0
-                            st.session_state['selected_lesson_idx'] = 0
-                            # Re-render the page with the new course data
-                            st.rerun()
-                        else:
-                            st.error("Agents failed to save data to Neo4j. Check console logs.")
+                    generate_course(topic_input)
     with row2_col2:
         st.warning("🚀 **Step 2:** Click the button to launch agents.")
 
@@ -232,9 +337,34 @@ if st.session_state['course_data'] is None:
 
 else:
     # Data is loaded - Show the Course Interface
-    course = st.session_state['course_data']
+    # While the background job is still writing this course, keep polling for new lessons
+    job = st.session_state['generation_job']
+    generating = job is not None and job.course_id == course.get('course_id')
+    if generating:
+        # get_course() already serves the latest version; just notice when the job is over
+        if job.done:
+            st.session_state['generation_job'] = None
+            st.session_state['last_timing'] = (job.course_id, job.timing_summary())
+            generating = False
+            if job.state == "cancelled":
+                st.toast("Generation stopped. Generate the topic again to finish the remaining lessons.", icon="⏹️")
+            elif job.state == "failed":
+                st.error(f"Generation stopped with an error: {job.error}. Generate the topic again to finish the remaining lessons.")
+            elif job.failed_lessons:
+                st.toast(f"{len(job.failed_lessons)} lessons could not be generated. Generate the topic again to retry them.", icon="⚠️")
+            else:
+                st.toast("Your course is fully generated!", icon="🎉")
+        elif st.button("⏹️ Stop Generating"):
+            job.cancel()
+            st.toast("Stopping after the lessons currently being written...", icon="⏹️")
     
     st.markdown(f'<h1 class="gradient-text" style="font-size: 3rem !important; margin-bottom: 20px;"> Course Topic: {course["course_title"]}</h1>', unsafe_allow_html=True)    
+
+    # Timing of the generation that just finished for this course
+    last_timing = st.session_state['last_timing']
+    if last_timing and last_timing[0] == course.get('course_id'):
+        with st.expander("⏱️ Generation timing"):
+            render_timing_summary(last_timing[1])
     
     col_nav, col_content = st.columns([0.8, 2.5])
 
@@ -246,6 +376,9 @@ else:
         st.progress(progress)
         st.markdown(f'<h6 style="color: #94a3b8; font-weight: 400; margin-top: -5px; margin-bottom: 15px; letter-spacing: 0.5px;"> 📈 Course Progress: <span style="color: #4facfe; font-weight: 600;">{int(progress * 100)}%</span></h6>', unsafe_allow_html=True)    
         
+        if generating:
+            st.caption(f"⏳ {len(job.ready_lessons)} lessons ready, the rest are being generated...")
+
         st.markdown(f"### 📚 Curriculum")   
         
         prev_lesson_completed = True # The first lesson is always unlocked
@@ -275,6 +408,8 @@ else:
                             display_title = raw_title
 
                         lesson_label = f"{m_idx + 1}.{l_idx + 1}. {display_title}"
+                        if not lesson.get('ready', True):
+                            lesson_label = f"⏳ {lesson_label}"
 
                         if st.button(lesson_label, key=f"btn_{m_idx}_{l_idx}", use_container_width=True):
     # logic
@@ -294,6 +429,12 @@ else:
             
             current_module = course['modules'][m_idx]
             current_lesson = current_module['lessons'][l_idx]
+            # Only the lesson being read is loaded; the next one is prefetched in the background
+            try:
+                lesson_content = get_lesson_content(current_lesson['id'])
+            except Exception as e:
+                st.error(f"⚠️ Could not load this lesson: {e}")
+                lesson_content = {"text": "", "video_script": "", "quiz_json": None}
 
             # Wrap entire content in a styled container
             st.markdown(f"""
@@ -314,15 +455,18 @@ else:
             tab1, tab2, tab3 = st.tabs(["📝 Reading Material", "🎬 Video Script", "🧠 Interactive Quiz"])
 
             with tab1:
-                st.markdown(current_lesson['content']['text'])
+                if current_lesson.get('ready', True):
+                    st.markdown(lesson_content['text'])
+                else:
+                    render_live_draft(current_lesson['id'], lesson_content['text'])
             
             with tab2:
                 st.info("💡 **Pro Tip:** Use this script to record a 5-minute micro-learning video.")
-                st.code(current_lesson['content']['video_script'], language="markdown")
+                st.code(lesson_content['video_script'], language="markdown")
                 
             with tab3:
                 st.subheader("Knowledge Check")
-                quiz_data_raw = current_lesson['content'].get('quiz_json')
+                quiz_data_raw = lesson_content.get('quiz_json')
                 
                 if quiz_data_raw:
                     try:
@@ -354,17 +498,23 @@ else:
             # Completion Button
             if not current_lesson.get('completed'):
                 if st.button("✅ Mark Lesson as Completed", type="primary", width='stretch'):
-                    mark_lesson_completed(current_lesson['title'])
-                    updated_data = get_full_course_data(course["course_title"])
-                    st.session_state['course_data'] = updated_data
+                    # One small query: marks the lesson and returns the new progress summary
+                    try:
+                        progress = complete_lesson(current_lesson['id'])
+                    except Exception as e:
+                        progress = None
+                        st.session_state['pending_toast'] = (f"Could not save your progress: {e}", "⚠️")
                     
-                    # NEW: Check if this was the last lesson for celebration
-                    new_all = [l for m in updated_data['modules'] for l in m['lessons']]
-                    if all(l.get('completed') for l in new_all):
-                        st.balloons()
-                        st.toast("🏆 Congratulations! You've mastered the entire course!", icon="🎓")
-                    else:
-                        st.toast("Lesson Completed! Next one unlocked.", icon="🔓")
+                    # Check if this was the last lesson for celebration
+                    if progress and progress['completed'] == progress['total']:
+                        st.session_state['celebrate'] = True
+                        st.session_state['pending_toast'] = ("🏆 Congratulations! You've mastered the entire course!", "🎓")
+                    elif progress:
+                        st.session_state['pending_toast'] = (f"Lesson Completed! Next up: {progress['next_lesson_title']}", "🔓")
                         
-                    time.sleep(1)
-                    st.rerun()
\ No newline at end of file
+                    st.rerun()
+
+    # Keep polling until the background job has written every lesson
+    if generating:
+        time.sleep(GENERATION_POLL_SECONDS)
+        st.rerun()
@@ -0,0 +1,160 @@
+import time
+import threading
+import database
+from agents import deconstructor as dec
+from agents.librarian import UNRESEARCHED_LESSONS_QUERY
+from agents.professor import UNWRITTEN_LESSONS_QUERY
+
+
+class InMemoryGraph:
+    """
+    In-memory stand-in for Neo4j that understands the fixed queries the app runs,
+    matched exactly against the query constants in database and agents/.
+    Installed by replacing database.execute_read / execute_write, so everything
+    above the data-access layer runs unchanged. `latency` simulates a round trip.
+    """
+    def __init__(self, latency: float = 0.002):
+        self.latency = latency
+        self.courses = {}   # course_id -> {"title", "version", "modules": [module_id]}
+        self.modules = {}   # module_id -> {"title", "order_index", "lessons": [lesson_id]}
+        self.lessons = {}   # lesson_id -> properties
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def install(self):
+        database.execute_read = self.execute
+        database.execute_write = self.execute
+        return self
+
+    def execute(self, query: str, parameters=None):
+        time.sleep(self.latency)
+        params = parameters or {}
+        with self._lock:
+            self.calls += 1
+            return self._dispatch(query, params)
+
+    def _dispatch(self, query, p):
+        if query in database.SCHEMA_STATEMENTS:
+            return []
+        if query == database.COURSE_IDS_QUERY:
+            return [{"title": c["title"], "id": cid} for cid, c in self.courses.items()]
+        if query == dec.INSERT_SKELETON_QUERY:
+            return self._insert_skeleton(p)
+        if query == dec.RESEARCH_BATCH_QUERY:
+            for row in p["rows"]:
+                if row["id"] in self.lessons:
+                    self.lessons[row["id"]].update(research_notes=row["notes"], source=row["source"])
+            return []
+        if query == dec.CONTENT_BATCH_QUERY:
+            for row in p["rows"]:
+                if row["id"] in self.lessons:
+                    self.lessons[row["id"]].update(content_text=row["text"], video_script=row["script"],
+                                                   quiz_json=row["quiz"], status="complete")
+                    self.courses[self.lessons[row["id"]]["course_id"]]["version"] += 1
+            return []
+        if query == dec.COURSE_SKELETON_QUERY:
+            lessons = list(self._walk(p["course_id"]))
+            return [{"title": lessons[0][0]["title"], "lessons": len(lessons),
+                     "written": sum(1 for _, _, l in lessons if l.get("content_text"))}] if lessons else []
+        if query == dec.LESSON_STATE_QUERY:
+            lesson = self.lessons.get(p["id"])
+            return [{"notes": lesson.get("research_notes"), "source": lesson.get("source"),
+                     "written": bool(lesson.get("content_text"))}] if lesson else []
+        if query == dec.COMPLETE_LESSON_QUERY:
+            return self._complete_lesson(p["id"])
+        if query == dec.LESSON_CONTENT_QUERY:
+            return self._lesson_content(p["id"])
+        if query == dec.COURSE_VERSION_QUERY:
+            course = self.courses.get(p["course_id"])
+            return [{"version": course["version"]}] if course else []
+        if query == dec.ALL_COURSES_QUERY:
+            return [{"title": c["title"]} for c in self.courses.values()]
+        if query == dec.PENDING_LESSONS_QUERY:
+            return [self._lesson_row(c, m, l, "id", "title", "course_name", "notes", "module_order", "lesson_order")
+                    for c, m, l in self._walk(p["course_id"]) if not l.get("content_text")]
+        if query == UNRESEARCHED_LESSONS_QUERY:
+            return [self._lesson_row(c, m, l, "id", "title", "course_name", "module_id")
+                    for c, m, l in self._walk(p["course_id"]) if not l.get("research_notes")]
+        if query == UNWRITTEN_LESSONS_QUERY:
+            return [self._lesson_row(c, m, l, "id", "title", "notes")
+                    for c, m, l in self._walk(p["course_id"])
+                    if l.get("research_notes") and not l.get("content_text")]
+        if query == dec.FULL_COURSE_QUERY:
+            return [self._lesson_row(c, m, l, "course_title", "module_title", "lesson_id", "lesson_title",
+                                     "text", "script", "quiz_data", "completed", "status")
+                    for c, m, l in self._walk(p["course_id"])]
+        if query == dec.COURSE_OUTLINE_QUERY:
+            return [self._lesson_row(c, m, l, "course_title", "module_title", "lesson_id", "lesson_title",
+                                     "order_index", "completed", "status")
+                    for c, m, l in self._walk(p["course_id"])]
+        raise ValueError(f"InMemoryGraph does not support this query (is it a new or edited query constant?):\n{query}")
+
+    # --- helpers -------------------------------------------------------------
+    def _walk(self, course_id):
+        course = self.courses.get(course_id)
+        if not course:
+            return
+        for module_id in course["modules"]:
+            module = self.modules[module_id]
+            for lesson_id in module["lessons"]:
+                yield course, module, self.lessons[lesson_id]
+
+    @staticmethod
+    def _lesson_row(course, module, lesson, *columns):
+        values = {
+            "id": lesson["id"], "lesson_id": lesson["id"], "title": lesson["title"], "lesson_title": lesson["title"],
+            "course_name": course["title"], "course_title": course["title"], "module_title": module["title"],
+            "notes": lesson.get("research_notes"), "module_order": module["order_index"],
+            "module_id": module["id"],
+            "lesson_order": lesson["order_index"], "order_index": lesson["order_index"],
+            "text": lesson.get("content_text"), "script": lesson.get("video_script"),
+            "quiz_data": lesson.get("quiz_json"), "completed": lesson["completed"], "status": lesson["status"],
+        }
+        return {column: values[column] for column in columns}
+
+    def _insert_skeleton(self, p):
+        course = self.courses.setdefault(p["course_id"], {"title": p["title"], "version": 0, "modules": []})
+        course["title"] = p["title"]
+        course["version"] += 1
+        for mod in p["modules"]:
+            if mod["id"] not in self.modules:
+                course["modules"].append(mod["id"])
+            module = self.modules.setdefault(mod["id"], {"id": mod["id"], "lessons": []})
+            module.update(title=mod["title"], order_index=mod["order_index"])
+            for les in mod["lessons"]:
+                if les["id"] not in self.lessons:
+                    module["lessons"].append(les["id"])
+                    self.lessons[les["id"]] = {"id": les["id"], "status": "pending", "completed": False}
+                self.lessons[les["id"]].update(title=les["title"], order_index=les["order_index"],
+                                               course_id=p["course_id"])
+        return [{"lessons": sum(len(m["lessons"]) for m in p["modules"]),
+                 "module_links": len(p["module_links"]), "lesson_links": len(p["lesson_links"])}]
+
+    def _complete_lesson(self, lesson_id):
+        lesson = self.lessons.get(lesson_id)
+        if not lesson:
+            return []
+        lesson["completed"] = True
+        course = self.courses[lesson["course_id"]]
+        course["version"] += 1
+        ordered = [l for _, _, l in self._walk(lesson["course_id"])]
+        remaining = [l for l in ordered if not l["completed"]]
+        return [{
+            "version": course["version"],
+            "completed": len(ordered) - len(remaining),
+            "total": len(ordered),
+            "next_lesson_id": remaining[0]["id"] if remaining else None,
+            "next_lesson_title": remaining[0]["title"] if remaining else None,
+        }]
+
+    def _lesson_content(self, lesson_id):
+        lesson = self.lessons.get(lesson_id)
+        if not lesson:
+            return []
+        ordered = [l["id"] for _, _, l in self._walk(lesson["course_id"])]
+        position = ordered.index(lesson_id)
+        return [{
+            "text": lesson.get("content_text"), "script": lesson.get("video_script"),
+            "quiz_data": lesson.get("quiz_json"), "status": lesson["status"],
+            "next_id": ordered[position + 1] if position + 1 < len(ordered) else None,
+        }]
@@ -0,0 +1,97 @@
+import re
+import json
+import time
+import hashlib
+from typing import Any, List, Optional
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+
+def _prompt_text(messages: List[BaseMessage]) -> str:
+    return "\n".join(str(m.content) for m in messages)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic stand-in for the course LLM. It recognizes the prompts the
+    agents send (outline, tool selection, summary, lesson) and answers them
+    after `latency` seconds; streamed answers spread that latency over chunks.
+    """
+    latency: float = 0.05
+    chunk_size: int = 40
+    modules: int = 4
+    lessons_per_module: int = 4
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-course-llm"
+
+    def bind_tools(self, tools, **kwargs):
+        return self.bind(tools=[convert_to_openai_tool(t) for t in tools], **kwargs)
+
+    def _respond(self, prompt: str, tools=None) -> AIMessage:
+        if tools:
+            match = re.search(r"lesson: '(.+?)' for a course", prompt)
+            query = match.group(1) if match else prompt[:80]
+            # Spread lessons over the three sources deterministically
+            names = [t["function"]["name"] for t in tools]
+            name = names[int(hashlib.md5(query.encode()).hexdigest(), 16) % len(names)]
+            return AIMessage(content="", tool_calls=[{"name": name, "args": {"query": query}, "id": "call_0"}])
+
+        if "curriculum designer" in prompt:
+            topic = re.search(r'topic: "(.+?)"', prompt).group(1)
+            outline = {"modules": [
+                {"order_index": m, "title": f"{topic} Module {m}", "lessons": [
+                    {"order_index": l, "title": f"{topic} {m}.{l}"} for l in range(1, self.lessons_per_module + 1)
+                ]}
+                for m in range(1, self.modules + 1)
+            ]}
+            return AIMessage(content=json.dumps(outline))
+
+        if "EXPERT EDUCATOR" in prompt:
+            title = re.search(r"Lesson Title: (.+)", prompt).group(1).strip()
+            lesson = {
+                "text": f"# {title}\n\n" + ("Lorem ipsum dolor sit amet. " * 200),
+                "script": f"[Scene] Presenter introduces {title}.",
+                "quiz": [{"question": f"Q{i} about {title}?", "options": ["A", "B", "C", "D"], "answer": "A"}
+                         for i in range(1, 4)],
+            }
+            return AIMessage(content=json.dumps(lesson))
+
+        if "RESEARCH BATCH" in prompt:
+            ids = re.findall(r"LESSON ID: (\S+)", prompt)
+            return AIMessage(content=json.dumps({"lessons": [
+                {"id": lesson_id, "notes": "Key facts, dates and definitions. " * 10} for lesson_id in ids
+            ]}))
+
+        if "RAW DATA" in prompt:
+            return AIMessage(content="Key facts, dates and definitions. " * 10)
+
+        return AIMessage(content="OK")
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.latency)
+        message = self._respond(_prompt_text(messages), kwargs.get("tools"))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any):
+        content = self._respond(_prompt_text(messages), kwargs.get("tools")).content
+        pieces = [content[i:i + self.chunk_size] for i in range(0, len(content), self.chunk_size)] or [""]
+        for piece in pieces:
+            time.sleep(self.latency / len(pieces))
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+
+
+def make_fake_search(source: str, latency: float):
+    """Builds a replacement for a fetcher in tools.search.SOURCE_FETCHERS."""
+    def fake_search(query: str):
+        time.sleep(latency)
+        return f"[Fake {source}: {query}]\n" + (f"Background on {query}. " * 30), "ok"
+    return fake_search
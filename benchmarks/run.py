@@ -0,0 +1,222 @@
+"""
+Offline end-to-end benchmark for the course pipeline and the UI read path.
+
+    python -m benchmarks.run                              # fake LLM, fake search, in-memory graph
+    python -m benchmarks.run --concurrency 1,2,4 --courses 8
+    python -m benchmarks.run --neo4j                      # real Neo4j from NEO4J_URI (e.g. the docker container)
+    python -m benchmarks.run --compare benchmarks/results/bench-<old>.json
+
+Results are written to benchmarks/results/ as JSON so runs can be compared for regressions.
+"""
+import os
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+# Never serve benchmark calls from the on-disk LLM cache
+os.environ.setdefault("LLM_CACHE_DISABLED", "1")
+# The fake LLM's tool choices must never reach the real router's training log
+os.environ["ROUTER_LOG_PATH"] = ""
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+class _NoSearchCache:
+    def get_or_fetch(self, tool, query, fetch, with_status=False):
+        result = fetch(query)
+        return result if with_status else result[0]
+
+
+def install_fakes(args):
+    """Swaps the LLM, the search backends and (unless --neo4j) the graph for offline stand-ins."""
+    import agents.llm
+    import agents.router
+    import tools.search
+    from ratelimit import RateLimiter
+    from benchmarks.fakes import FakeChatModel, make_fake_search
+
+    def fake_llm(factory):
+        factory.llm = FakeChatModel(latency=args.llm_latency)
+    agents.llm.LlmFactory._create_llm = fake_llm
+    agents.llm.clear_llm_cache()
+    agents.router.get_router.cache_clear()
+
+    # Keep the real per-source concurrency caps in front of the fake sources. The per-minute
+    # caps would measure the API quotas rather than the pipeline, so they need --search-rpm.
+    for name, source in [("wiki_tool", "Wikipedia"), ("arxiv_tool", "ArXiv"), ("search_tool", "DuckDuckGo")]:
+        fake = make_fake_search(source, args.search_latency)
+        limiter = tools.search.SOURCE_LIMITS[name]
+        if not args.search_rpm:
+            limiter = RateLimiter(f"bench.{name}", max_concurrency=limiter.max_concurrency)
+        def limited(query, _fake=fake, _limiter=limiter):
+            return _limiter.call(_fake, query)
+        tools.search.SOURCE_FETCHERS[name] = limited
+    if not args.search_cache:
+        tools.search.get_search_cache = lambda: _NoSearchCache()
+
+    if args.neo4j:
+        return None
+    from benchmarks.fake_graph import InMemoryGraph
+    return InMemoryGraph(latency=args.db_latency).install()
+
+
+def _summary(samples):
+    samples_ms = sorted(s * 1000 for s in samples)
+    return {
+        "n": len(samples_ms),
+        "mean_ms": round(statistics.fmean(samples_ms), 3),
+        "p50_ms": round(samples_ms[len(samples_ms) // 2], 3),
+        "p95_ms": round(samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))], 3),
+    }
+
+
+def _compiled_app(max_concurrency):
+    from workflow.workflow import build_workflow
+    return build_workflow().compile().with_config(max_concurrency=max_concurrency)
+
+
+def bench_stages(topic, app):
+    """Runs one course and returns the wall time of each stage, from the node update timestamps."""
+    start = time.perf_counter()
+    first_seen, last_seen = {}, {}
+    for output in app.stream({"topic": topic}):
+        now = time.perf_counter() - start
+        for node_name in output:
+            first_seen.setdefault(node_name, now)
+            last_seen[node_name] = now
+    total = time.perf_counter() - start
+
+    stages, previous = {}, 0.0
+    for node_name in sorted(last_seen, key=last_seen.get):
+        stages[node_name] = round(last_seen[node_name] - previous, 4)
+        previous = last_seen[node_name]
+    result = {"total_s": round(total, 4), "stages_s": stages}
+    if "lesson_pipeline" in first_seen:
+        result["time_to_first_lesson_s"] = round(first_seen["lesson_pipeline"], 4)
+    return result
+
+
+def bench_throughput(levels, courses, pipeline_concurrency):
+    """Generates `courses` courses at each concurrency level and reports courses per minute."""
+    app = _compiled_app(pipeline_concurrency)
+    results = {}
+    for level in levels:
+        topics = [f"Throughput {level}x Course {i} {time.time_ns()}" for i in range(courses)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=level) as pool:
+            list(pool.map(lambda t: list(app.stream({"topic": t})), topics))
+        elapsed = time.perf_counter() - start
+        results[str(level)] = {
+            "courses": courses,
+            "elapsed_s": round(elapsed, 4),
+            "courses_per_minute": round(courses / elapsed * 60, 3),
+        }
+        print(f"   ⏱️ concurrency {level}: {results[str(level)]['courses_per_minute']} courses/min")
+    return results
+
+
+def bench_read_path(topic, iterations):
+    """Latency of the UI read path for an already generated course."""
+    from database import make_course_id
+    from agents.course_cache import COURSE_CACHE, LESSON_CACHE
+    from agents.deconstructor import (
+        get_full_course_data, get_course, get_lesson_content, mark_lesson_completed,
+    )
+    course_id = make_course_id(topic)
+    lesson_ids = [l["id"] for m in get_course(course_id)["modules"] for l in m["lessons"]]
+
+    def warm_lessons():
+        for lesson_id in lesson_ids:
+            get_lesson_content(lesson_id, prefetch_next=False)
+
+    def timed(fn, before=None):
+        samples = []
+        for i in range(iterations):
+            if before:
+                before(i)
+            start = time.perf_counter()
+            fn(i)
+            samples.append(time.perf_counter() - start)
+        return _summary(samples)
+
+    return {
+        "get_full_course_data": timed(lambda i: get_full_course_data(topic)),
+        "get_course_cold": timed(lambda i: get_course(course_id), before=lambda i: COURSE_CACHE.invalidate(course_id)),
+        "get_course_warm": timed(lambda i: get_course(course_id)),
+        "get_lesson_content_cold": timed(lambda i: get_lesson_content(lesson_ids[i % len(lesson_ids)], prefetch_next=False),
+                                         before=lambda i: LESSON_CACHE.invalidate_course(course_id)),
+        # Every lesson is fetched once first, so each timed call is a real cache hit
+        "get_lesson_content_warm": timed(lambda i: get_lesson_content(lesson_ids[i % len(lesson_ids)], prefetch_next=False),
+                                         before=lambda i: i == 0 and warm_lessons()),
+        "mark_lesson_completed": timed(lambda i: mark_lesson_completed(lesson_ids[i % len(lesson_ids)])),
+    }
+
+
+def compare(current, baseline, path=""):
+    """Prints the relative change of every numeric metric against a baseline run."""
+    for key, value in current.items():
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        name = f"{path}.{key}" if path else key
+        if isinstance(value, dict):
+            compare(value, old or {}, name)
+        elif isinstance(value, (int, float)) and isinstance(old, (int, float)) and old:
+            change = (value - old) / old * 100
+            print(f"   {name}: {old} -> {value} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark for AI-demy course generation.")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake LLM call")
+    parser.add_argument("--search-latency", type=float, default=0.05, help="seconds per fake search call")
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds per in-memory graph round trip")
+    parser.add_argument("--concurrency", default="1,2,4", help="course-level concurrency levels to measure")
+    parser.add_argument("--pipeline-concurrency", type=int, default=int(os.getenv("PIPELINE_MAX_CONCURRENCY", "6")))
+    parser.add_argument("--courses", type=int, default=4, help="courses generated per concurrency level")
+    parser.add_argument("--read-iterations", type=int, default=50)
+    parser.add_argument("--search-cache", action="store_true", help="keep the persistent search cache enabled")
+    parser.add_argument("--search-rpm", action="store_true", help="apply the real per-source requests-per-minute caps")
+    parser.add_argument("--neo4j", action="store_true", help="use the real Neo4j from NEO4J_URI instead of the in-memory graph")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--output", help="where to write the results JSON")
+    args = parser.parse_args()
+
+    graph = install_fakes(args)
+    topic = f"Benchmark Course {time.time_ns()}"
+
+    print("🏗️ Per-stage wall time...")
+    stages = bench_stages(topic, _compiled_app(args.pipeline_concurrency))
+    print(f"   {stages}")
+    print("🚀 Throughput...")
+    throughput = bench_throughput([int(c) for c in args.concurrency.split(",")], args.courses, args.pipeline_concurrency)
+    print("📖 Read path...")
+    read_path = bench_read_path(topic, args.read_iterations)
+    for name, summary in read_path.items():
+        print(f"   {name}: p50 {summary['p50_ms']} ms, p95 {summary['p95_ms']} ms")
+
+    results = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("compare", "output")},
+        "workflow_mode": os.getenv("WORKFLOW_MODE", "pipeline"),
+        "stages": stages,
+        "throughput": throughput,
+        "read_path": read_path,
+        "graph_calls": graph.calls if graph else None,
+    }
+    output = args.output or os.path.join(RESULTS_DIR, f"bench-{datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"✅ Results saved to {output}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"📊 Compared to {args.compare}:")
+        compare({k: results[k] for k in ("stages", "throughput", "read_path")}, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,190 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase, READ_ACCESS, WRITE_ACCESS
 import os
+import re
+import hashlib
+import unicodedata
+import asyncio
+import threading
+import telemetry
 
+# Connection pool and retry settings. NEO4J_MAX_RETRY_TIME bounds how long one query
+# keeps retrying transient failures (with backoff) before the error reaches the caller.
+NEO4J_MAX_POOL_SIZE = int(os.getenv("NEO4J_MAX_POOL_SIZE", "50"))
+NEO4J_ACQUISITION_TIMEOUT = float(os.getenv("NEO4J_ACQUISITION_TIMEOUT", "60"))
+NEO4J_MAX_RETRY_TIME = float(os.getenv("NEO4J_MAX_RETRY_TIME", "15"))
 
-def connect_to_neo4j():
-    """Establishes a connection to the Neo4j database using environment variables."""
+
+def _connection_settings():
     uri = os.getenv("NEO4J_URI", "bolt://localhost:7687")
     user = os.getenv("NEO4J_USERNAME", "neo4j")
     password = os.getenv("NEO4J_PASSWORD", "password")
-    return GraphDatabase.driver(uri, auth=(user, password))
+    options = {
+        "max_connection_pool_size": NEO4J_MAX_POOL_SIZE,
+        "connection_acquisition_timeout": NEO4J_ACQUISITION_TIMEOUT,
+        "max_transaction_retry_time": NEO4J_MAX_RETRY_TIME,
+    }
+    return uri, (user, password), options
+
+
+def connect_to_neo4j():
+    """Establishes a connection to the Neo4j database using environment variables."""
+    uri, auth, options = _connection_settings()
+    return GraphDatabase.driver(uri, auth=auth, **options)
+
+
+_driver = None
+_driver_lock = threading.Lock()
+
+
+def get_driver():
+    """Returns the process-wide pooled driver, creating it on first use."""
+    global _driver
+    with _driver_lock:
+        if _driver is None:
+            _driver = connect_to_neo4j()
+        return _driver
+
+
+def _statement_name(query: str) -> str:
+    """First line of a query, used to tell Cypher statements apart in telemetry."""
+    return " ".join(query.strip().split("\n", 1)[0].split())[:80]
+
+
+def _run_managed(access_mode, query: str, parameters=None):
+    with telemetry.span("neo4j." + ("read" if access_mode == READ_ACCESS else "write"), kind="db",
+                        statement=_statement_name(query)) as span:
+        rows = _run_managed_untraced(access_mode, query, parameters)
+        span.set(rows=len(rows))
+        return rows
+
+
+def _run_managed_untraced(access_mode, query: str, parameters=None):
+    # The managed transaction is the only retry layer: the driver retries transient errors
+    # and failed connection attempts with backoff for up to NEO4J_MAX_RETRY_TIME, then raises.
+    with get_driver().session(default_access_mode=access_mode) as session:
+        tx_work = lambda tx: [record.data() for record in tx.run(query, parameters or {})]
+        if access_mode == READ_ACCESS:
+            return session.execute_read(tx_work)
+        return session.execute_write(tx_work)
+
+
+def execute_read(query: str, parameters=None) -> list:
+    """Runs a query in a managed read transaction (routed to readers in a cluster). Raises on failure."""
+    return _run_managed(READ_ACCESS, query, parameters)
+
+
+def execute_write(query: str, parameters=None) -> list:
+    """Runs a query in a managed write transaction. Raises on failure."""
+    return _run_managed(WRITE_ACCESS, query, parameters)
+
+
+# Async API for concurrent pipeline stages. Async drivers are bound to an event loop,
+# so one pooled driver is kept per loop, with the same pool and retry settings.
+_async_drivers = {}
+
+
+def get_async_driver():
+    """Returns the pooled async driver of the running event loop, creating it on first use."""
+    loop = asyncio.get_running_loop()
+    with _driver_lock:
+        driver = _async_drivers.get(loop)
+        if driver is None:
+            uri, auth, options = _connection_settings()
+            driver = AsyncGraphDatabase.driver(uri, auth=auth, **options)
+            _async_drivers[loop] = driver
+        return driver
+
+
+async def _run_managed_async(access_mode, query: str, parameters=None):
+    async def tx_work(tx):
+        result = await tx.run(query, parameters or {})
+        return [record.data() async for record in result]
+
+    with telemetry.span("neo4j." + ("read" if access_mode == READ_ACCESS else "write"), kind="db",
+                        statement=_statement_name(query)) as span:
+        async with get_async_driver().session(default_access_mode=access_mode) as session:
+            if access_mode == READ_ACCESS:
+                rows = await session.execute_read(tx_work)
+            else:
+                rows = await session.execute_write(tx_work)
+        span.set(rows=len(rows))
+        return rows
+
+
+async def execute_read_async(query: str, parameters=None) -> list:
+    """Async execute_read, on the running loop's pooled driver. Raises on failure."""
+    return await _run_managed_async(READ_ACCESS, query, parameters)
+
+
+async def execute_write_async(query: str, parameters=None) -> list:
+    """Async execute_write, on the running loop's pooled driver. Raises on failure."""
+    return await _run_managed_async(WRITE_ACCESS, query, parameters)
+
+
+async def close_async_driver():
+    """Closes the async driver of the running event loop (call before the loop ends)."""
+    with _driver_lock:
+        driver = _async_drivers.pop(asyncio.get_running_loop(), None)
+    if driver is not None:
+        await driver.close()
+
+
+def make_course_id(topic: str) -> str:
+    """
+    Stable course ID derived from the normalized topic: a readable slug (any script)
+    plus a short hash, e.g. 'Quantum Physics!' -> 'quantum-physics-3f1c9a2b'.
+    The hash keeps topics apart that slug alike, such as 'C++', 'C#' and 'C'.
+    """
+    normalized = " ".join(unicodedata.normalize("NFKC", topic).casefold().split())
+    slug = re.sub(r"[\W_]+", "-", normalized).strip("-")[:60].strip("-")
+    digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()[:8]
+    return f"{slug}-{digest}" if slug else digest
+
+
+def course_id_of(lesson_or_module_id: str) -> str:
+    """Course ID a module/lesson ID belongs to ('<course>:m1:l2' -> '<course>')."""
+    return lesson_or_module_id.split(":", 1)[0]
+
+
+# Uniqueness constraints (which also create the backing indexes) and lookup indexes.
+SCHEMA_STATEMENTS = [
+    "CREATE CONSTRAINT course_id_unique IF NOT EXISTS FOR (c:Course) REQUIRE c.id IS UNIQUE",
+    "CREATE CONSTRAINT module_id_unique IF NOT EXISTS FOR (m:Module) REQUIRE m.id IS UNIQUE",
+    "CREATE CONSTRAINT lesson_id_unique IF NOT EXISTS FOR (l:Lesson) REQUIRE l.id IS UNIQUE",
+    "CREATE INDEX course_title_index IF NOT EXISTS FOR (c:Course) ON (c.title)",
+    "CREATE INDEX lesson_course_id_index IF NOT EXISTS FOR (l:Lesson) ON (l.course_id)",
+]
+
+# Gives every Module/Lesson of a course an ID scoped to that course, based on its position.
+ASSIGN_IDS_QUERY = """
+MATCH (c:Course {title: $title})
+SET c.id = $course_id, c.version = coalesce(c.version, 0) + 1
+WITH c
+MATCH (c)-[:HAS_MODULE]->(m:Module)
+SET m.id = c.id + ':m' + toString(m.order_index), m.course_id = c.id
+WITH c, m
+MATCH (m)-[:HAS_LESSON]->(l:Lesson)
+SET l.id = m.id + ':l' + toString(l.order_index), l.course_id = c.id
+"""
+
+COURSE_IDS_QUERY = "MATCH (c:Course) RETURN c.title AS title, c.id AS id"
+
+
+def bootstrap_schema():
+    """
+    Creates constraints/indexes (idempotent) and backfills IDs for courses
+    created before IDs existed or under an older ID scheme.
+    """
+    for statement in SCHEMA_STATEMENTS:
+        execute_write(statement)
+
+    courses = execute_read(COURSE_IDS_QUERY)
+    legacy = [row for row in courses if row["id"] != make_course_id(row["title"])]
+    taken = {row["id"] for row in courses if row["id"] is not None and row not in legacy}
+    for row in legacy:
+        course_id = make_course_id(row["title"])
+        if course_id in taken:
+            print(f"⚠️ Skipping ID backfill for '{row['title']}': '{course_id}' is already used.")
+            continue
+        execute_write(ASSIGN_IDS_QUERY, {"title": row["title"], "course_id": course_id})
+        taken.add(course_id)
@@ -0,0 +1,282 @@
+import os
+import time
+import threading
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+
+# Throttled (429) and transient (5xx, connection) failures are retried this many times.
+RATE_LIMIT_MAX_RETRIES = int(os.getenv("RATE_LIMIT_MAX_RETRIES", "3"))
+# Wait (seconds) when a throttled response carries no Retry-After; doubles on each throttle in a row.
+RATE_LIMIT_BACKOFF = float(os.getenv("RATE_LIMIT_BACKOFF", "2"))
+# A call this many times slower than the usual latency shrinks the concurrency limit (0 = ignore latency).
+RATE_LIMIT_LATENCY_TOLERANCE = float(os.getenv("RATE_LIMIT_LATENCY_TOLERANCE", "3"))
+
+_MAX_BACKOFF = 60.0
+# Weight of the newest call in the latency moving average.
+_EWMA_ALPHA = 0.2
+_THROTTLE_STATUSES = (429, 503, 529)
+_THROTTLE_MARKERS = ("429", "rate limit", "ratelimit", "rate_limit", "too many requests")
+_TRANSIENT_NAMES = ("APIConnectionError", "APITimeoutError", "ConnectionError", "Timeout", "ReadTimeout")
+
+
+def _status(error) -> int:
+    """HTTP status of a client exception (openai, httpx, requests and arxiv name it differently)."""
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return 0
+
+
+def is_throttled(error: BaseException) -> bool:
+    """True for 429s, overload responses and rate-limit exceptions (e.g. DuckDuckGo's)."""
+    if not isinstance(error, Exception):
+        return False
+    if _status(error) in _THROTTLE_STATUSES or "RateLimit" in type(error).__name__:
+        return True
+    text = str(error).lower()
+    return any(marker in text for marker in _THROTTLE_MARKERS)
+
+
+def is_transient(error: BaseException) -> bool:
+    return isinstance(error, Exception) and (_status(error) >= 500 or type(error).__name__ in _TRANSIENT_NAMES)
+
+
+def retry_after(error: BaseException):
+    """Seconds the server asked us to wait (Retry-After / retry-after-ms), or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None)
+    if not headers:
+        return None
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000
+        value = headers.get("retry-after")
+        if not value:
+            return None
+        try:
+            return float(value)
+        except ValueError:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Refills `per_minute` units a minute up to a burst of one minute's worth (0 = unlimited).
+    Takers reserve in arrival order: the level may go negative and each taker sleeps off its share.
+    """
+    def __init__(self, per_minute: float):
+        self.per_minute = per_minute
+        self.capacity = per_minute
+        self.level = per_minute
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.per_minute / 60)
+        self.updated = now
+
+    def take(self, amount: float = 1) -> float:
+        """Takes `amount` units, sleeping until they are available. Returns the seconds waited."""
+        if not self.per_minute or amount <= 0:
+            return 0.0
+        with self._lock:
+            self._refill()
+            # A call bigger than the whole bucket only waits for a full bucket
+            self.level -= min(amount, self.capacity)
+            wait = -self.level * 60 / self.per_minute if self.level < 0 else 0.0
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def adjust(self, amount: float):
+        """Takes (or with a negative amount, returns) units without waiting, e.g. to correct an estimate."""
+        if not self.per_minute:
+            return
+        with self._lock:
+            self._refill()
+            self.level = min(self.capacity, self.level - amount)
+
+    def available(self) -> float:
+        with self._lock:
+            self._refill()
+            return self.level
+
+
+class RateLimiter:
+    """
+    Shared limiter for one LLM backend or search source: token buckets for requests and
+    tokens per minute, and a concurrency limit that creeps up while calls go well and is
+    halved on throttling (AIMD), or trimmed when latency climbs. A throttled response
+    pauses the whole backend for its Retry-After before anyone tries again.
+    """
+    def __init__(self, name: str, requests_per_minute: float = 0, tokens_per_minute: float = 0,
+                 max_concurrency: int = 4, min_concurrency: int = 1):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute)
+        self.tokens = TokenBucket(tokens_per_minute)
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.limit = float(self.max_concurrency)
+        self.inflight = 0
+        self.paused_until = 0.0
+        self.latency = None          # seconds, moving average of successful calls
+        self.calls = 0
+        self.throttled = 0
+        self.retries = 0
+        self.wait_seconds = 0.0      # total time calls spent queued in the limiter
+        self._throttle_streak = 0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _acquire(self, tokens: float):
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                pause = self.paused_until - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self.inflight < int(self.limit):
+                    self.inflight += 1
+                    break
+                else:
+                    self._cond.wait()
+        self.requests.take(1)
+        self.tokens.take(tokens)
+        with self._cond:
+            self.wait_seconds += time.monotonic() - start
+
+    def _decrease(self, factor: float):
+        # At most once per typical call duration, so one burst of 429s halves the limit once
+        now = time.monotonic()
+        if now - self._last_decrease >= max(1.0, self.latency or 1.0):
+            self.limit = max(self.min_concurrency, self.limit * factor)
+            self._last_decrease = now
+
+    def _release(self, latency: float = None, error: BaseException = None):
+        with self._cond:
+            self.inflight -= 1
+            self.calls += 1
+            if error is not None and is_throttled(error):
+                self.throttled += 1
+                self._throttle_streak += 1
+                self._decrease(0.5)
+                wait = retry_after(error)
+                if wait is None:
+                    wait = min(_MAX_BACKOFF, RATE_LIMIT_BACKOFF * 2 ** (self._throttle_streak - 1))
+                self.paused_until = max(self.paused_until, time.monotonic() + wait)
+            elif latency is not None:
+                self._throttle_streak = 0
+                if (RATE_LIMIT_LATENCY_TOLERANCE and self.latency is not None
+                        and latency > self.latency * RATE_LIMIT_LATENCY_TOLERANCE):
+                    self._decrease(0.9)
+                else:
+                    self.limit = min(self.max_concurrency, self.limit + 1 / self.limit)
+                self.latency = latency if self.latency is None else (1 - _EWMA_ALPHA) * self.latency + _EWMA_ALPHA * latency
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens: float = 0):
+        """Holds one call slot (after taking a request and `tokens` from the buckets) for the with-block."""
+        self._acquire(tokens)
+        start = time.perf_counter()
+        try:
+            yield self
+        except BaseException as e:
+            self._release(error=e)
+            raise
+        self._release(latency=time.perf_counter() - start)
+
+    def call(self, fn, *args, tokens: float = 0, **kwargs):
+        """Runs fn(*args, **kwargs) in a slot, retrying throttled and transient failures."""
+        for attempt in range(RATE_LIMIT_MAX_RETRIES + 1):
+            try:
+                with self.slot(tokens):
+                    return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt == RATE_LIMIT_MAX_RETRIES or not self.should_retry(e):
+                    raise
+                self.note_retry(e, attempt)
+
+    def should_retry(self, error: BaseException) -> bool:
+        return is_throttled(error) or is_transient(error)
+
+    def note_retry(self, error: BaseException, attempt: int):
+        """Logs a retry; throttled calls wait in the next slot() for the pause, transient ones back off here."""
+        with self._cond:
+            self.retries += 1
+        if is_throttled(error):
+            print(f"⏳ {self.name} is rate limited, retrying in {max(0.0, self.paused_until - time.monotonic()):.1f}s...")
+        else:
+            wait = min(_MAX_BACKOFF, RATE_LIMIT_BACKOFF * 2 ** attempt)
+            print(f"⚠️ {self.name} call failed ({type(error).__name__}), retrying in {wait:.0f}s...")
+            time.sleep(wait)
+
+    def paused(self) -> bool:
+        """True while the backend asked us to back off."""
+        return time.monotonic() < self.paused_until
+
+    def settle_tokens(self, estimated: float, actual: float):
+        """Corrects the tokens-per-minute bucket once the real usage of a call is known."""
+        if actual:
+            self.tokens.adjust(actual - estimated)
+
+    def snapshot(self) -> dict:
+        with self._cond:
+            return {
+                "concurrency_limit": round(self.limit, 2),
+                "max_concurrency": self.max_concurrency,
+                "inflight": self.inflight,
+                "paused_s": round(max(0.0, self.paused_until - time.monotonic()), 2),
+                "latency_s": round(self.latency, 3) if self.latency is not None else None,
+                "calls": self.calls,
+                "throttled": self.throttled,
+                "retries": self.retries,
+                "wait_s": round(self.wait_seconds, 3),
+                "requests_available": round(self.requests.available(), 1) if self.requests.per_minute else None,
+                "tokens_available": round(self.tokens.available(), 1) if self.tokens.per_minute else None,
+            }
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str, **config) -> RateLimiter:
+    """The process-wide limiter for `name`; `config` (RateLimiter arguments) only applies on first use."""
+    with _limiters_lock:
+        if name not in _limiters:
+            _limiters[name] = RateLimiter(name, **config)
+        return _limiters[name]
+
+
+def limiter_stats() -> dict:
+    """State of every limiter, for monitoring."""
+    with _limiters_lock:
+        limiters = dict(_limiters)
+    return {name: limiter.snapshot() for name, limiter in limiters.items()}
+
+
+def prometheus_text(other_processes: dict = None) -> str:
+    """
+    Limiter gauges and counters in the Prometheus text exposition format. Limiters are
+    per process: `other_processes` ({process: limiter_stats()}, e.g. from the generation
+    workers) adds theirs with a `process` label.
+    """
+    metrics = [
+        ("concurrency_limit", "gauge"), ("inflight", "gauge"), ("paused_s", "gauge"),
+        ("calls", "counter"), ("throttled", "counter"), ("retries", "counter"), ("wait_s", "counter"),
+    ]
+    processes = {"": limiter_stats(), **(other_processes or {})}
+    lines = []
+    for metric, kind in metrics:
+        name = f"aidemy_ratelimit_{metric}{'_total' if kind == 'counter' else ''}"
+        lines.append(f"# TYPE {name} {kind}")
+        for process, stats in sorted(processes.items()):
+            process_label = f',process="{process}"' if process else ""
+            for limiter, snapshot in sorted(stats.items()):
+                lines.append(f'{name}{{limiter="{limiter}"{process_label}}} {snapshot[metric]:g}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,13 @@
+import sqlite3
+from contextlib import contextmanager
+
+
+@contextmanager
+def connect(path: str):
+    """A short-lived SQLite connection: commits on success, rolls back on error and is always closed."""
+    conn = sqlite3.connect(path, timeout=30)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
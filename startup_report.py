@@ -0,0 +1,52 @@
+"""
+Startup-time report: shows how much each module costs to import.
+
+    python startup_report.py                     # modules the Streamlit app imports at startup
+    python startup_report.py workflow.workflow   # any other module(s)
+
+Runs each import in a fresh interpreter with `python -X importtime` and groups
+the cumulative import time by top-level package.
+"""
+import re
+import sys
+import subprocess
+from collections import defaultdict
+
+# What app.py imports before the first page renders
+DEFAULT_MODULES = ["streamlit", "agents.deconstructor", "agents.drafts", "workflow.jobs", "database"]
+
+_LINE = re.compile(r"import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def import_times(module: str):
+    """Returns [(module_name, self_us, cumulative_us, depth)] for importing `module`."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True,
+    )
+    if proc.returncode != 0:
+        print(f"❌ Importing '{module}' failed:\n{proc.stderr.strip().splitlines()[-1]}")
+    rows = []
+    for line in proc.stderr.splitlines():
+        match = _LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def report(module: str, top: int = 15):
+    rows = import_times(module)
+    total = next((cum for name, _, cum, _ in reversed(rows) if name == module), sum(r[1] for r in rows))
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"\n🚀 import {module}: {total / 1000:.1f} ms total")
+    for package, self_us in sorted(by_package.items(), key=lambda kv: kv[1], reverse=True)[:top]:
+        print(f"   {self_us / 1000:8.1f} ms  {package}")
+
+
+if __name__ == "__main__":
+    for module in sys.argv[1:] or DEFAULT_MODULES:
+        report(module)
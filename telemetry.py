@@ -0,0 +1,435 @@
+import os
+import json
+import time
+import uuid
+import threading
+import contextvars
+import multiprocessing
+from functools import wraps
+from contextlib import contextmanager
+from collections import OrderedDict, defaultdict, deque
+
+# Set TELEMETRY_DISABLED=1 to turn span recording off entirely.
+TELEMETRY_DISABLED = os.getenv("TELEMETRY_DISABLED", "0") == "1"
+# Recent spans kept in memory for export, and how many course traces are kept for summaries.
+TELEMETRY_MAX_SPANS = int(os.getenv("TELEMETRY_MAX_SPANS", "20000"))
+TELEMETRY_MAX_TRACES = int(os.getenv("TELEMETRY_MAX_TRACES", "50"))
+# When set, every finished course trace is written there as OpenTelemetry (OTLP) JSON.
+TELEMETRY_EXPORT_DIR = os.getenv("TELEMETRY_EXPORT_DIR", "")
+# When set, Prometheus metrics are served on http://<host>:<port>/metrics.
+TELEMETRY_PROMETHEUS_PORT = int(os.getenv("TELEMETRY_PROMETHEUS_PORT", "0"))
+# How often generation worker processes publish their metrics to the main process (seconds).
+TELEMETRY_METRICS_SYNC_INTERVAL = float(os.getenv("TELEMETRY_METRICS_SYNC_INTERVAL", "5"))
+
+# Upper bounds (seconds) of the Prometheus latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+_current_span = contextvars.ContextVar("telemetry_current_span", default=None)
+_current_trace = contextvars.ContextVar("telemetry_current_trace", default=None)
+
+
+class Span:
+    """One timed operation: a graph node, an LLM call, a search call or a Cypher query."""
+    def __init__(self, name: str, kind: str, trace_id: str, parent_id: str = None, attributes: dict = None):
+        self.name = name
+        self.kind = kind
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = dict(attributes or {})
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.error = None
+        self._start = time.perf_counter()
+        self.duration = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+        return self
+
+    def elapsed(self) -> float:
+        """Seconds since the span started (its duration once ended)."""
+        if self.duration is not None:
+            return self.duration
+        return time.perf_counter() - self._start
+
+    def end(self, error: BaseException = None):
+        if self.end_ns is not None:
+            return
+        self.duration = self.elapsed()
+        self.end_ns = time.time_ns()
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        RECORDER.record(self)
+
+    def to_otel(self) -> dict:
+        """The span in OTLP/JSON form."""
+        return {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "parentSpanId": self.parent_id or "",
+            "name": self.name,
+            "kind": 3 if self.kind in ("llm", "search", "db") else 1,  # CLIENT / INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otel_attribute(k, v) for k, v in {"kind": self.kind, **self.attributes}.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+
+
+def _otel_attribute(key, value):
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+class Recorder:
+    """
+    Keeps finished spans in memory: the most recent ones for export, the spans of
+    recent course traces for per-course summaries, and running aggregates for Prometheus.
+    """
+    def __init__(self, max_spans=TELEMETRY_MAX_SPANS, max_traces=TELEMETRY_MAX_TRACES):
+        self.spans = deque(maxlen=max_spans)
+        self.traces = OrderedDict()  # trace_id -> {"course_id": ..., "spans": [...]}
+        self.max_traces = max_traces
+        self._lock = threading.Lock()
+        self._durations = defaultdict(lambda: [0] * (len(LATENCY_BUCKETS) + 1) + [0.0])
+        self._counters = defaultdict(float)
+
+    def start_trace(self, trace_id: str, course_id: str):
+        with self._lock:
+            self.traces[trace_id] = {"course_id": course_id, "spans": []}
+            while len(self.traces) > self.max_traces:
+                self.traces.popitem(last=False)
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            trace = self.traces.get(span.trace_id)
+            if trace is not None:
+                trace["spans"].append(span)
+            self._aggregate(span)
+
+    def _aggregate(self, span: Span):
+        buckets = self._durations[(span.kind, span.name)]
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if span.duration <= bound:
+                buckets[i] += 1
+        buckets[len(LATENCY_BUCKETS)] += 1  # count (+Inf)
+        buckets[-1] += span.duration       # sum
+        attrs = span.attributes
+        if span.error:
+            self._counters[("errors_total", (("kind", span.kind), ("name", span.name)))] += 1
+        if span.kind == "llm":
+            model = (("model", str(attrs.get("model", ""))),)
+            self._counters[("llm_prompt_tokens_total", model)] += attrs.get("prompt_tokens") or 0
+            self._counters[("llm_completion_tokens_total", model)] += attrs.get("completion_tokens") or 0
+            if attrs.get("cache_hit"):
+                self._counters[("llm_cache_hits_total", model)] += 1
+        elif span.kind == "search":
+            source = (("source", str(attrs.get("source", ""))),)
+            self._counters[("search_bytes_total", source)] += attrs.get("bytes") or 0
+            if attrs.get("cache_hit"):
+                self._counters[("search_cache_hits_total", source)] += 1
+
+    def trace_spans(self, trace_id: str) -> list:
+        with self._lock:
+            trace = self.traces.get(trace_id)
+            return list(trace["spans"]) if trace else []
+
+    def metrics_state(self) -> dict:
+        """Picklable copy of the aggregates, as published by worker processes."""
+        with self._lock:
+            return {"durations": {k: list(v) for k, v in self._durations.items()},
+                    "counters": dict(self._counters)}
+
+    def prometheus_text(self, other_processes=()) -> str:
+        """All aggregates, summed with those of `other_processes` (metrics_state() dicts), in the Prometheus text format."""
+        durations, counters = {}, defaultdict(float)
+        for state in [self.metrics_state(), *other_processes]:
+            for key, buckets in state["durations"].items():
+                total = durations.setdefault(key, [0] * len(buckets))
+                for i, value in enumerate(buckets):
+                    total[i] += value
+            for key, value in state["counters"].items():
+                counters[key] += value
+        lines = [
+            "# HELP aidemy_span_duration_seconds Duration of graph nodes, LLM calls, search calls and Cypher queries.",
+            "# TYPE aidemy_span_duration_seconds histogram",
+        ]
+        for (kind, name), buckets in sorted(durations.items()):
+            labels = f'kind="{kind}",name="{_escape(name)}"'
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                lines.append(f'aidemy_span_duration_seconds_bucket{{{labels},le="{bound}"}} {buckets[i]}')
+            lines.append(f'aidemy_span_duration_seconds_bucket{{{labels},le="+Inf"}} {buckets[len(LATENCY_BUCKETS)]}')
+            lines.append(f'aidemy_span_duration_seconds_sum{{{labels}}} {buckets[-1]:.6f}')
+            lines.append(f'aidemy_span_duration_seconds_count{{{labels}}} {buckets[len(LATENCY_BUCKETS)]}')
+        seen = set()
+        for (metric, labels), value in sorted(counters.items()):
+            if metric not in seen:
+                lines.append(f"# TYPE aidemy_{metric} counter")
+                seen.add(metric)
+            label_text = ",".join(f'{k}="{_escape(v)}"' for k, v in labels)
+            lines.append(f"aidemy_{metric}{{{label_text}}} {value:g}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+RECORDER = Recorder()
+
+
+class _NoopSpan:
+    def set(self, **attributes):
+        return self
+
+    def end(self, error=None):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def start_span(name: str, kind: str = "internal", **attributes):
+    """
+    Starts a span under the current one without making it current, for
+    operations that begin and end in callbacks (e.g. LLM calls). Call .end() on it.
+    """
+    if TELEMETRY_DISABLED:
+        return _NOOP_SPAN
+    parent = _current_span.get()
+    trace_id = parent.trace_id if parent else (_current_trace.get() or uuid.uuid4().hex)
+    return Span(name, kind, trace_id, parent.span_id if parent else None, attributes)
+
+
+@contextmanager
+def span(name: str, kind: str = "internal", **attributes):
+    """Times the enclosed block as a span; nested spans and LLM calls become its children."""
+    current = start_span(name, kind, **attributes)
+    if current is _NOOP_SPAN:
+        yield current
+        return
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.end(error=e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+@contextmanager
+def trace(course_id: str, **attributes):
+    """
+    Groups every span started inside the block (a whole course generation) under
+    one trace ID. Yields the trace ID for trace_summary().
+    """
+    trace_id = uuid.uuid4().hex
+    RECORDER.start_trace(trace_id, course_id)
+    _ensure_metrics_server()
+    token = _current_trace.set(trace_id)
+    try:
+        with span("generate_course", kind="course", course_id=course_id, **attributes):
+            yield trace_id
+    finally:
+        _current_trace.reset(token)
+        if TELEMETRY_EXPORT_DIR:
+            export_otel_json(os.path.join(TELEMETRY_EXPORT_DIR, f"{course_id}-{trace_id}.json"), trace_id)
+
+
+def traced_node(name: str, fn):
+    """Wraps a LangGraph node so each run of it is recorded as a 'node' span."""
+    @wraps(fn)
+    def node(state):
+        attributes = {"lesson_id": state["id"]} if isinstance(state, dict) and "id" in state else {}
+        with span(f"node.{name}", kind="node", **attributes):
+            return fn(state)
+    return node
+
+
+def bind_context(fn):
+    """
+    Carries the caller's trace into worker threads: ThreadPoolExecutor does not
+    copy context variables, so wrap the function when submitting it.
+    """
+    context = contextvars.copy_context()
+    @wraps(fn)
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+# The LLM cache reports hits here; the LLM callback runs on the same thread and picks it up.
+_cache_lookups = threading.local()
+
+
+def note_cache_lookup(hit: bool):
+    _cache_lookups.hit = hit
+
+
+def pop_cache_lookup():
+    hit = getattr(_cache_lookups, "hit", None)
+    _cache_lookups.hit = None
+    return hit
+
+
+def trace_summary(trace_id: str) -> dict:
+    """
+    Per-course timing: wall time, time per graph node, and totals for LLM, search
+    and database calls. Call totals are summed, so parallel calls can exceed wall time.
+    """
+    spans = RECORDER.trace_spans(trace_id)
+    summary = {
+        "wall_s": 0.0,
+        "nodes": {},
+        "llm": {"calls": 0, "total_s": 0.0, "cache_hits": 0, "prompt_tokens": 0, "completion_tokens": 0, "errors": 0},
+        "search": {"calls": 0, "total_s": 0.0, "bytes": 0, "cache_hits": 0, "by_source": {}},
+        "db": {"calls": 0, "total_s": 0.0, "errors": 0},
+    }
+    for s in spans:
+        attrs = s.attributes
+        if s.kind == "course":
+            summary["wall_s"] = round(s.duration, 3)
+        elif s.kind == "node":
+            node = summary["nodes"].setdefault(s.name.removeprefix("node."), {"runs": 0, "total_s": 0.0, "max_s": 0.0})
+            node["runs"] += 1
+            node["total_s"] += s.duration
+            node["max_s"] = max(node["max_s"], s.duration)
+        elif s.kind == "llm":
+            llm = summary["llm"]
+            llm["calls"] += 1
+            llm["total_s"] += s.duration
+            llm["cache_hits"] += 1 if attrs.get("cache_hit") else 0
+            llm["prompt_tokens"] += attrs.get("prompt_tokens") or 0
+            llm["completion_tokens"] += attrs.get("completion_tokens") or 0
+            llm["errors"] += 1 if s.error else 0
+        elif s.kind == "search":
+            search = summary["search"]
+            search["calls"] += 1
+            search["total_s"] += s.duration
+            search["bytes"] += attrs.get("bytes") or 0
+            search["cache_hits"] += 1 if attrs.get("cache_hit") else 0
+            source = search["by_source"].setdefault(attrs.get("source", "?"), {"calls": 0, "total_s": 0.0})
+            source["calls"] += 1
+            source["total_s"] += s.duration
+        elif s.kind == "db":
+            summary["db"]["calls"] += 1
+            summary["db"]["total_s"] += s.duration
+            summary["db"]["errors"] += 1 if s.error else 0
+    return _rounded(summary)
+
+
+def _rounded(value):
+    if isinstance(value, dict):
+        return {k: _rounded(v) for k, v in value.items()}
+    return round(value, 3) if isinstance(value, float) else value
+
+
+def export_otel_json(path: str = None, trace_id: str = None) -> dict:
+    """
+    Exports spans (one trace, or all recent spans) as OTLP/JSON, the format the
+    OpenTelemetry collector accepts on /v1/traces. Writes it to `path` if given.
+    """
+    spans = RECORDER.trace_spans(trace_id) if trace_id else list(RECORDER.spans)
+    payload = {"resourceSpans": [{
+        "resource": {"attributes": [_otel_attribute("service.name", "ai-demy")]},
+        "scopeSpans": [{"scope": {"name": "ai-demy.telemetry"}, "spans": [s.to_otel() for s in spans]}],
+    }]}
+    if path:
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(payload, f)
+    return payload
+
+
+# With generation worker processes, each one publishes its aggregates and limiter stats into a
+# store shared with the main process (a multiprocessing.Manager dict), which serves them all.
+_shared_metrics = None
+
+
+def use_shared_metrics(store, publisher: str = None):
+    """
+    In a worker process (`publisher` names it), publishes this process's metrics to `store`
+    every TELEMETRY_METRICS_SYNC_INTERVAL seconds. In the main process, serves the metrics
+    published there on /metrics along with its own, and starts the metrics server.
+    """
+    global _shared_metrics
+    _shared_metrics = store
+    if publisher is None:
+        _ensure_metrics_server()
+        return
+
+    def publish():
+        while True:
+            publish_metrics(publisher)
+            time.sleep(TELEMETRY_METRICS_SYNC_INTERVAL)
+    threading.Thread(target=publish, name="metrics-publisher", daemon=True).start()
+
+
+def publish_metrics(publisher: str):
+    """Sends this process's current metrics to the shared store (see use_shared_metrics)."""
+    import ratelimit
+    if _shared_metrics is not None:
+        _shared_metrics[publisher] = {"recorder": RECORDER.metrics_state(), "limiters": ratelimit.limiter_stats()}
+
+
+def prometheus_text() -> str:
+    import ratelimit
+    published = dict(_shared_metrics) if _shared_metrics is not None and multiprocessing.parent_process() is None else {}
+    return (RECORDER.prometheus_text([p["recorder"] for p in published.values()])
+            + ratelimit.prometheus_text({name: p["limiters"] for name, p in published.items()}))
+
+
+_metrics_server_started = False
+_metrics_server_lock = threading.Lock()
+
+
+def _ensure_metrics_server():
+    """
+    Starts the metrics server once, in the main process only: worker processes
+    publish their metrics to it instead (see use_shared_metrics).
+    """
+    global _metrics_server_started
+    if not TELEMETRY_PROMETHEUS_PORT or _metrics_server_started or multiprocessing.parent_process() is not None:
+        return
+    with _metrics_server_lock:
+        if not _metrics_server_started:
+            _metrics_server_started = True
+            try:
+                start_metrics_server(TELEMETRY_PROMETHEUS_PORT)
+            except OSError as e:
+                # Never fail a generation job over metrics
+                print(f"⚠️ Could not serve Prometheus metrics on port {TELEMETRY_PROMETHEUS_PORT}: {e}")
+
+
+def start_metrics_server(port: int, host: str = "0.0.0.0"):
+    """Serves prometheus_text() on /metrics from a daemon thread."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Prometheus metrics on http://{host}:{port}/metrics")
+    return server
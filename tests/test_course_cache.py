@@ -0,0 +1,34 @@
+from agents.course_cache import CourseCache
+
+
+def outline(*completed):
+    return {"modules": [{"lessons": [{"id": f"c:m1:l{i}", "completed": done} for i, done in enumerate(completed, 1)]}]}
+
+
+def mark_first(course):
+    course["modules"][0]["lessons"][0]["completed"] = True
+
+
+def test_patch_applies_to_the_previous_version():
+    cache = CourseCache()
+    cache.put("c", 3, outline(False, False))
+    cache.patch("c", 4, mark_first)
+    assert cache.get("c", 4)["modules"][0]["lessons"][0]["completed"] is True
+    assert cache.get("c", 3) is None
+
+
+def test_patch_invalidates_a_stale_outline():
+    cache = CourseCache()
+    cache.put("c", 3, outline(False, False))
+    # A generation write bumped the version to 4 without touching the cache
+    cache.patch("c", 5, mark_first)
+    assert cache.get("c", 5) is None
+    assert cache.cached_version("c") is None
+
+
+def test_patch_does_not_touch_the_original():
+    cache = CourseCache()
+    original = outline(False)
+    cache.put("c", 1, original)
+    cache.patch("c", 2, mark_first)
+    assert original["modules"][0]["lessons"][0]["completed"] is False
@@ -0,0 +1,30 @@
+from database import make_course_id, course_id_of
+
+
+def test_course_id_is_stable_and_normalized():
+    assert make_course_id("Quantum Physics!") == make_course_id("  quantum   PHYSICS! ")
+    assert make_course_id("Quantum Physics!").startswith("quantum-physics-")
+
+
+def test_non_ascii_topics_get_distinct_readable_ids():
+    greek = make_course_id("Ιστορία της Ελλάδας")
+    japanese = make_course_id("日本語")
+    assert greek.startswith("ιστορία-")  # casefolded, so the final sigma becomes σ
+    assert japanese.startswith("日本語-")
+    assert greek != japanese
+
+
+def test_topics_that_slug_alike_stay_apart():
+    ids = {make_course_id(topic) for topic in ("C++", "C#", "C")}
+    assert len(ids) == 3
+
+
+def test_punctuation_only_topic_never_maps_to_a_constant():
+    assert make_course_id("!!!") != make_course_id("???")
+    assert make_course_id("!!!")
+
+
+def test_course_id_never_contains_the_id_separator():
+    course_id = make_course_id("Networking: TCP/IP")
+    assert ":" not in course_id
+    assert course_id_of(f"{course_id}:m1:l2") == course_id
@@ -0,0 +1,37 @@
+import pytest
+
+import database
+from agents import deconstructor
+from benchmarks.fake_graph import InMemoryGraph
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    fake = InMemoryGraph(latency=0)
+    monkeypatch.setattr(database, "execute_read", fake.execute)
+    monkeypatch.setattr(database, "execute_write", fake.execute)
+    monkeypatch.setattr(deconstructor, "_schema_ready", True)
+    deconstructor.invalidate_course_list()
+    yield fake
+    deconstructor.invalidate_course_list()
+
+
+def test_course_list_is_cached_until_invalidated(graph):
+    assert deconstructor.get_all_courses() == []
+    graph.courses["c"] = {"title": "Chemistry", "version": 1, "modules": []}
+    assert deconstructor.get_all_courses() == []
+    deconstructor.invalidate_course_list()
+    assert deconstructor.get_all_courses() == ["Chemistry"]
+
+
+def test_failed_read_is_not_cached(graph, monkeypatch):
+    graph.courses["c"] = {"title": "Chemistry", "version": 1, "modules": []}
+
+    def unavailable(query, parameters=None):
+        raise ConnectionError("Neo4j is down")
+
+    monkeypatch.setattr(database, "execute_read", unavailable)
+    with pytest.raises(ConnectionError):
+        deconstructor.get_all_courses()
+    monkeypatch.setattr(database, "execute_read", graph.execute)
+    assert deconstructor.get_all_courses() == ["Chemistry"]
@@ -0,0 +1,44 @@
+import pytest
+
+from agents.deconstructor import validate_course_skeleton
+
+
+def test_orders_and_ids_modules_and_lessons():
+    skeleton = {"modules": [
+        {"title": "Later", "order_index": 2, "lessons": [{"title": "C", "order_index": 1}]},
+        {"title": " First ", "order_index": 1, "lessons": [
+            {"title": "B", "order_index": 2},
+            {"title": " A ", "order_index": 1},
+        ]},
+    ]}
+    params = validate_course_skeleton(skeleton, "course")
+
+    assert params["course_id"] == "course"
+    assert [m["title"] for m in params["modules"]] == ["First", "Later"]
+    assert [m["id"] for m in params["modules"]] == ["course:m1", "course:m2"]
+    first = params["modules"][0]["lessons"]
+    assert [(l["id"], l["title"], l["order_index"]) for l in first] == [
+        ("course:m1:l1", "A", 1), ("course:m1:l2", "B", 2)]
+    assert params["lesson_links"] == [{"from": "course:m1:l1", "to": "course:m1:l2"}]
+    assert params["module_links"] == [{"from": "course:m1", "to": "course:m2"}]
+
+
+def test_accepts_plain_lesson_titles_and_missing_order():
+    params = validate_course_skeleton({"modules": [{"title": "M", "lessons": ["One", "Two"]}]}, "c")
+    assert [l["title"] for l in params["modules"][0]["lessons"]] == ["One", "Two"]
+
+
+@pytest.mark.parametrize("skeleton", [
+    None,
+    {},
+    {"modules": []},
+    {"modules": [{"lessons": ["A"]}]},
+    {"modules": [{"title": " ", "lessons": ["A"]}]},
+    {"modules": [{"title": "M", "lessons": []}]},
+    {"modules": [{"title": "M"}]},
+    {"modules": [{"title": "M", "lessons": [{"title": ""}]}]},
+    {"modules": [{"title": "M", "lessons": [{"order_index": 1}]}]},
+])
+def test_rejects_unusable_outlines(skeleton):
+    with pytest.raises(ValueError):
+        validate_course_skeleton(skeleton, "c")
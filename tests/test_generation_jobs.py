@@ -0,0 +1,116 @@
+import threading
+
+import pytest
+
+import database
+from agents import deconstructor
+from benchmarks.fake_graph import InMemoryGraph
+from database import make_course_id
+from workflow import jobs, worker_pool
+
+
+@pytest.fixture
+def graph(monkeypatch, tmp_path):
+    fake = InMemoryGraph(latency=0)
+    monkeypatch.setattr(database, "execute_read", fake.execute)
+    monkeypatch.setattr(database, "execute_write", fake.execute)
+    monkeypatch.setattr(deconstructor, "_schema_ready", True)
+    monkeypatch.setattr(worker_pool, "GENERATION_WORKERS", 0)
+    monkeypatch.setattr(jobs, "_inflight", {})
+    monkeypatch.setattr(jobs, "JOBS_STATE_DIR", str(tmp_path / "jobs"))
+    return fake
+
+
+@pytest.fixture
+def blocked_jobs(monkeypatch):
+    """Jobs that run until `release` is set; `started` lists them."""
+    release = threading.Event()
+    started = []
+
+    def run(job):
+        started.append(job)
+        release.wait(5)
+        job.state = "done"
+        job.done = True
+
+    monkeypatch.setattr(jobs.GenerationJob, "_run", run)
+    yield release, started
+    release.set()
+
+
+def test_concurrent_requests_share_one_job(graph, blocked_jobs):
+    release, started = blocked_jobs
+    barrier = threading.Barrier(8)
+    results = []
+
+    def request(topic):
+        barrier.wait()
+        results.append(jobs.start_generation(topic))
+
+    spellings = ["Graph Theory", "graph theory", " Graph  Theory "]
+    threads = [threading.Thread(target=request, args=(spellings[i % 3],)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(results) == 8
+    assert len({id(job) for job in results}) == 1
+    assert len(started) == 1
+    release.set()
+
+
+def test_finished_job_is_not_joined(graph, blocked_jobs):
+    release, started = blocked_jobs
+    first = jobs.start_generation("Graph Theory")
+    release.set()
+    first._thread.join(5)
+
+    second = jobs.start_generation("Graph Theory")
+    assert second is not first
+    assert len(started) == 2
+
+
+def test_complete_course_starts_no_job(graph, blocked_jobs):
+    _, started = blocked_jobs
+    course_id = make_course_id("Graph Theory")
+    graph.courses[course_id] = {"title": "Graph Theory", "version": 1, "modules": ["m"]}
+    graph.modules["m"] = {"id": "m", "title": "M", "order_index": 1, "lessons": ["l"]}
+    graph.lessons["l"] = {"id": "l", "title": "L", "order_index": 1, "course_id": course_id,
+                          "content_text": "Done", "status": "complete", "completed": False}
+
+    job = jobs.start_generation("Graph Theory")
+    assert job.existing and job.state == "done"
+    assert started == []
+
+
+@pytest.fixture
+def unreadable_db(graph, monkeypatch):
+    def unavailable(query, parameters=None):
+        raise ConnectionError("Neo4j is unreachable")
+
+    monkeypatch.setattr(database, "execute_read", unavailable)
+
+
+def test_db_read_failure_fails_the_job(unreadable_db, monkeypatch):
+    from workflow import workflow
+    monkeypatch.setattr(workflow, "WORKFLOW_CHECKPOINT_PATH", "")
+    for cached in (workflow.get_checkpointer, workflow.get_compiled_graph, workflow.get_langgraph_app):
+        cached.cache_clear()
+    try:
+        job = jobs.GenerationJob("Graph Theory").start()
+        job._thread.join(10)
+    finally:
+        for cached in (workflow.get_checkpointer, workflow.get_compiled_graph, workflow.get_langgraph_app):
+            cached.cache_clear()
+
+    assert job.state == "failed"
+    assert "Neo4j is unreachable" in job.error
+    assert job.ready_lessons == []
+    assert job.wait_first_lesson(0)  # waiters are released, not left hanging
+
+
+def test_db_read_failure_is_raised_by_start_generation(unreadable_db):
+    with pytest.raises(ConnectionError):
+        jobs.start_generation("Graph Theory")
+    assert jobs._inflight == {}
@@ -0,0 +1,57 @@
+import pytest
+
+import database
+from agents.deconstructor import (LessonWriteBatcher, RESEARCH_BATCH_QUERY, INSERT_SKELETON_QUERY,
+                                  validate_course_skeleton)
+from benchmarks.fake_graph import InMemoryGraph
+
+
+@pytest.fixture
+def graph(monkeypatch):
+    fake = InMemoryGraph(latency=0)
+    skeleton = {"modules": [{"title": "Basics", "lessons": ["One", "Two", "Three"]}]}
+    fake.execute(INSERT_SKELETON_QUERY, {**validate_course_skeleton(skeleton, "c"), "title": "Course"})
+
+    def execute(query, parameters=None):
+        # Neo4j rejects the whole UNWIND transaction if one row is bad
+        if any(row["id"] == "c:m1:l2" for row in (parameters or {}).get("rows", [])):
+            raise RuntimeError("constraint violation")
+        return fake.execute(query, parameters)
+
+    monkeypatch.setattr(database, "execute_write", execute)
+    return fake
+
+
+def _row(lesson_id):
+    return {"id": lesson_id, "title": lesson_id, "notes": f"notes for {lesson_id}", "source": "wiki_tool"}
+
+
+def test_batch_is_written_in_one_round_trip(graph):
+    calls = graph.calls
+    with LessonWriteBatcher(RESEARCH_BATCH_QUERY, max_rows=10) as batch:
+        batch.add(_row("c:m1:l1"))
+        batch.add(_row("c:m1:l3"))
+    assert graph.calls == calls + 1
+    assert graph.lessons["c:m1:l3"]["research_notes"] == "notes for c:m1:l3"
+    assert batch.failed_ids() == set()
+
+
+def test_failed_batch_keeps_the_good_rows_and_reports_the_bad_one(graph):
+    with LessonWriteBatcher(RESEARCH_BATCH_QUERY, max_rows=10) as batch:
+        for lesson_id in ("c:m1:l1", "c:m1:l2", "c:m1:l3"):
+            batch.add(_row(lesson_id))
+
+    assert batch.failed_ids() == {"c:m1:l2"}
+    assert isinstance(batch.failed[0][1], RuntimeError)
+    assert graph.lessons["c:m1:l1"]["research_notes"] == "notes for c:m1:l1"
+    assert graph.lessons["c:m1:l3"]["research_notes"] == "notes for c:m1:l3"
+    assert "research_notes" not in graph.lessons["c:m1:l2"]
+
+
+def test_full_batch_flushes_without_waiting_for_close(graph):
+    batch = LessonWriteBatcher(RESEARCH_BATCH_QUERY, max_rows=2, max_delay=60)
+    batch.add(_row("c:m1:l1"))
+    assert "research_notes" not in graph.lessons["c:m1:l1"]
+    batch.add(_row("c:m1:l3"))
+    assert graph.lessons["c:m1:l1"]["research_notes"] == "notes for c:m1:l1"
+    batch.close()
@@ -0,0 +1,104 @@
+import time
+from typing import Any, List, Optional
+
+import pytest
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from agents import llm_router
+from agents.llm_router import RouterChatModel, backend_health
+
+
+class ScriptedBackend(BaseChatModel):
+    """Answers with its own name, after `delay` seconds, or raises `error`."""
+    name: str
+    delay: float = 0.0
+    error: str = ""
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                  run_manager=None, **kwargs: Any) -> ChatResult:
+        time.sleep(self.delay)
+        if self.error:
+            raise ConnectionError(self.error)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self.name))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None,
+                run_manager=None, **kwargs: Any):
+        if self.error:
+            raise ConnectionError(self.error)
+        for word in (self.name, " says", " hi"):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word))
+
+
+@pytest.fixture(autouse=True)
+def fresh_health(monkeypatch):
+    monkeypatch.setattr(llm_router, "_health", {})
+
+
+def _router(*backends, **settings):
+    return RouterChatModel(backends=list(backends), backend_names=[b.name for b in backends], **settings)
+
+
+def _in_order(monkeypatch, *order):
+    monkeypatch.setattr(RouterChatModel, "_ordered_backends", lambda self: list(order))
+
+
+def test_fails_over_to_the_next_backend_on_error(monkeypatch):
+    _in_order(monkeypatch, 0, 1)
+    router = _router(ScriptedBackend(name="down", error="connection refused"), ScriptedBackend(name="up"))
+
+    result = router._generate([HumanMessage(content="hello")])
+    assert result.generations[0].message.content == "up"
+    assert result.llm_output["backend"] == "up"
+    assert backend_health("down").snapshot()["errors"] == 1
+    assert backend_health("up").snapshot()["errors"] == 0
+
+
+def test_fails_over_when_a_backend_times_out(monkeypatch):
+    _in_order(monkeypatch, 0, 1)
+    router = _router(ScriptedBackend(name="slow", delay=1.0), ScriptedBackend(name="fast"), timeout=0.1)
+
+    start = time.monotonic()
+    assert router.invoke("hello").content == "fast"
+    assert time.monotonic() - start < 0.9
+    assert backend_health("slow").snapshot()["cooling_down"]
+
+
+def test_hedged_call_returns_the_first_answer(monkeypatch):
+    _in_order(monkeypatch, 0, 1)
+    router = _router(ScriptedBackend(name="slow", delay=1.0), ScriptedBackend(name="fast"), hedge_after=0.05)
+
+    start = time.monotonic()
+    assert router.invoke("hello").content == "fast"
+    assert time.monotonic() - start < 0.9
+
+
+def test_raises_with_every_error_when_all_backends_fail(monkeypatch):
+    _in_order(monkeypatch, 0, 1)
+    router = _router(ScriptedBackend(name="a", error="boom"), ScriptedBackend(name="b", error="bang"))
+
+    with pytest.raises(RuntimeError, match="All LLM backends failed") as failure:
+        router.invoke("hello")
+    assert "a: ConnectionError: boom" in str(failure.value)
+    assert "b: ConnectionError: bang" in str(failure.value)
+
+
+def test_failed_backend_is_tried_last_while_cooling_down():
+    router = _router(ScriptedBackend(name="flaky"), ScriptedBackend(name="steady"))
+    backend_health("flaky").started()
+    backend_health("flaky").failed()
+
+    assert all(router._ordered_backends() == [1, 0] for _ in range(20))
+
+
+def test_stream_fails_over_before_the_first_chunk(monkeypatch):
+    _in_order(monkeypatch, 0, 1)
+    router = _router(ScriptedBackend(name="down", error="connection refused"), ScriptedBackend(name="up"))
+
+    assert "".join(chunk.content for chunk in router.stream("hello")) == "up says hi"
+    assert backend_health("down").snapshot()["errors"] == 1
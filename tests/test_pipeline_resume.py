@@ -0,0 +1,81 @@
+import pytest
+
+import database
+from agents import deconstructor
+from agents.deconstructor import INSERT_SKELETON_QUERY, validate_course_skeleton
+from benchmarks.fake_graph import InMemoryGraph
+from database import make_course_id
+from workflow import jobs, workflow
+
+TOPIC = "Resumable Course"
+
+
+class ProcessDied(BaseException):
+    """Escapes the pipeline's error handling, like the process being killed mid-lesson."""
+
+
+@pytest.fixture
+def pipeline(monkeypatch, tmp_path):
+    """The pipeline workflow on an in-memory graph, with a fresh checkpoint file and fake agents."""
+    graph = InMemoryGraph(latency=0)
+    monkeypatch.setattr(database, "execute_read", graph.execute)
+    monkeypatch.setattr(database, "execute_write", graph.execute)
+    monkeypatch.setattr(deconstructor, "_schema_ready", True)
+    monkeypatch.setattr(workflow, "WORKFLOW_MODE", "pipeline")
+    monkeypatch.setattr(workflow, "PIPELINE_MAX_CONCURRENCY", 1)
+    monkeypatch.setattr(workflow, "WORKFLOW_CHECKPOINT_PATH", str(tmp_path / "checkpoints.sqlite"))
+    monkeypatch.setattr(jobs, "JOBS_STATE_DIR", str(tmp_path / "jobs"))
+    monkeypatch.setattr(workflow, "_llm", lambda: None)
+    written = []
+    crash_on = set()
+
+    def fake_write_lesson(llm, title, notes, lesson_id=None):
+        if lesson_id in crash_on:
+            raise ProcessDied()
+        written.append(lesson_id)
+        return {"text": f"About {title}", "script": "", "quiz": []}
+
+    monkeypatch.setattr(workflow, "research_lesson", lambda llm, course, title: (f"Notes on {title}", "wiki_tool"))
+    monkeypatch.setattr(workflow, "write_lesson", fake_write_lesson)
+    for cached in (workflow.get_checkpointer, workflow.get_compiled_graph, workflow.get_langgraph_app):
+        cached.cache_clear()
+
+    skeleton = {"modules": [{"title": "Basics", "lessons": ["One", "Two", "Three"]}]}
+    graph.execute(INSERT_SKELETON_QUERY,
+                  {**validate_course_skeleton(skeleton, make_course_id(TOPIC)), "title": TOPIC})
+    yield graph, written, crash_on
+    for cached in (workflow.get_checkpointer, workflow.get_compiled_graph, workflow.get_langgraph_app):
+        cached.cache_clear()
+
+
+def test_interrupted_job_resumes_without_redoing_finished_lessons(pipeline):
+    graph, written, crash_on = pipeline
+    course_id = make_course_id(TOPIC)
+    crash_on.add(f"{course_id}:m1:l2")
+    with pytest.raises(ProcessDied):
+        workflow.get_langgraph_app().invoke({"topic": TOPIC}, workflow.job_config(course_id))
+    assert f"{course_id}:m1:l2" not in written
+    assert workflow.is_interrupted(course_id)
+
+    before = list(written)
+    crash_on.clear()
+    job = jobs.GenerationJob(TOPIC).start()
+    job._thread.join(10)
+
+    assert job.state == "done" and job.resumed
+    # Only the lesson that was cut off is written again
+    assert written == before + [f"{course_id}:m1:l2"]
+    assert sorted(written) == [f"{course_id}:m1:l1", f"{course_id}:m1:l2", f"{course_id}:m1:l3"]
+    assert set(job.ready_lessons) == set(written)
+    assert all(lesson.get("content_text") for lesson in graph.lessons.values())
+    assert not workflow.is_interrupted(course_id)
+
+
+def test_finished_job_is_not_resumed(pipeline):
+    graph, written, _ = pipeline
+    job = jobs.GenerationJob(TOPIC).start()
+    job._thread.join(10)
+
+    assert job.state == "done" and not job.resumed
+    assert len(written) == 3
+    assert jobs.unfinished_jobs() == []
@@ -0,0 +1,117 @@
+import time
+
+import pytest
+
+import ratelimit
+from ratelimit import RateLimiter
+
+
+class Throttled(Exception):
+    status_code = 429
+
+    def __init__(self, headers=None):
+        super().__init__("Too Many Requests")
+        self.response = type("Response", (), {"headers": headers or {}})()
+
+
+class Flaky(Exception):
+    status_code = 500
+
+
+def throttle(limiter, error=None):
+    with pytest.raises(Throttled):
+        with limiter.slot():
+            raise error or Throttled()
+    return limiter.paused_until - time.monotonic()
+
+
+@pytest.fixture
+def backoff(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF", 2.0)
+    return 2.0
+
+
+def test_backoff_doubles_on_throttles_in_a_row(backoff):
+    limiter = RateLimiter("test", max_concurrency=1)
+    assert throttle(limiter) == pytest.approx(backoff, abs=0.1)
+    limiter.paused_until = 0
+    assert throttle(limiter) == pytest.approx(2 * backoff, abs=0.1)
+    limiter.paused_until = 0
+    assert throttle(limiter) == pytest.approx(4 * backoff, abs=0.1)
+    assert limiter.throttled == 3
+
+
+def test_backoff_is_capped(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF", 50.0)
+    limiter = RateLimiter("test")
+    throttle(limiter)
+    limiter.paused_until = 0
+    assert throttle(limiter) == pytest.approx(ratelimit._MAX_BACKOFF, abs=0.1)
+
+
+def test_success_resets_the_backoff(backoff):
+    limiter = RateLimiter("test")
+    throttle(limiter)
+    limiter.paused_until = 0
+    with limiter.slot():
+        pass
+    assert throttle(limiter) == pytest.approx(backoff, abs=0.1)
+
+
+@pytest.mark.parametrize("headers, wait", [({"retry-after": "7"}, 7.0), ({"retry-after-ms": "1500"}, 1.5)])
+def test_retry_after_overrides_the_backoff(backoff, headers, wait):
+    limiter = RateLimiter("test")
+    assert throttle(limiter, Throttled(headers)) == pytest.approx(wait, abs=0.1)
+    assert limiter.paused()
+
+
+def test_throttling_halves_the_concurrency_limit_once_per_burst(backoff):
+    limiter = RateLimiter("test", max_concurrency=8)
+    throttle(limiter, Throttled({"retry-after-ms": "1"}))
+    throttle(limiter, Throttled({"retry-after-ms": "1"}))
+    assert limiter.limit == 4
+    time.sleep(0.01)
+    with limiter.slot():
+        pass
+    assert limiter.limit == pytest.approx(4.25)
+
+
+def test_call_retries_throttled_and_transient_failures(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF", 0.01)
+    monkeypatch.setattr(ratelimit.time, "sleep", lambda seconds: None)
+    errors = [Throttled(), Flaky()]
+
+    def fn():
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    limiter = RateLimiter("test")
+    assert limiter.call(fn) == "ok"
+    assert limiter.retries == 2
+
+
+def test_call_gives_up_after_max_retries(monkeypatch):
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_BACKOFF", 0.01)
+    monkeypatch.setattr(ratelimit, "RATE_LIMIT_MAX_RETRIES", 2)
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise Throttled({"retry-after-ms": "1"})
+
+    with pytest.raises(Throttled):
+        RateLimiter("test").call(fn)
+    assert len(attempts) == 3
+
+
+def test_call_does_not_retry_other_errors():
+    attempts = []
+
+    def fn():
+        attempts.append(1)
+        raise KeyError("bad request")
+
+    with pytest.raises(KeyError):
+        RateLimiter("test").call(fn)
+    assert len(attempts) == 1
@@ -0,0 +1,32 @@
+from agents.librarian import trim_research, estimate_tokens
+
+
+def test_short_research_is_kept_as_is():
+    raw = "[Wikipedia: Photosynthesis]\nPlants turn light into sugar.\n\n[arXiv: Light harvesting]\nAntenna complexes."
+    assert trim_research(raw, max_tokens=500) == raw
+
+
+def test_repeated_lines_and_paragraphs_are_dropped():
+    fact = "Photosynthesis happens in the chloroplasts."
+    raw = f"[Wikipedia: Photosynthesis]\n{fact}\n\n[DuckDuckGo: photosynthesis]\n  {fact.upper()}  \nIt needs water.\n\n{fact}"
+    trimmed = trim_research(raw, max_tokens=500)
+    assert trimmed.lower().count(fact.lower()) == 1
+    assert trimmed == f"[Wikipedia: Photosynthesis]\n{fact}\n\n[DuckDuckGo: photosynthesis]\nIt needs water."
+
+
+def test_long_research_is_cut_to_the_budget_on_a_sentence_boundary():
+    sentence = "Chlorophyll absorbs mostly blue and red light. "
+    raw = "Intro paragraph.\n\n" + "".join(f"{sentence[:-2]} number {i}. " for i in range(200))
+    trimmed = trim_research(raw, max_tokens=100)
+
+    assert estimate_tokens(trimmed) <= 100
+    assert trimmed.startswith("Intro paragraph.\n\n")
+    assert trimmed.endswith(".")
+    assert "number 0." in trimmed and "number 199." not in trimmed
+
+
+def test_paragraph_without_sentence_breaks_is_cut_at_the_budget():
+    raw = "First paragraph.\n\n" + "x" * 2000
+    trimmed = trim_research(raw, max_tokens=10)
+    assert trimmed == "First paragraph.\n\n" + "x" * 20
+    assert estimate_tokens(trimmed) <= 10
@@ -0,0 +1,62 @@
+import time
+
+from agents.router import ToolRouter, NaiveBayesClassifier, tokenize
+
+
+def make_router():
+    return ToolRouter(log_path="")
+
+
+def test_keyword_rules_decide_confidently():
+    decision = make_router().route("The History of the Roman Empire", "Ancient Rome")
+    assert decision.tool == "wiki_tool"
+    assert decision.confident
+
+
+def test_labels_from_one_course_do_not_take_over_its_other_lessons():
+    router = make_router()
+    for lesson in ("Variables and Data Types", "Control Flow with Loops", "Writing Functions"):
+        router.record(lesson, "Python Programming", llm_tool="search_tool")
+
+    history = router.route("The History of Python", "Python Programming")
+    assert history.tool == "wiki_tool"
+    assert not router.route("Recursion Theory and Proofs", "Python Programming").confident
+
+
+def test_classifier_alone_needs_enough_evidence():
+    router = make_router()
+    router.record("Sourdough Starters", "Baking", llm_tool="search_tool")
+    decision = router.route("Sourdough Starters", "Baking")
+    assert not decision.rules_matched
+    assert decision.evidence < 3
+    assert not decision.confident
+
+
+def test_unknown_words_carry_no_evidence():
+    classifier = NaiveBayesClassifier()
+    classifier.learn("quantum entanglement", "arxiv_tool")
+    scores = classifier.log_scores("zzz qqq")
+    assert scores == classifier.log_scores("")
+    assert tokenize("The Rise of the Roman Empire") == ["rise", "roman", "empire"]
+
+
+def test_course_title_nudges_but_does_not_decide():
+    router = make_router()
+    for lesson in ("Getting Started", "Core Ideas", "Next Steps"):
+        router.record(lesson, "Kubernetes Operations", llm_tool="search_tool")
+
+    with_course = router.classifier.log_scores("Overview of Pods", "Kubernetes Operations")
+    without_course = router.classifier.log_scores("Overview of Pods", "")
+    assert (with_course["search_tool"] - with_course["wiki_tool"]
+            > without_course["search_tool"] - without_course["wiki_tool"])
+    # "overview" is a wiki rule, and the course alone adds no evidence
+    assert router.route("Overview of Pods", "Kubernetes Operations").tool == "wiki_tool"
+    assert router.classifier.evidence("Pods", "search_tool") == 0
+
+
+def test_recent_years_route_to_web_search():
+    year = time.localtime().tm_year
+    decision = make_router().route(f"Remote Work in {year}", "Modern Work")
+    assert decision.tool == "search_tool"
+    assert str(year) in decision.rules_matched
+    assert "1848" not in make_router().route("The Revolutions of 1848", "Europe").rules_matched
@@ -0,0 +1,67 @@
+import pytest
+
+import tools.cache
+from tools.cache import SearchCache, normalize_query
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return SearchCache(path=str(tmp_path / "search.sqlite"), max_entries=3)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(tools.cache.time, "time", lambda: now[0])
+    return now
+
+
+def test_normalize_query():
+    assert normalize_query('  "Quantum   Physics?" ') == "quantum physics"
+    assert normalize_query("Quantum physics") == normalize_query("quantum PHYSICS!")
+
+
+def test_queries_that_normalize_alike_share_an_entry(cache):
+    cache.put("wiki_tool", "Quantum Physics", "result")
+    assert cache.get("wiki_tool", "  quantum physics. ") == "result"
+    assert cache.get("arxiv_tool", "quantum physics") is None
+
+
+def test_entries_expire_after_the_source_ttl(cache, clock):
+    cache.put("search_tool", "python tips", "result")
+    clock[0] += tools.cache.SOURCE_TTLS["search_tool"] - 1
+    assert cache.get("search_tool", "python tips") == "result"
+    clock[0] += 2
+    assert cache.get("search_tool", "python tips") is None
+
+
+def test_negative_results_use_the_shorter_ttl(cache, clock):
+    cache.put("wiki_tool", "no such page", "nothing", negative=True)
+    clock[0] += tools.cache.SEARCH_NEGATIVE_TTL + 1
+    assert cache.get("wiki_tool", "no such page") is None
+
+
+def test_least_recently_used_entries_are_evicted(cache, clock):
+    for query in ("a", "b", "c"):
+        clock[0] += 1
+        cache.put("wiki_tool", query, query.upper())
+    clock[0] += 1
+    assert cache.get("wiki_tool", "a") == "A"  # "b" is now the least recently used
+    clock[0] += 1
+    cache.put("wiki_tool", "d", "D")
+    assert cache.get("wiki_tool", "b") is None
+    assert {cache.get("wiki_tool", q) for q in ("a", "c", "d")} == {"A", "C", "D"}
+
+
+def test_get_or_fetch_never_caches_errors(cache):
+    calls = []
+
+    def failing(query):
+        calls.append(query)
+        return "boom", "error"
+
+    cache.get_or_fetch("search_tool", "q", failing)
+    cache.get_or_fetch("search_tool", "q", failing)
+    assert len(calls) == 2
+    assert cache.get_or_fetch("search_tool", "q", lambda q: ("ok", "ok"), with_status=True) == ("ok", "ok")
+    assert cache.get_or_fetch("search_tool", "q", failing, with_status=True) == ("ok", "ok")
@@ -0,0 +1,89 @@
+import time
+import threading
+
+import pytest
+
+import tools.search
+from tools.search import fan_out_search, merge_results
+
+LONG_SNIPPET = "Photosynthesis converts light energy into chemical energy stored in glucose inside plant chloroplasts"
+
+
+@pytest.fixture
+def sources(monkeypatch):
+    """Fake fetchers for fan_out_search(fetchers=...): sources["wiki_tool"] = fn(query) -> (text, status)."""
+    monkeypatch.setattr(tools.search, "_cached_search",
+                        lambda name, query, fetch, with_status=False: fetch(query))
+    return {}
+
+
+def test_merge_drops_repeated_snippets_and_empty_sources():
+    results = {
+        "wiki_tool": {"status": "ok", "text": f"[Wikipedia: photosynthesis]\n{LONG_SNIPPET}."},
+        "search_tool": {"status": "ok", "text": f"[DuckDuckGo: photosynthesis]\n\n{LONG_SNIPPET} in plants."},
+        "arxiv_tool": {"status": "timeout", "text": ""},
+    }
+    merged = merge_results(results, order=["wiki_tool", "search_tool"])
+    assert merged.count("Photosynthesis converts") == 1
+    assert "[DuckDuckGo" not in merged
+    assert merged.startswith("[Wikipedia: photosynthesis]")
+
+
+def test_merge_keeps_distinct_snippets_in_order():
+    other = "Cellular respiration releases the energy stored in glucose through glycolysis and the Krebs cycle"
+    results = {
+        "search_tool": {"status": "ok", "text": f"[DuckDuckGo: energy]\n\n{other}"},
+        "wiki_tool": {"status": "ok", "text": f"[Wikipedia: energy]\n{LONG_SNIPPET}"},
+    }
+    merged = merge_results(results, order=["wiki_tool"])
+    assert merged.index("Photosynthesis") < merged.index("Cellular respiration")
+
+
+def test_slow_source_times_out_at_its_deadline(sources):
+    sources["wiki_tool"] = lambda q: ("fast", "ok")
+    sources["arxiv_tool"] = lambda q: (time.sleep(2), ("slow", "ok"))[1]
+    start = time.monotonic()
+    results = fan_out_search({"wiki_tool": "q", "arxiv_tool": "q"},
+                             deadlines={"wiki_tool": 1, "arxiv_tool": 0.3}, hedge_after=0, fetchers=sources)
+    assert time.monotonic() - start < 1
+    assert results["wiki_tool"]["status"] == "ok"
+    assert results["arxiv_tool"]["status"] == "timeout"
+
+
+def test_silent_source_is_hedged_and_first_answer_wins(sources):
+    calls = []
+    lock = threading.Lock()
+
+    def flaky(query):
+        with lock:
+            calls.append(query)
+            first = len(calls) == 1
+        if first:
+            time.sleep(2)
+            return "first", "ok"
+        return "hedged", "ok"
+
+    sources["search_tool"] = flaky
+    start = time.monotonic()
+    results = fan_out_search({"search_tool": "q"}, deadlines={"search_tool": 1.5}, hedge_after=0.2, fetchers=sources)
+    assert len(calls) == 2
+    assert results["search_tool"]["status"] == "ok"
+    assert results["search_tool"]["text"] == "hedged"
+    assert time.monotonic() - start < 1
+
+
+def test_failed_attempt_waits_for_the_hedge(sources):
+    attempts = []
+
+    def failing_then_ok(query):
+        attempts.append(query)
+        if len(attempts) == 1:
+            time.sleep(0.4)
+            return "boom", "error"
+        time.sleep(0.5)
+        return "answer", "ok"
+
+    sources["wiki_tool"] = failing_then_ok
+    results = fan_out_search({"wiki_tool": "q"}, deadlines={"wiki_tool": 2}, hedge_after=0.1, fetchers=sources)
+    assert results["wiki_tool"]["status"] == "ok"
+    assert results["wiki_tool"]["text"] == "answer"
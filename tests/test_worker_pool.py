@@ -0,0 +1,111 @@
+import time
+import threading
+import multiprocessing
+
+import pytest
+
+import telemetry
+from agents import drafts
+from workflow import jobs, worker_pool
+from workflow.worker_pool import GenerationQueue, QueueFullError
+
+if "fork" not in multiprocessing.get_all_start_methods():
+    pytest.skip("the fake jobs reach the workers by forking", allow_module_level=True)
+
+# Set to let every running BlockingJob finish
+_release = multiprocessing.get_context("fork").Event()
+
+
+class BlockingJob:
+    """Stands in for GenerationJob in the workers: runs until released or cancelled."""
+    def __init__(self, topic, listener=None):
+        self.topic = topic
+        self.course_id = jobs.make_course_id(topic)
+        self.done = False
+        self.cancelled = threading.Event()
+        self._listener = listener
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _run(self):
+        self._listener(self)
+        while not (_release.is_set() or self.cancelled.is_set()):
+            time.sleep(0.01)
+        self.done = True
+        self._listener(self)
+
+    def snapshot(self):
+        state = "cancelled" if self.cancelled.is_set() else "done" if self.done else "running"
+        return {"topic": self.topic, "course_id": self.course_id, "state": state, "events": [],
+                "ready_lessons": [], "failed_lessons": [], "error": None, "done": self.done,
+                "first_lesson_ready": self.done, "timing": {}}
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    _release.clear()
+    monkeypatch.setattr(jobs, "GenerationJob", BlockingJob)
+    monkeypatch.setattr(worker_pool, "CANCEL_POLL_SECONDS", 0.01)
+    # The pool points these at its Manager; put them back once it is shut down
+    monkeypatch.setattr(drafts, "_shared_drafts", None)
+    monkeypatch.setattr(telemetry, "_shared_metrics", None)
+    queue = GenerationQueue(workers=1, max_queued=2, start_method="fork")
+    yield queue
+    _release.set()
+    queue.shutdown()
+
+
+def _wait_for(job, state, timeout=5):
+    deadline = time.monotonic() + timeout
+    while job.state != state and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.state
+
+
+def test_full_queue_rejects_instead_of_blocking(pool):
+    running = pool.submit("Running Course")
+    assert _wait_for(running, "running") == "running"
+    pool.submit("Queued One")
+    pool.submit("Queued Two")
+
+    with pytest.raises(QueueFullError):
+        pool.submit("One Too Many")
+    # The same course is joined, not queued again, even when the queue is full
+    assert pool.submit("running course").job_id == running.job_id
+    assert pool.active_course_ids() == {jobs.make_course_id(t) for t in ("Running Course", "Queued One", "Queued Two")}
+
+
+def test_cancelled_queued_job_frees_its_place_and_never_runs(pool):
+    running = pool.submit("Running Course")
+    assert _wait_for(running, "running") == "running"
+    pool.submit("Queued One")
+    dropped = pool.submit("Queued Two")
+
+    assert dropped.cancel()
+    assert dropped.state == "cancelled" and dropped.done
+    assert not dropped.cancel()
+    waiting = pool.submit("One More")
+
+    _release.set()
+    assert _wait_for(waiting, "done") == "done"
+    assert dropped.state == "cancelled"
+    assert jobs.make_course_id("Queued Two") not in pool.active_course_ids()
+
+
+def test_cancel_stops_a_running_job(pool):
+    running = pool.submit("Running Course")
+    assert _wait_for(running, "running") == "running"
+    assert running.cancel()
+    assert _wait_for(running, "cancelled") == "cancelled"
+    assert running.done
+    # The worker takes the course out of the active index right after its last status update
+    deadline = time.monotonic() + 5
+    while pool.active_course_ids() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert pool.active_course_ids() == set()
@@ -0,0 +1,117 @@
+import os
+import re
+import time
+import threading
+from sqlite_store import connect
+
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", ".cache/search_cache.sqlite")
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "20000"))
+# How long a "no results" answer is trusted before we ask the source again.
+SEARCH_NEGATIVE_TTL = int(os.getenv("SEARCH_NEGATIVE_TTL", str(6 * 3600)))
+
+# Per-source TTLs: encyclopedic content changes slowly, web results quickly.
+SOURCE_TTLS = {
+    "wiki_tool": int(os.getenv("WIKI_CACHE_TTL", str(30 * 24 * 3600))),
+    "arxiv_tool": int(os.getenv("ARXIV_CACHE_TTL", str(7 * 24 * 3600))),
+    "search_tool": int(os.getenv("DDG_CACHE_TTL", str(24 * 3600))),
+}
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, collapses whitespace and strips surrounding punctuation."""
+    return re.sub(r"\s+", " ", query).strip().strip("\"'.,;:!?").lower()
+
+
+class SearchCache:
+    """
+    Persistent SQLite cache of search tool results keyed by (tool, normalized query).
+    Empty results are cached too (negative caching) with a shorter TTL, and the
+    least recently used entries are evicted once `max_entries` is exceeded.
+    """
+    def __init__(self, path=SEARCH_CACHE_PATH, max_entries=SEARCH_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with connect(self.path) as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS search_cache (
+                    tool TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    negative INTEGER NOT NULL,
+                    expires_at REAL NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (tool, query)
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_search_cache_last_used ON search_cache (last_used)")
+
+    def get(self, tool: str, query: str):
+        """Returns the cached result or None if missing/expired."""
+        row = self._lookup(tool, query)
+        return row[0] if row else None
+
+    def _lookup(self, tool: str, query: str):
+        """Returns (result, negative) or None if missing/expired."""
+        key = normalize_query(query)
+        now = time.time()
+        with connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT result, expires_at, negative FROM search_cache WHERE tool = ? AND query = ?", (tool, key)
+            ).fetchone()
+            if row and row[1] < now:
+                conn.execute("DELETE FROM search_cache WHERE tool = ? AND query = ?", (tool, key))
+                row = None
+            if row:
+                conn.execute(
+                    "UPDATE search_cache SET last_used = ? WHERE tool = ? AND query = ?", (now, tool, key)
+                )
+        with self._lock:
+            if row:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return (row[0], bool(row[2])) if row else None
+
+    def put(self, tool: str, query: str, result: str, negative: bool = False):
+        now = time.time()
+        ttl = SEARCH_NEGATIVE_TTL if negative else SOURCE_TTLS.get(tool, 24 * 3600)
+        with connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache VALUES (?, ?, ?, ?, ?, ?)",
+                (tool, normalize_query(query), result, int(negative), now + ttl, now),
+            )
+            # Drop expired rows first, then the least recently used ones over the limit
+            conn.execute("DELETE FROM search_cache WHERE expires_at < ?", (now,))
+            conn.execute("""
+                DELETE FROM search_cache WHERE rowid IN (
+                    SELECT rowid FROM search_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?
+                )
+            """, (self.max_entries,))
+
+    def get_or_fetch(self, tool: str, query: str, fetch, with_status: bool = False):
+        """
+        Serves `query` from the cache, or calls `fetch(query)` and stores the result.
+        `fetch` returns (result, status) where status is "ok", "empty" or "error";
+        errors are never cached. With `with_status`, returns (result, status) too.
+        """
+        cached = self._lookup(tool, query)
+        if cached is not None:
+            result, status = cached[0], "empty" if cached[1] else "ok"
+        else:
+            result, status = fetch(query)
+            if status != "error":
+                self.put(tool, query, result, negative=(status == "empty"))
+        return (result, status) if with_status else result
+
+    def clear(self):
+        with connect(self.path) as conn:
+            conn.execute("DELETE FROM search_cache")
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
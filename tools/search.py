@@ -1,46 +1,74 @@
+import os
+import re
 import time
-import wikipedia
-import arxiv
-from ddgs import DDGS
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from functools import lru_cache
 from langchain_core.tools import tool
+from tools.cache import SearchCache
+from ratelimit import get_limiter
+import telemetry
 
-# Tool 1: Wikipedia search.
-@tool
-def wiki_tool(query: str) -> str:
-    """
-    If the lesson is about history, definitions, standard concepts, or famous people
-    search Wikipedia for encyclopedic background on a topic.
-    """
+# Per-source limiters, so parallel research never hammers a single API: at most
+# *_MAX_CONCURRENCY calls at once (lowered while the source throttles us) and *_RPM
+# requests a minute (0 = unlimited). arXiv asks for no more than one request every 3 seconds.
+SOURCE_LIMITS = {
+    "wiki_tool": get_limiter("wiki_tool", max_concurrency=int(os.getenv("WIKI_MAX_CONCURRENCY", "4")),
+                             requests_per_minute=float(os.getenv("WIKI_RPM", "0"))),
+    "arxiv_tool": get_limiter("arxiv_tool", max_concurrency=int(os.getenv("ARXIV_MAX_CONCURRENCY", "1")),
+                              requests_per_minute=float(os.getenv("ARXIV_RPM", "20"))),
+    "search_tool": get_limiter("search_tool", max_concurrency=int(os.getenv("DDG_MAX_CONCURRENCY", "2")),
+                               requests_per_minute=float(os.getenv("DDG_RPM", "30"))),
+}
+
+@lru_cache(maxsize=None)
+def get_search_cache() -> SearchCache:
+    """Shared persistent cache in front of all three sources, opened on first use."""
+    return SearchCache()
+
+
+def _cached_search(tool_name: str, query: str, fetch, with_status: bool = False):
+    """Serves a search through the cache, recording source, latency and bytes returned."""
+    with telemetry.span(f"search.{tool_name}", kind="search", source=tool_name) as span:
+        fetched = []
+        def fetch_and_note(q):
+            fetched.append(q)
+            return fetch(q)
+        result, status = get_search_cache().get_or_fetch(tool_name, query, fetch_and_note, with_status=True)
+        span.set(bytes=len(result.encode("utf-8")), cache_hit=not fetched, status=status)
+    return (result, status) if with_status else result
+
+
+# The search client libraries are imported on first use, not at startup.
+# Throttled requests are retried by the source's limiter; anything else becomes an "error" result.
+def _wiki_search(query: str):
+    import wikipedia
+    limiter = SOURCE_LIMITS["wiki_tool"]
     try:
         wikipedia.set_lang("en")
-        summary = wikipedia.summary(query, sentences=8, auto_suggest=True)
-        return f"[Wikipedia: {query}]\n{summary}"
+        summary = limiter.call(wikipedia.summary, query, sentences=8, auto_suggest=True)
+        return f"[Wikipedia: {query}]\n{summary}", "ok"
     except wikipedia.exceptions.DisambiguationError as e:
         try:
-            fallback = wikipedia.summary(e.options[0], sentences=8, auto_suggest=False)
-            return f"[Wikipedia: {e.options[0]}]\n{fallback}"
+            fallback = limiter.call(wikipedia.summary, e.options[0], sentences=8, auto_suggest=False)
+            return f"[Wikipedia: {e.options[0]}]\n{fallback}", "ok"
         except Exception:
-            return f"Could not retrieve Wikipedia content for: {query}"
+            return f"Could not retrieve Wikipedia content for: {query}", "error"
     except wikipedia.exceptions.PageError:
-        return f"No Wikipedia page found for: {query}"
+        return f"No Wikipedia page found for: {query}", "empty"
     except Exception as e:
-        return f"Wikipedia search failed: {str(e)}"
-    
-# Tool 2: Arxiv search
-@tool
-def arxiv_tool(query: str) -> str:
-    """
-    If the lesson is about deep learning architectures, quantum physics, math theorems, or bleeding-edge research,
-    search ArXiv for academic papers and research.
-    """
+        return f"Wikipedia search failed: {str(e)}", "error"
+
+
+def _arxiv_search(query: str):
+    import arxiv
     try:
         client = arxiv.Client()
         search = arxiv.Search(query=query, max_results=3, sort_by=arxiv.SortCriterion.Relevance)
-        results = list(client.results(search))
-        
+        results = SOURCE_LIMITS["arxiv_tool"].call(lambda: list(client.results(search)))
+
         if not results:
-            return f"No ArXiv papers found for: {query}"
-        
+            return f"No ArXiv papers found for: {query}", "empty"
+
         summaries = []
         for paper in results:
             summaries.append(
@@ -48,9 +76,52 @@ def arxiv_tool(query: str) -> str:
                 f"Authors: {', '.join(str(a) for a in paper.authors[:3])}\n"
                 f"Abstract: {paper.summary[:500]}"
             )
-        return f"[ArXiv: {query}]\n\n" + "\n\n---\n\n".join(summaries)
+        return f"[ArXiv: {query}]\n\n" + "\n\n---\n\n".join(summaries), "ok"
     except Exception as e:
-        return f"ArXiv search failed: {str(e)}"
+        return f"ArXiv search failed: {str(e)}", "error"
+
+
+def _web_search(query: str):
+    from ddgs import DDGS
+
+    def fetch():
+        with DDGS() as ddgs:
+            return list(ddgs.text(query, max_results=4))
+
+    try:
+        results = SOURCE_LIMITS["search_tool"].call(fetch)
+
+        if not results:
+            return f"No web results found for: {query}", "empty"
+
+        snippets = [f"{r['title']}: {r['body']}" for r in results]
+        return f"[DuckDuckGo: {query}]\n\n" + "\n\n".join(snippets), "ok"
+    except Exception as e:
+        return f"DuckDuckGo search failed: {str(e)}", "error"
+
+
+# Fetcher of each source, shared by the tools and the fan-out. Benchmarks and tests swap
+# entries (or pass their own registry to fan_out_search) to replace the real APIs.
+SOURCE_FETCHERS = {"wiki_tool": _wiki_search, "arxiv_tool": _arxiv_search, "search_tool": _web_search}
+
+
+# Tool 1: Wikipedia search.
+@tool
+def wiki_tool(query: str) -> str:
+    """
+    If the lesson is about history, definitions, standard concepts, or famous people
+    search Wikipedia for encyclopedic background on a topic.
+    """
+    return _cached_search("wiki_tool", query, SOURCE_FETCHERS["wiki_tool"])
+    
+# Tool 2: Arxiv search
+@tool
+def arxiv_tool(query: str) -> str:
+    """
+    If the lesson is about deep learning architectures, quantum physics, math theorems, or bleeding-edge research,
+    search ArXiv for academic papers and research.
+    """
+    return _cached_search("arxiv_tool", query, SOURCE_FETCHERS["arxiv_tool"])
     
 # Tool 3: Duckduckgo search
 @tool
@@ -61,18 +132,142 @@ def search_tool(query: str) -> str:
     Best for: current events, practical how-to topics, business concepts, pop culture,
     anything too recent or niche for Wikipedia or ArXiv.
     """
-    try:
-        with DDGS() as ddgs:
-            results = list(ddgs.text(query, max_results=4))
-        
-        if not results:
-            return f"No web results found for: {query}"
-        
-        snippets = [f"{r['title']}: {r['body']}" for r in results]
-        return f"[DuckDuckGo: {query}]\n\n" + "\n\n".join(snippets)
-    except Exception as e:
-        return f"DuckDuckGo search failed: {str(e)}"
+    return _cached_search("search_tool", query, SOURCE_FETCHERS["search_tool"])
 
 # Putting all tools together in a list.
 SEARCH_TOOLS = [wiki_tool, arxiv_tool, search_tool]
 
+
+# Multi-source research: every source is asked at once and whatever answers before its
+# deadline is merged. A source still silent after SEARCH_HEDGE_AFTER seconds gets a
+# second, hedged request; the first answer wins.
+SOURCE_DEADLINES = {
+    "wiki_tool": float(os.getenv("WIKI_DEADLINE", "6")),
+    "arxiv_tool": float(os.getenv("ARXIV_DEADLINE", "8")),
+    "search_tool": float(os.getenv("DDG_DEADLINE", "6")),
+}
+SEARCH_HEDGE_AFTER = float(os.getenv("SEARCH_HEDGE_AFTER", "0"))  # 0 = no hedging
+SEARCH_FANOUT_WORKERS = int(os.getenv("SEARCH_FANOUT_WORKERS", "16"))
+# Snippets sharing at least this share of their words with an earlier one are dropped.
+SNIPPET_OVERLAP_THRESHOLD = float(os.getenv("SNIPPET_OVERLAP_THRESHOLD", "0.6"))
+
+
+@lru_cache(maxsize=None)
+def _fanout_pool() -> ThreadPoolExecutor:
+    # Shared and bounded: calls abandoned at their deadline finish here in the background
+    return ThreadPoolExecutor(max_workers=SEARCH_FANOUT_WORKERS, thread_name_prefix="search")
+
+
+def _timed_source_search(tool_name: str, query: str, fetch):
+    start = time.perf_counter()
+    try:
+        text, status = _cached_search(tool_name, query, fetch, with_status=True)
+    except Exception as e:
+        text, status = f"{tool_name} failed: {e}", "error"
+    return text, status, time.perf_counter() - start
+
+
+def fan_out_search(queries: dict, deadlines: dict = None, hedge_after: float = None,
+                   fetchers: dict = None) -> dict:
+    """
+    Queries several sources concurrently. `queries` maps tool name -> query.
+    Returns {tool_name: {"text", "status", "latency"}} where status is "ok", "empty",
+    "error" or "timeout"; a source never costs more than its deadline.
+    `fetchers` (tool name -> fn(query) -> (text, status)) defaults to SOURCE_FETCHERS.
+    """
+    fetchers = fetchers or SOURCE_FETCHERS
+    deadlines = {**SOURCE_DEADLINES, **(deadlines or {})}
+    hedge_after = SEARCH_HEDGE_AFTER if hedge_after is None else hedge_after
+    pool = _fanout_pool()
+    bound = telemetry.bind_context(_timed_source_search)
+    start = time.monotonic()
+    pending = {pool.submit(bound, source, query, fetchers[source]): source for source, query in queries.items()}
+    attempts = {source: 1 for source in queries}
+    results = {}
+
+    while len(results) < len(queries):
+        now = time.monotonic() - start
+        waiting = [source for source in queries if source not in results]
+        # Sources past their deadline are given up on; their calls finish in the background
+        for source in waiting:
+            if now >= deadlines.get(source, 10):
+                results[source] = {"text": "", "status": "timeout", "latency": now}
+        # Hedge sources that are still silent
+        if hedge_after:
+            for source in waiting:
+                if source not in results and attempts[source] == 1 and now >= hedge_after:
+                    attempts[source] += 1
+                    pending[pool.submit(bound, source, queries[source], fetchers[source])] = source
+        pending = {f: source for f, source in pending.items() if source not in results}
+        if not pending:
+            break
+        upcoming = [deadlines.get(source, 10) for source in set(pending.values())]
+        if hedge_after:
+            upcoming += [hedge_after for source in set(pending.values()) if attempts[source] == 1]
+        timeout = max(0.0, min(upcoming) - (time.monotonic() - start))
+        done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        for future in done:
+            source = pending.pop(future)
+            if source in results:
+                continue
+            text, status, latency = future.result()
+            # A failed attempt only counts once no other attempt for the source is in flight
+            if status == "ok" or source not in pending.values():
+                results[source] = {"text": text, "status": status, "latency": latency}
+    return results
+
+
+def _snippets(text: str) -> list:
+    return [part.strip() for part in re.split(r"\n\s*\n|\n---\n", text) if part.strip()]
+
+
+def _word_set(text: str) -> set:
+    return set(re.findall(r"[a-z0-9]+", text.lower()))
+
+
+def merge_results(results: dict, order=None) -> str:
+    """
+    Merges the successful results of fan_out_search into one text, in `order`
+    (most relevant source first), dropping snippets that mostly repeat an earlier one.
+    """
+    order = list(order or []) + [source for source in results if source not in (order or [])]
+    kept, kept_words = [], []
+    for source in order:
+        result = results.get(source)
+        if not result or result["status"] != "ok":
+            continue
+        source_kept, has_content = [], False
+        for snippet in _snippets(result["text"]):
+            words = _word_set(snippet)
+            if not words:
+                continue
+            # Source headers like "[Wikipedia: ...]" are short, kept and never compared against
+            if len(words) > 8:
+                if any(len(words & seen) / len(words) >= SNIPPET_OVERLAP_THRESHOLD for seen in kept_words):
+                    continue
+                kept_words.append(words)
+                has_content = True
+            source_kept.append(snippet)
+        # A source whose every snippet was a duplicate adds nothing, not even its header
+        if has_content:
+            kept.extend(source_kept)
+    return "\n\n".join(kept)
+
+
+def prewarm_cache(queries, tools=None, max_workers=4):
+    """
+    Fills the search cache for a list of queries (e.g. common lesson titles)
+    across the given tools, so later course generations hit the cache.
+    """
+    tools = tools or SEARCH_TOOLS
+    jobs = [(t, q) for q in queries for t in tools]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        list(pool.map(lambda job: job[0].invoke({"query": job[1]}), jobs))
+    print(f"🔥 Search cache pre-warmed with {len(jobs)} lookups. Stats: {get_search_cache().stats()}")
+
+
+if __name__ == "__main__":
+    # Usage: python -m tools.search queries.txt   (one query per line)
+    import sys
+    with open(sys.argv[1], encoding="utf-8") as f:
+        prewarm_cache([line.strip() for line in f if line.strip()])
@@ -0,0 +1,230 @@
+import os
+import json
+import threading
+from database import make_course_id
+import telemetry
+
+# Jobs that started but never finished are recorded here (one small file per course), so the
+# UI can offer to resume them without loading LangGraph; the checkpoints themselves live in
+# WORKFLOW_CHECKPOINT_PATH. One file per course keeps worker processes from racing each other.
+JOBS_STATE_DIR = os.getenv("JOBS_STATE_DIR", ".cache/active_jobs")
+_running = set()  # course IDs with a job running in this process
+
+
+def _job_state_path(course_id: str) -> str:
+    return os.path.join(JOBS_STATE_DIR, f"{course_id}.json")
+
+
+def _update_job_state(course_id: str, topic: str = None):
+    """Records a job as active (with its topic) or, with topic=None, as finished."""
+    path = _job_state_path(course_id)
+    if topic is None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        return
+    os.makedirs(JOBS_STATE_DIR, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"course_id": course_id, "topic": topic}, f)
+    os.replace(tmp_path, path)
+
+
+def unfinished_jobs() -> list:
+    """Jobs that stopped before finishing (crash, restart, error), as [{"course_id", "topic"}]."""
+    from workflow.worker_pool import active_course_ids
+    active = _running | active_course_ids()
+    jobs = []
+    for name in sorted(os.listdir(JOBS_STATE_DIR)) if os.path.isdir(JOBS_STATE_DIR) else []:
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(JOBS_STATE_DIR, name), encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if job.get("course_id") not in active:
+            jobs.append(job)
+    return jobs
+
+
+class GenerationJob:
+    """
+    Runs the LangGraph workflow for one topic in a background thread and keeps
+    track of which lessons are ready, so the UI can open the course as soon as
+    the first lesson is done instead of waiting for the whole graph.
+    `listener(job)` is called after every update (used by the worker processes).
+    """
+    def __init__(self, topic: str, listener=None):
+        self.topic = topic
+        self.course_id = make_course_id(topic)
+        self.events = []        # (node_name, update) in the order they happened
+        self.ready_lessons = [] # lesson IDs, in the order they became ready
+        self.failed_lessons = []
+        self.error = None
+        self.done = False
+        self.trace_id = None   # telemetry trace of this generation
+        self.resumed = False
+        self.existing = False  # the course was fully written already, so nothing ran
+        self.state = "queued"  # queued -> running -> done | failed | cancelled
+        self.first_lesson_ready = threading.Event()
+        self.cancelled = threading.Event()
+        self._listener = listener
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    @classmethod
+    def already_complete(cls, topic: str):
+        """A finished job for a course that is fully written already; nothing runs."""
+        job = cls(topic)
+        job.existing = True
+        job.state = "done"
+        job.done = True
+        job.first_lesson_ready.set()
+        return job
+
+    def cancel(self):
+        """
+        Stops the job: lessons not started yet are skipped, lessons being written
+        finish and are saved. Generating the topic again picks up the rest.
+        """
+        self.cancelled.set()
+        from workflow.workflow import cancel_course
+        cancel_course(self.course_id)
+
+    def _notify(self):
+        if self._listener:
+            self._listener(self)
+
+    def _run(self):
+        _running.add(self.course_id)
+        _update_job_state(self.course_id, self.topic)
+        self.state = "running"
+        self._notify()
+        try:
+            # Imported here so the UI doesn't load LangGraph and the agents until a course is generated
+            from workflow.workflow import get_langgraph_app, job_config, is_interrupted, clear_cancellation
+            clear_cancellation(self.course_id)
+            # A job cut off earlier (crash, restart) continues from its last checkpoint
+            self.resumed = is_interrupted(self.course_id)
+            inputs = None if self.resumed else {"topic": self.topic}
+            if self.resumed:
+                print(f"⏯️ Resuming generation of '{self.topic}' from its last checkpoint...")
+                self._mark_saved_lessons_ready()
+            with telemetry.trace(self.course_id, topic=self.topic, resumed=self.resumed) as trace_id:
+                self.trace_id = trace_id
+                for output in get_langgraph_app().stream(inputs, job_config(self.course_id)):
+                    for node_name, update in output.items():
+                        self.events.append((node_name, update))
+                        # Pipeline branches report one lesson each, the staged nodes many at once
+                        if isinstance(update, dict) and update.get("lesson_progress"):
+                            for lesson_id, lesson in update["lesson_progress"].items():
+                                if lesson["status"] == "complete":
+                                    self.ready_lessons.append(lesson_id)
+                                    self.first_lesson_ready.set()
+                                elif lesson["status"] == "failed":
+                                    self.failed_lessons.append(lesson_id)
+                    self._notify()
+                    if self.cancelled.is_set():
+                        break
+            self.state = "cancelled" if self.cancelled.is_set() else "done"
+            # Finished (or stopped on purpose): nothing left to resume
+            _update_job_state(self.course_id)
+        except Exception as e:
+            print(f"❌ Generation failed for '{self.topic}': {e}")
+            self.error = str(e)
+            self.state = "failed"
+        finally:
+            _running.discard(self.course_id)
+            self.done = True
+            # Staged mode only has lessons at the very end; release any waiter either way
+            self.first_lesson_ready.set()
+            self._notify()
+
+    def _mark_saved_lessons_ready(self):
+        # Lessons finished before the interruption produce no new events, but are readable now
+        from agents.deconstructor import get_course
+        course = get_course(self.course_id)
+        for module in (course or {}).get("modules", []):
+            for lesson in module["lessons"]:
+                if lesson.get("ready"):
+                    self.ready_lessons.append(lesson["id"])
+                    self.first_lesson_ready.set()
+
+    def wait_first_lesson(self, timeout: float = None) -> bool:
+        return self.first_lesson_ready.wait(timeout)
+
+    def timing_summary(self) -> dict:
+        """Where the time went so far: per node, LLM, search and database (see telemetry.trace_summary)."""
+        return telemetry.trace_summary(self.trace_id) if self.trace_id else {}
+
+    def snapshot(self) -> dict:
+        """Picklable status of the job, as reported by the worker processes."""
+        return {
+            "topic": self.topic,
+            "course_id": self.course_id,
+            "state": self.state,
+            "events": list(self.events),
+            "ready_lessons": list(self.ready_lessons),
+            "failed_lessons": list(self.failed_lessons),
+            "error": self.error,
+            "done": self.done,
+            "first_lesson_ready": self.first_lesson_ready.is_set(),
+            "timing": self.timing_summary(),
+        }
+
+
+# Single flight: course_id -> the job generating it, shared by every session that asks for it.
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+
+def start_generation(topic: str):
+    """
+    Starts generating a course in the background and returns its job handle.
+    Requests are coalesced by course ID (the normalized topic): while a job for
+    the course is queued or running, everyone gets that same job, and a course
+    that is already fully written returns a finished job without any work.
+    If an earlier run for the same course was interrupted, it is resumed instead.
+    With GENERATION_WORKERS > 0 the job goes to the worker process pool (and
+    raises QueueFullError when the queue is full); otherwise it runs in a thread.
+    Raises the database error if the course's state can't be read.
+    """
+    from workflow.worker_pool import GENERATION_WORKERS, get_generation_queue
+    from agents.deconstructor import course_is_complete
+    course_id = make_course_id(topic)
+    with _inflight_lock:
+        job = _inflight_job(course_id, topic)
+        if job is not None:
+            return job
+    # The Neo4j round trip runs outside the lock, so other sessions never wait on it.
+    # It raises if the database can't be read.
+    complete = course_is_complete(course_id)
+    with _inflight_lock:
+        # Another session may have started the course meanwhile
+        job = _inflight_job(course_id, topic)
+        if job is not None:
+            return job
+        if complete:
+            print(f"📚 '{topic}' is already fully generated.")
+            return GenerationJob.already_complete(topic)
+        if GENERATION_WORKERS > 0:
+            job = get_generation_queue().submit(topic)
+        else:
+            job = GenerationJob(topic).start()
+        _inflight[course_id] = job
+        return job
+
+
+def _inflight_job(course_id: str, topic: str):
+    """The unfinished job generating `course_id`, if any (call with _inflight_lock held)."""
+    for cid in [cid for cid, job in _inflight.items() if job.done]:
+        del _inflight[cid]
+    job = _inflight.get(course_id)
+    if job is not None:
+        print(f"🔗 '{topic}' is already being generated, joining that job.")
+    return job
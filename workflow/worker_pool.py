@@ -0,0 +1,284 @@
+import os
+import time
+import uuid
+import threading
+import multiprocessing
+import telemetry
+from database import make_course_id
+
+# Worker processes that run generation jobs. 0 = run each job in a thread of the UI process.
+GENERATION_WORKERS = int(os.getenv("GENERATION_WORKERS", "0"))
+# Jobs waiting for a free worker; submitting beyond this raises QueueFullError (backpressure).
+# Cancelled jobs give their place back at once.
+GENERATION_QUEUE_SIZE = int(os.getenv("GENERATION_QUEUE_SIZE", "8"))
+# "spawn" is safe with the threads and connection pools the app keeps; "fork" starts faster on Linux.
+GENERATION_START_METHOD = os.getenv("GENERATION_START_METHOD", "spawn")
+# Seconds a finished job's status is kept for the sessions polling it, before it is dropped.
+GENERATION_JOB_RETENTION = float(os.getenv("GENERATION_JOB_RETENTION", "600"))
+# How often a worker checks whether its running job was cancelled.
+CANCEL_POLL_SECONDS = 0.5
+# How often the pool checks that its workers are alive (a dead one fails its job and is replaced).
+WORKER_CHECK_SECONDS = 2.0
+
+
+class QueueFullError(RuntimeError):
+    """Raised by submit() when GENERATION_QUEUE_SIZE jobs are already waiting."""
+
+
+def _worker_main(index, tasks, shared):
+    """Worker process loop: takes one job at a time off the queue and runs it to the end."""
+    from agents.drafts import use_shared_store
+    from workflow.jobs import GenerationJob
+    statuses, cancelled = shared["statuses"], shared["cancelled"]
+    # Lesson drafts and metrics recorded here are mirrored to the UI process
+    use_shared_store(shared["drafts"])
+    telemetry.use_shared_metrics(shared["metrics"], publisher=f"worker-{index}")
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        job_id, topic = task
+        # Recorded first, so the pool can fail the job if this process dies while on it
+        shared["assigned"][index] = job_id
+        shared["queued"].pop(job_id, None)
+        if cancelled.get(job_id):
+            shared["assigned"].pop(index, None)
+            continue  # cancel() already marked it as done
+
+        def report(job, job_id=job_id):
+            statuses[job_id] = job.snapshot()
+
+        job = GenerationJob(topic, listener=report).start()
+        while not job.done:
+            time.sleep(CANCEL_POLL_SECONDS)
+            if cancelled.get(job_id) and not job.cancelled.is_set():
+                print(f"⏹️ Cancelling generation of '{topic}'...")
+                job.cancel()
+        job._thread.join()
+        telemetry.publish_metrics(f"worker-{index}")
+        _finish(shared, job_id, make_course_id(topic))
+        shared["assigned"].pop(index, None)
+
+
+def _finish(shared, job_id: str, course_id: str):
+    """Takes a finished job out of the active index and starts its retention period."""
+    shared["finished"][job_id] = time.time()
+    if shared["active"].get(course_id) == job_id:
+        shared["active"].pop(course_id, None)
+
+
+class QueuedJob:
+    """
+    Handle of a job submitted to the worker pool, with the same interface the UI
+    uses on GenerationJob; every attribute reads the latest status the worker reported.
+    """
+    existing = False  # finished courses are answered by start_generation, never queued
+
+    def __init__(self, pool, job_id: str, topic: str):
+        self.pool = pool
+        self.job_id = job_id
+        self.topic = topic
+        self.course_id = make_course_id(topic)
+        self._final = None
+
+    @property
+    def status(self) -> dict:
+        # The final status is kept here, since the pool drops it after GENERATION_JOB_RETENTION
+        if self._final is not None:
+            return self._final
+        status = self.pool.status(self.job_id)
+        if status["done"]:
+            self._final = status
+        return status
+
+    @property
+    def state(self):
+        return self.status["state"]
+
+    @property
+    def events(self):
+        return self.status["events"]
+
+    @property
+    def ready_lessons(self):
+        return self.status["ready_lessons"]
+
+    @property
+    def failed_lessons(self):
+        return self.status["failed_lessons"]
+
+    @property
+    def error(self):
+        return self.status["error"]
+
+    @property
+    def done(self):
+        return self.status["done"]
+
+    def wait_first_lesson(self, timeout: float = None) -> bool:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.status
+            if status["first_lesson_ready"] or status["done"]:
+                return True
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.1)
+
+    def timing_summary(self) -> dict:
+        return self.status.get("timing") or {}
+
+    def cancel(self):
+        return self.pool.cancel(self.job_id)
+
+
+class GenerationQueue:
+    """
+    Bounded job queue in front of a pool of worker processes, so many courses can
+    be generated at once across cores while the Streamlit sessions only poll.
+    Statuses, cancellation flags and live drafts are shared through a Manager, with
+    small indexes of the queued and active jobs so lookups never scan every status.
+    Finished statuses are dropped GENERATION_JOB_RETENTION seconds after the job ends.
+    """
+    def __init__(self, workers: int = None, max_queued: int = GENERATION_QUEUE_SIZE,
+                 start_method: str = GENERATION_START_METHOD):
+        workers = workers or max(1, GENERATION_WORKERS)
+        context = multiprocessing.get_context(start_method)
+        self.max_queued = max_queued
+        self._manager = context.Manager()
+        self._statuses = self._manager.dict()   # job_id -> snapshot (see GenerationJob.snapshot)
+        self._cancelled = self._manager.dict()  # job_id -> True
+        self._queued = self._manager.dict()     # job_id -> True, until a worker takes it
+        self._active = self._manager.dict()     # course_id -> job_id, while queued or running
+        self._finished = self._manager.dict()   # job_id -> time.time() it finished
+        self._assigned = self._manager.dict()   # worker index -> job_id it is running
+        self.drafts = self._manager.dict()      # lesson_id -> partial text
+        self.metrics = self._manager.dict()     # worker name -> its published metrics (see telemetry)
+        self._shared = {"statuses": self._statuses, "cancelled": self._cancelled, "queued": self._queued,
+                        "active": self._active, "finished": self._finished, "assigned": self._assigned,
+                        "drafts": self.drafts, "metrics": self.metrics}
+        # Unbounded: backpressure counts the queued index, so a cancelled job frees its place at once
+        self._context = context
+        self._tasks = context.Queue()
+        self._submit_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._processes = [self._start_worker(i) for i in range(workers)]
+        self._watcher = threading.Thread(target=self._watch_workers, name="course-worker-watcher", daemon=True)
+        self._watcher.start()
+        # The UI reads the drafts the workers write, and serves their metrics
+        from agents.drafts import use_shared_store
+        use_shared_store(self.drafts)
+        telemetry.use_shared_metrics(self.metrics)
+        print(f"🏭 Started {workers} course generation workers (queue size {max_queued}).")
+
+    def submit(self, topic: str) -> QueuedJob:
+        """
+        Queues a course generation, or returns the queued/running job for the same course.
+        Raises QueueFullError instead of blocking when the queue is full.
+        """
+        course_id = make_course_id(topic)
+        with self._submit_lock:
+            self._prune()
+            job_id = self._active.get(course_id)
+            if job_id is not None:
+                status = self.status(job_id)
+                if not status["done"]:
+                    return QueuedJob(self, job_id, status["topic"])
+            if len(self._queued) >= self.max_queued:
+                raise QueueFullError(f"{self.max_queued} courses are already waiting to be generated. Try again shortly.")
+            job_id = uuid.uuid4().hex[:12]
+            self._statuses[job_id] = {
+                "topic": topic, "course_id": course_id, "state": "queued", "events": [],
+                "ready_lessons": [], "failed_lessons": [], "error": None, "done": False,
+                "first_lesson_ready": False, "timing": {}, "submitted_at": time.time(),
+            }
+            self._queued[job_id] = True
+            self._active[course_id] = job_id
+            self._tasks.put((job_id, topic))
+        return QueuedJob(self, job_id, topic)
+
+    def _prune(self):
+        """Drops the statuses of jobs that finished more than GENERATION_JOB_RETENTION seconds ago."""
+        cutoff = time.time() - GENERATION_JOB_RETENTION
+        for job_id, finished_at in self._finished.items():
+            if finished_at < cutoff:
+                self._statuses.pop(job_id, None)
+                self._cancelled.pop(job_id, None)
+                self._finished.pop(job_id, None)
+
+    def _start_worker(self, index: int):
+        process = self._context.Process(target=_worker_main, name=f"course-worker-{index}", daemon=True,
+                                        args=(index, self._tasks, self._shared))
+        process.start()
+        return process
+
+    def _watch_workers(self):
+        while not self._stopping.wait(WORKER_CHECK_SECONDS):
+            self.check_workers()
+
+    def check_workers(self):
+        """Fails the job of any worker that died (OOM, crash) and starts a replacement."""
+        for index, process in enumerate(self._processes):
+            if process.is_alive() or self._stopping.is_set():
+                continue
+            job_id = self._assigned.pop(index, None)
+            with self._submit_lock:
+                status = self.status(job_id) if job_id else {"done": True}
+                if not status["done"]:
+                    print(f"❌ Generation worker died (exit code {process.exitcode}) while generating '{status['topic']}'.")
+                    self._statuses[job_id] = {**status, "state": "failed", "done": True, "first_lesson_ready": True,
+                                              "error": f"The generation worker stopped unexpectedly (exit code {process.exitcode})."}
+                    _finish(self._shared, job_id, status["course_id"])
+            self._processes[index] = self._start_worker(index)
+
+    def status(self, job_id: str) -> dict:
+        return self._statuses.get(job_id) or {"state": "unknown", "done": True, "events": [], "ready_lessons": [],
+                                              "failed_lessons": [], "error": "Unknown job", "first_lesson_ready": False}
+
+    def cancel(self, job_id: str) -> bool:
+        """
+        Drops a queued job right away (the worker skips it when it comes up), or stops
+        a running one after its lessons in progress. False if already over.
+        """
+        with self._submit_lock:
+            status = self.status(job_id)
+            if status["done"]:
+                return False
+            self._cancelled[job_id] = True
+            if status["state"] == "queued":
+                self._statuses[job_id] = {**status, "state": "cancelled", "done": True}
+                self._queued.pop(job_id, None)
+                _finish(self._shared, job_id, status["course_id"])
+        return True
+
+    def jobs(self) -> dict:
+        return dict(self._statuses)
+
+    def active_course_ids(self) -> set:
+        return set(self._active.keys())
+
+    def shutdown(self, timeout: float = 5):
+        self._stopping.set()
+        for _ in self._processes:
+            self._tasks.put(None)
+        for process in self._processes:
+            process.join(timeout)
+        self._manager.shutdown()
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_generation_queue() -> GenerationQueue:
+    """The process-wide queue, with its workers started on first use."""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = GenerationQueue()
+        return _queue
+
+
+def active_course_ids() -> set:
+    """Courses queued or being generated by the worker pool (empty if it was never started)."""
+    return _queue.active_course_ids() if _queue is not None else set()
@@ -1,18 +1,51 @@
 import os
  
-from typing import TypedDict, List
+import sqlite3
+ 
+from functools import lru_cache
+ 
+from typing import TypedDict, List, Annotated
  
 from langgraph.graph import StateGraph, END
  
+from langgraph.types import Send
+ 
 # Import Nodes
  
-from agents.deconstructor import create_course_in_db
+from agents.deconstructor import (
+    create_course_in_db, get_pending_lessons, get_lesson_state, write_lesson_rows,
+    RESEARCH_BATCH_QUERY, CONTENT_BATCH_QUERY,
+)
+ 
+from agents.librarian import librarian_node, research_lesson
+ 
+from agents.professor import professor_node, write_lesson, lesson_row
+ 
+from agents.drafts import clear_draft
+ 
+from agents.llm import get_cached_llm
+ 
+from database import course_id_of
+ 
+from telemetry import traced_node
+ 
+ 
+ 
+# "pipeline": every lesson is researched and then written as soon as the skeleton exists (default).
+# "staged":   deconstructor -> librarian -> professor, each over the whole course.
+WORKFLOW_MODE = os.getenv("WORKFLOW_MODE", "pipeline")
+ 
+# How many lessons flow through the pipeline at the same time.
+PIPELINE_MAX_CONCURRENCY = int(os.getenv("PIPELINE_MAX_CONCURRENCY", "6"))
+
+# Durable LangGraph checkpoints, so an interrupted generation resumes where it stopped ("" disables).
+WORKFLOW_CHECKPOINT_PATH = os.getenv("WORKFLOW_CHECKPOINT_PATH", ".cache/checkpoints.sqlite")
  
-from agents.librarian import librarian_node
  
-from agents.professor import professor_node
  
-from agents.llm import LlmFactory
+def merge_progress(left: dict, right: dict) -> dict:
+    """Reducer for per-lesson progress updates coming from parallel branches."""
+    return {**(left or {}), **(right or {})}
  
  
  
@@ -22,13 +55,20 @@ class AgentState(TypedDict):
  
     course_title: str
  
+    course_id: str
+ 
     lessons_processed: List[str]
  
     current_status: str
  
-# Initialize LLM
+    # lesson_id -> {"title": ..., "status": "complete" | "failed"}
+    lesson_progress: Annotated[dict, merge_progress]
+ 
+# LLM for the research/authoring nodes, created on first use
+ 
+def _llm():
  
-llm = LlmFactory(mode='local', temperature=0.5).get_llm()
+    return get_cached_llm(temperature=0.5)
  
  
  
@@ -38,7 +78,8 @@ def deconstructor_node(state):
  
     print(f"🏗️ Deconstructor: Designing course skeleton for '{topic}'...")
  
-    create_course_in_db(topic)
+    # Idempotent: a skeleton saved by an earlier (interrupted) run is reused, not redesigned
+    state["course_id"] = create_course_in_db(topic, reuse_existing=True)
  
     state["course_title"] = topic
  
@@ -46,26 +87,144 @@ def deconstructor_node(state):
  
  
  
-workflow = StateGraph(AgentState)
- 
-# Add Nodes with LLM injection
- 
-workflow.add_node("deconstructor", deconstructor_node)
- 
-workflow.add_node("librarian", lambda state: librarian_node(state, llm))
- 
-workflow.add_node("professor", lambda state: professor_node(state, llm))
- 
-# Define the Path
- 
-workflow.set_entry_point("deconstructor")
- 
-workflow.add_edge("deconstructor", "librarian")
- 
-workflow.add_edge("librarian", "professor")
- 
-workflow.add_edge("professor", END)
+def route_lessons(state):
+    """
+    Fans out one pipeline branch per unfinished lesson, in curriculum order.
+    LangGraph dispatches the Sends in list order under max_concurrency, so the
+    earliest lessons (module 1, lesson 1 first) always start and finish first.
+    """
+    lessons = get_pending_lessons(state["course_id"])
+    if not lessons:
+        return END
+    return [Send("lesson_pipeline", lesson) for lesson in lessons]
  
-# Compile
  
-langgraph_app = workflow.compile()
\ No newline at end of file
+ 
+# Courses whose job was cancelled: their lesson branches that haven't started yet return
+# right away, leaving the lessons pending (a later job picks them up).
+_cancelled_courses = set()
+
+
+
+def cancel_course(course_id: str):
+    _cancelled_courses.add(course_id)
+
+
+
+def clear_cancellation(course_id: str):
+    _cancelled_courses.discard(course_id)
+
+
+
+def lesson_pipeline_node(lesson):
+    """Researches (if needed) and then writes a single lesson, saving each step right away."""
+    lesson_id, title = lesson["id"], lesson["title"]
+    if course_id_of(lesson_id) in _cancelled_courses:
+        return {"lesson_progress": {lesson_id: {"title": title, "status": "cancelled"}}}
+    try:
+        # The Send payload can be stale when a job is resumed, so check what is already saved
+        saved = get_lesson_state(lesson_id) or {}
+        if saved.get("written"):
+            return {"lesson_progress": {lesson_id: {"title": title, "status": "complete"}}}
+        notes = saved.get("notes") or lesson.get("notes")
+        if not notes:
+            notes, source_used = research_lesson(_llm(), lesson["course_name"], title)
+            write_lesson_rows(RESEARCH_BATCH_QUERY, [{"id": lesson_id, "title": title, "notes": notes, "source": source_used}])
+        data = write_lesson(_llm(), title, notes, lesson_id)
+        # The finished lesson is saved in one statement; only then the live draft goes away
+        write_lesson_rows(CONTENT_BATCH_QUERY, [lesson_row(lesson_id, title, data)])
+        status = "complete"
+    except Exception as e:
+        print(f"   ❌ Pipeline failed for '{title}': {e}")
+        status = "failed"
+    finally:
+        clear_draft(lesson_id)
+    return {"lesson_progress": {lesson_id: {"title": title, "status": status}}}
+ 
+ 
+ 
+def build_workflow():
+    """Builds the graph for the configured WORKFLOW_MODE (not compiled)."""
+ 
+    workflow = StateGraph(AgentState)
+ 
+    # Add Nodes with LLM injection
+ 
+    workflow.add_node("deconstructor", traced_node("deconstructor", deconstructor_node))
+ 
+    workflow.set_entry_point("deconstructor")
+ 
+    if WORKFLOW_MODE == "pipeline":
+ 
+        workflow.add_node("lesson_pipeline", traced_node("lesson_pipeline", lesson_pipeline_node))
+ 
+        workflow.add_conditional_edges("deconstructor", route_lessons, ["lesson_pipeline", END])
+ 
+        workflow.add_edge("lesson_pipeline", END)
+ 
+    else:
+ 
+        workflow.add_node("librarian", traced_node("librarian", lambda state: librarian_node(state, _llm())))
+ 
+        workflow.add_node("professor", traced_node("professor", lambda state: professor_node(state, _llm())))
+ 
+        # Define the Path
+ 
+        workflow.add_edge("deconstructor", "librarian")
+ 
+        workflow.add_edge("librarian", "professor")
+ 
+        workflow.add_edge("professor", END)
+ 
+    return workflow
+ 
+ 
+ 
+@lru_cache(maxsize=None)
+def get_checkpointer():
+    """SQLite checkpointer shared by every job in the process, or None if disabled/unavailable."""
+    if not WORKFLOW_CHECKPOINT_PATH:
+        return None
+    try:
+        from langgraph.checkpoint.sqlite import SqliteSaver
+    except ImportError:
+        print("⚠️ langgraph-checkpoint-sqlite is not installed; generation jobs will not be resumable.")
+        return None
+    os.makedirs(os.path.dirname(WORKFLOW_CHECKPOINT_PATH) or ".", exist_ok=True)
+    return SqliteSaver(sqlite3.connect(WORKFLOW_CHECKPOINT_PATH, check_same_thread=False))
+
+
+
+@lru_cache(maxsize=None)
+def get_compiled_graph():
+    return build_workflow().compile(checkpointer=get_checkpointer())
+
+
+
+@lru_cache(maxsize=None)
+def get_langgraph_app():
+    """Compiles the graph on first use and reuses it for the rest of the process."""
+    return get_compiled_graph().with_config(max_concurrency=PIPELINE_MAX_CONCURRENCY)
+
+
+
+def job_config(course_id: str) -> dict:
+    """One checkpoint thread per course, so a course's job can always be found and resumed."""
+    return {"configurable": {"thread_id": f"course:{course_id}"}}
+
+
+
+def is_interrupted(course_id: str) -> bool:
+    """True if the last run for this course stopped before reaching the end of the graph."""
+    if get_checkpointer() is None:
+        return False
+    snapshot = get_compiled_graph().get_state(job_config(course_id))
+    return bool(snapshot.next)
+
+
+
+def __getattr__(name):
+    # Backwards compatible `from workflow.workflow import langgraph_app`, compiled lazily
+    if name == "langgraph_app":
+        return get_langgraph_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")